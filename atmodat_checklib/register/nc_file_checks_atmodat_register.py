@@ -10,7 +10,8 @@ from netCDF4 import Dataset
 from compliance_checker.base import Result, BaseCheck
 from checklib.register.callable_check_base import CallableCheckBase
 from atmodat_checklib.utils import nc_util
-from checklib.cvs.ess_vocabs import ESSVocabs
+from atmodat_checklib.utils.nc_header_util import NCHeader
+from atmodat_checklib.utils.vocab_index_util import vocab_index
 from checklib.code.errors import FileError
 
 
@@ -18,7 +19,7 @@ class NCFileCheckBase(CallableCheckBase):
     """Base class for all NetCDF4 File Checks (that work on a file path)."""
 
     def _check_primary_arg(self, primary_arg):
-        if not isinstance(primary_arg, Dataset):
+        if not isinstance(primary_arg, (Dataset, NCHeader)):
             raise FileError("Object for testing is not a netCDF4 Dataset: {}".format(str(primary_arg)))
 
     def _atmodat_status_to_level(self, status):
@@ -191,9 +192,9 @@ class GlobalAttrVocabCheckByStatus(NCFileCheckBase):
     def _get_result(self, primary_arg):
         self._atmodat_status_to_level(self.kwargs["status"])
         ds = primary_arg
-        vocabs = ESSVocabs(*self.vocabulary_ref.split(":")[:2])
 
-        score = vocabs.check_global_attribute(ds, self.kwargs["attribute"], vocab_lookup=self.kwargs["vocab_lookup"])
+        score = vocab_index.check_global_attribute(ds, self.kwargs["attribute"], self.vocabulary_ref,
+                                                   self.kwargs["vocab_lookup"])
         messages = []
 
         if score < self.out_of:
@@ -0,0 +1,49 @@
+"""
+test_atmodat_check_util.py
+======================
+Unit tests for the in-process check engine in the atmodat_checklib.utils.atmodat_check_util module.
+"""
+
+import json
+import os
+from netCDF4 import Dataset
+from atmodat_checklib.utils.env_util import set_env_variables
+
+udunits2_xml_path, pyessv_archive_home = set_env_variables()
+os.environ['PYESSV_ARCHIVE_HOME'] = os.path.join(pyessv_archive_home, 'pyessv-archive')
+os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+from atmodat_checklib.utils.atmodat_check_util import AtmodatChecker, ATMODAT_CHECKS_YML  # noqa: E402
+
+checks_yml = """
+suite_name: "atmodat_standard:3.0"
+checks:
+  - check_id: "global_attrs_title"
+    check_name: "atmodat_checklib.register.GlobalAttrTypeCheck"
+    parameters: {"attribute": "title", "type": "str", "status": "mandatory"}
+  - check_id: "global_attrs_creation_date"
+    check_name: "atmodat_checklib.register.DateISO8601Check"
+    parameters: {"attribute": "creation_date", "status": "recommended"}
+"""
+
+
+def test_atmodat_checker_output(tmpdir):
+    with open(os.path.join(str(tmpdir), ATMODAT_CHECKS_YML), 'w') as f_yml:
+        f_yml.write(checks_yml)
+
+    ifile = str(tmpdir.join('tmp.nc'))
+    with Dataset(ifile, 'w') as ds:
+        ds.setncattr('title', 'foo')
+        ds.setncattr('creation_date', '01.01.2021')
+
+    checker = AtmodatChecker(os.path.join(str(tmpdir), ''))
+    ofile = str(tmpdir.join('tmp_atmodat_result.json'))
+    # Check objects are reused for further files
+    for _ in range(2):
+        checker.check_file(ifile, ofile)
+
+    with open(ofile) as f_json:
+        result = json.load(f_json)[ifile]['atmodat_standard:3.0']
+    assert(result['testname'] == 'atmodat_standard:3.0')
+    assert([check['value'] for check in result['high_priorities']] == [[4, 4]])
+    assert([check['value'] for check in result['medium_priorities']] == [[1, 2]])
+    assert(os.path.isfile(str(tmpdir.join('tmp_atmodat_result.txt'))))
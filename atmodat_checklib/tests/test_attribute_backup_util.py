@@ -0,0 +1,49 @@
+"""
+test_attribute_backup_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.fill_attributes.attribute_backup_util module.
+"""
+
+import json
+import os
+import numpy as np
+import atmodat_checklib.utils.fill_attributes.attribute_backup_util as attribute_backup
+from atmodat_checklib.utils.fill_attributes.attribute_backup_util import AttributeBackupStore
+
+
+def test_encode_attrs():
+    attrs = {'title': 'a', 'nominal_resolution': np.int64(25), 'valid_range': np.array([0., 1.], dtype='f4'),
+             'scale': 1.5}
+    attrs_decoded = attribute_backup.decode_attrs(attribute_backup.encode_attrs(attrs))
+    assert(attrs_decoded['title'] == 'a')
+    assert(attrs_decoded['nominal_resolution'].dtype == np.int64)
+    assert(not isinstance(attrs_decoded['nominal_resolution'], np.ndarray))
+    assert(attrs_decoded['valid_range'].dtype == np.float32)
+    assert(list(attrs_decoded['valid_range']) == [0., 1.])
+    assert(attrs_decoded['scale'] == 1.5)
+    assert(attribute_backup.encode_attrs(dict(reversed(attrs.items()))) == attribute_backup.encode_attrs(attrs))
+
+
+def test_attribute_backup_store(tmpdir):
+    backup_dir = str(tmpdir)
+    with AttributeBackupStore(backup_dir) as store:
+        for n in range(3):
+            store.put(f'/data/dir{n % 2}/file{n}.nc', {'global_attr': {'title': f'file {n}'},
+                                                       'tas': {'units': 'K', '_FillValue': np.float32(-999.)}})
+        assert(store.get('/data/dir0/file2.nc')['global_attr'] == {'title': 'file 2'})
+        assert(store.get('/data/dir0/file3.nc') is None)
+        assert(store.files_under('/data/dir0') == ['/data/dir0/file0.nc', '/data/dir0/file2.nc'])
+        assert(store.files_under('/data') == ['/data/dir0/file0.nc', '/data/dir0/file2.nc', '/data/dir1/file1.nc'])
+        # Equal variable attributes are only stored once
+        assert(store.connection.execute('SELECT COUNT(*) FROM attribute_sets').fetchone()[0] == 4)
+
+    # The store is reopened; backups of earlier versions are read
+    with open(attribute_backup.legacy_backup_file(backup_dir, '/data/old.nc'), 'w') as f:
+        json.dump({'global_attr': {'title': 'old'}}, f)
+    with AttributeBackupStore(backup_dir) as store:
+        assert(store.get('/data/dir1/file1.nc')['tas']['_FillValue'].dtype == np.float32)
+        assert(store.original_attributes(None, '/data/old.nc') == ({'global_attr': {'title': 'old'}}, False))
+        assert(store.original_attributes(None, '/data/dir0/file0.nc')[1])
+    with AttributeBackupStore(os.path.join(backup_dir, 'missing'), read_only_in=True) as store:
+        assert(store.get('/data/dir0/file0.nc') is None and store.files_under('/data') == [])
+    assert(os.path.isfile(os.path.join(backup_dir, attribute_backup.BACKUP_STORE_FILE)))
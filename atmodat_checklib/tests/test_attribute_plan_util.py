@@ -0,0 +1,237 @@
+"""
+test_attribute_plan_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.fill_attributes.attribute_plan_util module.
+"""
+
+import json
+import os
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+import atmodat_checklib.utils.fill_attributes.attribute_plan_util as attribute_plan
+from atmodat_checklib.utils.fill_attributes.attribute_backup_util import AttributeBackupStore
+
+
+def write_csvs(att_dir_in):
+    with open(os.path.join(att_dir_in, 'mandatory_attributes.csv'), 'w') as f:
+        f.write('attribute,use,append,string\n')
+        f.write('Conventions,true,false,CF-1.8 ATMODAT-3.0\n')
+        f.write('history,true,true,filled\n')
+        f.write('source,false,false,\n')
+    with open(os.path.join(att_dir_in, 'variable_attributes.csv'), 'w') as f:
+        f.write('varname_old,varname_new,long_name,units\n')
+        f.write('tas,air_temperature,Near-Surface Air Temperature,\n')
+        f.write('pr,,,kg m-2 s-1\n')
+
+
+def write_file(ofile_in, file_format_in):
+    with Dataset(ofile_in, 'w', format=file_format_in) as ds:
+        ds.setncatts({'history': 'created', 'source': 'model', 'nominal_resolution': np.int32(25)})
+        ds.createDimension('time', 2)
+        for var in ['tas', 'pr', 'time']:
+            ds.createVariable(var, 'f4', ('time',), fill_value=np.float32(-999.)).setncatts({'units': 'K'})
+
+
+def read_attrs(ifile_in):
+    with Dataset(ifile_in, 'r') as ds:
+        return ({attr: ds.getncattr(attr) for attr in ds.ncattrs()},
+                {var: {attr: variable.getncattr(attr) for attr in variable.ncattrs()}
+                 for var, variable in ds.variables.items()})
+
+
+def test_compile_attribute_plan(tmpdir):
+    write_csvs(str(tmpdir))
+    plan = attribute_plan.compile_attribute_plan(str(tmpdir))
+    gattrs = plan.global_attrs({'history': 'created', 'Conventions': 'CF-1.6'})
+    assert(set(gattrs) == {'Conventions', 'history'})
+    assert(gattrs['Conventions'] == 'CF-1.8 ATMODAT-3.0')
+    assert(gattrs['history'] == plan.time_string + 'filled\n created')
+    assert(plan.new_name('tas') == 'air_temperature')
+    assert(plan.new_name('pr') == 'pr')
+    assert(plan.variable_attrs('pr', {'units': 'mm', '_FillValue': -999.}) == {'units': 'kg m-2 s-1'})
+    assert(plan.variable_attrs('air_temperature', {}) == {'long_name': 'Near-Surface Air Temperature'})
+
+
+def test_global_attrs_empty_entries(tmpdir):
+    with open(os.path.join(str(tmpdir), 'mandatory_attributes.csv'), 'w') as f:
+        f.write('attribute,use,append,string\n')
+        f.write('title,true,false,A title\n')
+        f.write('source,true,true,\n')
+        f.write('institution,true,false,\n')
+        f.write('comment,true,true,\n')
+    with pytest.warns(UserWarning, match='institution'):
+        plan = attribute_plan.compile_attribute_plan(str(tmpdir))
+    # Appended attributes with empty entries keep their value, the others are left out
+    gattrs = plan.global_attrs({'source': 'model', 'institution': 'DKRZ', 'history': 'created'})
+    assert(gattrs == {'source': 'model', 'title': 'A title'})
+    assert(list(gattrs) == ['source', 'title'])
+
+
+def test_global_attrs_order(tmpdir):
+    att_dir = str(tmpdir.mkdir('csv'))
+    write_csvs(att_dir)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    ifile = os.path.join(str(tmpdir), 'test.nc')
+    write_file(ifile, 'NETCDF4')
+
+    list(attribute_plan.fill_files([ifile], plan, att_dir))
+    with Dataset(ifile, 'r') as ds:
+        assert(ds.ncattrs() == ['Conventions', 'history'])
+    # A filled file in alphabetical order is not changed again
+    assert([len(changes) for _, changes, _ in attribute_plan.fill_files([ifile], plan, att_dir)] == [0])
+
+
+def test_read_csv_columns(tmpdir):
+    ifile = os.path.join(str(tmpdir), 'variable_attributes.csv')
+    with open(ifile, 'w') as f:
+        f.write('varname_old,valid_min,valid_max,flag,comment\n')
+        f.write('tas,0,1.5,TRUE,None\n')
+        f.write('   \n')
+        f.write('pr,,-3,false," a, b"\n')
+    columns = attribute_plan.read_csv_columns(ifile)
+    assert(list(columns) == ['varname_old', 'valid_min', 'valid_max', 'flag', 'comment'])
+    assert(columns['varname_old'] == ['tas', 'pr'])
+    assert(columns['valid_min'][0] == 0. and isinstance(columns['valid_min'][0], float))
+    assert(not attribute_plan.is_filled(columns['valid_min'][1]))
+    assert(columns['valid_max'] == [1.5, -3.])
+    assert(columns['flag'] == [True, False])
+    assert(not attribute_plan.is_filled(columns['comment'][0]) and columns['comment'][1] == ' a, b')
+    assert(attribute_plan.convert_csv_column(['1', '-2']) == [1, -2])
+
+
+def test_values_equal():
+    assert(attribute_plan.values_equal(np.float32(1.5), 1.5))
+    assert(attribute_plan.values_equal(np.array([1, 2], dtype='i4'), [1, 2]))
+    assert(not attribute_plan.values_equal('1', 1))
+    assert(not attribute_plan.values_equal('a', 'b'))
+
+
+def test_fill_files(tmpdir):
+    att_dir = str(tmpdir.mkdir('csv'))
+    write_csvs(att_dir)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    ifiles = []
+    for file_format in ['NETCDF4', 'NETCDF3_CLASSIC']:
+        ifiles.append(os.path.join(str(tmpdir), file_format + '.nc'))
+        write_file(ifiles[-1], file_format)
+    attrs_orig = read_attrs(ifiles[0])
+
+    results = list(attribute_plan.fill_files(ifiles, plan, att_dir))
+    assert([error for _, _, error in results] == [None, None])
+    for ifile in ifiles:
+        gattrs, vattrs = read_attrs(ifile)
+        assert(set(gattrs) == {'Conventions', 'history'})
+        assert(set(vattrs) == {'air_temperature', 'pr', 'time'})
+        assert(vattrs['air_temperature']['long_name'] == 'Near-Surface Air Temperature')
+        assert(vattrs['pr']['units'] == 'kg m-2 s-1')
+        assert(vattrs['time'] == attrs_orig[1]['time'])
+    with AttributeBackupStore(att_dir) as store:
+        assert(store.files_under(str(tmpdir)) == sorted(ifiles))
+
+    # Filling again does not change anything, restoring gives the original attributes
+    assert([len(changes) for _, changes, _ in attribute_plan.fill_files(ifiles, plan, att_dir)] == [0, 0])
+    list(attribute_plan.fill_files(ifiles, plan, att_dir, restore_in=True))
+    for ifile in ifiles:
+        gattrs, vattrs = read_attrs(ifile)
+        assert(gattrs == attrs_orig[0])
+        assert(gattrs['nominal_resolution'].dtype == np.int32)
+        assert(set(vattrs) == {'tas', 'pr', 'time'})
+        assert(vattrs['tas'] == attrs_orig[1]['tas'])
+
+    # Errors are reported per file
+    ifile_invalid = os.path.join(str(tmpdir), 'invalid.nc')
+    with open(ifile_invalid, 'w') as f:
+        f.write('no netCDF')
+    results = list(attribute_plan.fill_files([ifile_invalid], plan, att_dir))
+    assert(results[0][1] is None and results[0][2])
+
+
+def test_fill_files_parallel(tmpdir, monkeypatch):
+    # Hand out single files, so that both workers write to the backup store
+    monkeypatch.setattr(attribute_plan, 'FILL_CHUNK_SIZE', 1)
+    att_dir = str(tmpdir.mkdir('csv'))
+    write_csvs(att_dir)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    ifiles = []
+    for nfile in range(6):
+        ifiles.append(os.path.join(str(tmpdir), f'test_{nfile}.nc'))
+        write_file(ifiles[-1], ['NETCDF4', 'NETCDF3_CLASSIC'][nfile % 2])
+    attrs_orig = {ifile: read_attrs(ifile) for ifile in ifiles}
+    ifile_invalid = os.path.join(str(tmpdir), 'invalid.nc')
+    with open(ifile_invalid, 'w') as f:
+        f.write('no netCDF')
+
+    results = {ifile: (changes, error) for ifile, changes, error
+               in attribute_plan.fill_files(ifiles[:3] + [ifile_invalid] + ifiles[3:], plan, att_dir, njobs_in=2)}
+    assert(set(results) == set(ifiles + [ifile_invalid]))
+    # The invalid file is reported without stopping the other files
+    changes, error = results.pop(ifile_invalid)
+    assert(changes is None and error)
+    assert(all(error is None and len(changes) > 0 for changes, error in results.values()))
+    for ifile in ifiles:
+        gattrs, vattrs = read_attrs(ifile)
+        assert(set(gattrs) == {'Conventions', 'history'})
+        assert(gattrs['history'] == plan.time_string + 'filled\n created')
+        assert(vattrs['air_temperature']['long_name'] == 'Near-Surface Air Temperature')
+        assert(vattrs['pr']['units'] == 'kg m-2 s-1')
+
+    # All workers wrote their backups into the same store
+    with AttributeBackupStore(att_dir, read_only_in=True) as store:
+        assert(store.files_under(str(tmpdir)) == sorted(ifiles))
+        for ifile in ifiles:
+            backup = store.get(ifile)
+            assert(backup['global_attr'] == attrs_orig[ifile][0])
+            assert({var: backup[var] for var in attrs_orig[ifile][1]} == attrs_orig[ifile][1])
+
+    results = list(attribute_plan.fill_files(ifiles, plan, att_dir, restore_in=True, njobs_in=2))
+    assert([error for _, _, error in results] == [None] * len(ifiles))
+    for ifile in ifiles:
+        assert(read_attrs(ifile) == attrs_orig[ifile])
+
+
+def test_define_mode(tmpdir, monkeypatch):
+    att_dir = str(tmpdir.mkdir('csv'))
+    write_csvs(att_dir)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    ifile = os.path.join(str(tmpdir), 'test.nc')
+    write_file(ifile, 'NETCDF3_CLASSIC')
+
+    # Count how often define mode is actually left, i.e. the header is written
+    enddefs = []
+    enddef = attribute_plan.DefineModeDataset._enddef
+
+    def count_enddef(ds_in):
+        if not ds_in.__dict__.get('_keep_define_mode'):
+            enddefs.append(ds_in.filepath())
+        enddef(ds_in)
+    monkeypatch.setattr(attribute_plan.DefineModeDataset, '_enddef', count_enddef)
+
+    (_, changes, error), = attribute_plan.fill_files([ifile], plan, att_dir)
+    assert(error is None and len(changes) > 1)
+    assert(enddefs == [ifile])
+    gattrs, vattrs = read_attrs(ifile)
+    assert(set(gattrs) == {'Conventions', 'history'})
+    assert(vattrs['air_temperature']['long_name'] == 'Near-Surface Air Temperature')
+
+
+def test_fill_files_dry_run(tmpdir):
+    att_dir = str(tmpdir.mkdir('csv'))
+    write_csvs(att_dir)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    ifile = os.path.join(str(tmpdir), 'test.nc')
+    write_file(ifile, 'NETCDF4')
+    attrs_orig = read_attrs(ifile)
+    mtime = os.path.getmtime(ifile)
+
+    (_, changes, error), = attribute_plan.fill_files([ifile], plan, os.path.join(att_dir, 'attr_backup'),
+                                                     dry_run_in=True)
+    assert(error is None)
+    assert(read_attrs(ifile) == attrs_orig and os.path.getmtime(ifile) == mtime)
+    assert(not os.path.exists(os.path.join(att_dir, 'attr_backup')))
+    record = json.loads(json.dumps(changes.to_record(ifile)))
+    assert(record['renames'] == [['tas', 'air_temperature']])
+    assert(record['set']['air_temperature'] == {'long_name': 'Near-Surface Air Temperature'})
+    # The global attributes are rewritten to bring them into alphabetical order
+    assert(record['delete']['global_attr'] == ['history', 'source', 'nominal_resolution'])
+    assert(list(record['set']['global_attr']) == ['Conventions', 'history'])
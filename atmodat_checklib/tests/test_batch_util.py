@@ -0,0 +1,27 @@
+"""
+test_batch_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.batch_util module.
+"""
+
+import os
+import atmodat_checklib.utils.batch_util as batch_util
+
+
+def test_cost_batches():
+    costs = {f'small{n}.nc': 0.01 for n in range(12)}
+    costs.update({'large.nc': 0.5})
+    file_infos = [(ifile, ifile[:-3]) for ifile in ['small0.nc', 'large.nc'] + [f'small{n}.nc' for n in range(1, 12)]]
+    batches = list(batch_util.cost_batches(iter(file_infos), 0.05, 64, costs.get))
+    assert(sorted(sum(batches, [])) == sorted(file_infos))
+    assert([('large.nc', 'large')] in batches)
+    assert([len(batch) for batch in batches] == [1, 5, 5, 2])
+    assert(max(len(batch) for batch in batch_util.cost_batches(file_infos, 1., 4, costs.get)) == 4)
+
+
+def test_file_cost(tmpdir):
+    ifile = os.path.join(str(tmpdir), 'file.nc')
+    with open(ifile, 'wb') as f:
+        f.write(b'\0' * 2 ** 20)
+    assert(batch_util.file_cost(ifile) == batch_util.FILE_COST_BASE + batch_util.FILE_COST_PER_MB)
+    assert(batch_util.file_cost(os.path.join(str(tmpdir), 'missing.nc')) == batch_util.FILE_COST_BASE)
@@ -0,0 +1,62 @@
+"""
+test_benchmark_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.benchmark_util module.
+"""
+
+import json
+import os
+from netCDF4 import Dataset
+import atmodat_checklib.utils.benchmark_util as benchmark
+from atmodat_checklib.utils.output_directory_util import iter_netcdf_files
+
+
+def test_generate_corpus(tmpdir):
+    opath = str(tmpdir.join('corpus'))
+    manifest = benchmark.generate_corpus(opath, 5, nattrs_in=25, nvars_in=2, invalid_fraction_in=0.5,
+                                         files_per_dir_in=2, seed_in=1)
+    ifiles = sorted(iter_netcdf_files(opath))
+    assert(len(ifiles) == 5)
+    assert(len({os.path.dirname(ifile) for ifile in ifiles}) == 3)
+    assert(benchmark.load_corpus_manifest(opath) == manifest)
+    assert(0 < len(manifest['invalid_files']) < 5)
+
+    for nfile, ifile in enumerate(ifiles):
+        with Dataset(ifile) as ds:
+            assert(sorted(ds.variables) == ['lat', 'lon', 'time', 'var0', 'var1'])
+            if nfile in manifest['invalid_files']:
+                # Three attributes are either removed or replaced by an invalid value
+                invalid_attrs = [attr for attr in ds.ncattrs()
+                                 if str(ds.getncattr(attr)) == str(benchmark.INVALID_GLOBAL_ATTRS.get(attr))]
+                assert(25 - len(ds.ncattrs()) + len(invalid_attrs) == 3)
+                assert(any(ds.variables[var].units == 'no_unit' for var in ['var0', 'var1']))
+            else:
+                assert(len(ds.ncattrs()) == 25)
+                assert(ds.getncattr('extra_attribute_24') == 'Additional attribute 24')
+                assert(ds.variables['var1'].standard_name == 'air_pressure')
+
+    # The corpus only depends on the parameters
+    manifest_again = benchmark.generate_corpus(str(tmpdir.join('corpus_again')), 5, nattrs_in=25, nvars_in=2,
+                                               invalid_fraction_in=0.5, files_per_dir_in=2, seed_in=1)
+    assert(manifest_again == manifest)
+
+
+def test_compare_results(tmpdir):
+    results = benchmark.BenchmarkResults({'nfiles': 10})
+    results.add_stage('atmodat', [2., 1.], 10)
+    results.add_micro('split_value_unit', 1000, 0.002)
+    ofile = str(tmpdir.join('benchmark.json'))
+    results.write(ofile)
+    with open(ofile) as f:
+        baseline = json.load(f)
+    assert(baseline['stages']['atmodat'] == {'seconds': 1., 'runs': [2., 1.], 'files': 10, 'files_per_second': 10.})
+    assert(baseline['micro']['split_value_unit']['seconds_per_call'] == 2e-6)
+
+    results.add_stage('atmodat', [1.5], 10)
+    results.add_stage('CF', [1.], 10)
+    results.add_micro('split_value_unit', 1000, 0.0021)
+    comparison = benchmark.compare_results(baseline, results.results, tolerance_in=0.1)
+    assert([(name, regression) for name, _, _, _, regression in comparison]
+           == [('stages:atmodat', True), ('micro:split_value_unit', False)])
+    assert(comparison[0][3] == 1.5)
+    assert(abs(comparison[1][3] - 1.05) < 1e-9)
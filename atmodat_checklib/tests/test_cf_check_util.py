@@ -0,0 +1,72 @@
+"""
+test_cf_check_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.cf_check_util module.
+"""
+
+import os
+import pytest
+from netCDF4 import Dataset
+from atmodat_checklib.utils.env_util import set_env_variables
+
+udunits2_xml_path, pyessv_archive_home = set_env_variables()
+os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+from atmodat_checklib.utils.cf_check_util import PersistentCFChecker, results_record  # noqa: E402
+
+# Minimal CF tables, so that the tests do not download the tables
+CF_TABLES = {
+    'CF_STANDARD_NAMES': '<?xml version="1.0"?>\n<standard_name_table><version_number>79</version_number>'
+                         '<last_modified>2022-03-19T15:25:54Z</last_modified><entry id="air_temperature">'
+                         '<canonical_units>K</canonical_units><grib></grib><amip></amip><description></description>'
+                         '</entry></standard_name_table>\n',
+    'CF_AREA_TYPES': '<?xml version="1.0"?>\n<area_type_table><version_number>10</version_number><date>2020</date>'
+                     '<entry id="land"><description></description></entry></area_type_table>\n',
+    'CF_REGION_NAMES': '<?xml version="1.0"?>\n<standardized_region_list><version_number>4</version_number>'
+                       '<date>2018</date><entry id="global"></entry></standardized_region_list>\n'}
+
+
+@pytest.fixture(autouse=True)
+def cf_tables(tmpdir, monkeypatch):
+    for variable, table in CF_TABLES.items():
+        ofile = str(tmpdir.join(variable.lower() + '.xml'))
+        with open(ofile, 'w') as f:
+            f.write(table)
+        monkeypatch.setenv(variable, ofile)
+
+
+def test_persistent_cf_checker_auto_version(tmpdir):
+    cf_checker = PersistentCFChecker('auto')
+    std_name_table = None
+    for cf_version in ['1.6', '1.8', '1.6']:
+        ifile = str(tmpdir.join('cf_' + cf_version + '.nc'))
+        with Dataset(ifile, 'w') as ds:
+            ds.setncattr('Conventions', 'CF-' + cf_version)
+        ofile = str(tmpdir.join('cf_' + cf_version + '_CF_result.txt'))
+        results = cf_checker.check_file(ifile, ofile)
+
+        with open(ofile) as f_cf:
+            output_cf = f_cf.read()
+        assert(output_cf.startswith('CHECKING NetCDF FILE: ' + ifile))
+        assert('Checking against CF Version CF-' + cf_version in output_cf)
+        assert(len(results['global']['ERROR']) == output_cf.count('\nERROR:'))
+
+        # Tables are parsed only once and results of previous files are not kept
+        std_name_table = std_name_table or cf_checker.std_name_table
+        assert(cf_checker.std_name_table is std_name_table)
+        assert(len(cf_checker.all_results) == 1)
+
+
+def test_results_record(tmpdir):
+    ifile = str(tmpdir.join('cf_record.nc'))
+    with Dataset(ifile, 'w') as ds:
+        ds.setncattr('Conventions', 'CF-1.8')
+        ds.createDimension('time', 1)
+        ds.createVariable('tas', 'f4', ('time',)).setncattr('units', 'no_unit')
+    cf_checker = PersistentCFChecker('auto')
+    results = cf_checker.check_file(ifile, str(tmpdir.join('cf_record_CF_result.txt')))
+    record = results_record(results)
+    assert(record['version'] == 'CF-1.8')
+    assert(record['std_name_table'] == '79')
+    assert(len(record['errors']) == len(results['global']['ERROR']) + len(results['variables']['tas']['ERROR']))
+    assert(['tas', results['variables']['tas']['ERROR'][0]] in record['errors'])
+    assert(cf_checker.check_record(ifile) == record)
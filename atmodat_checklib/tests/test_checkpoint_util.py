@@ -0,0 +1,95 @@
+"""
+test_checkpoint_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.checkpoint_util module.
+"""
+
+import json
+import os
+import pytest
+import atmodat_checklib.utils.checkpoint_util as checkpoint_util
+from atmodat_checklib.utils.checkpoint_util import CheckpointJournal
+
+SETTINGS = {'input': '/data', 'check_types': ['atmodat']}
+
+
+def write_output(opath_run_in, name_in):
+    ofile = os.path.join(opath_run_in, 'atmodat', name_in + '_atmodat_result.json')
+    with open(ofile, 'w') as f:
+        json.dump({'name': name_in}, f)
+    return ofile
+
+
+def load_record(check_in, ofile_in):
+    with open(ofile_in) as f:
+        return json.load(f)
+
+
+def test_checkpoint_journal(tmpdir):
+    opath_run = str(tmpdir.mkdir('run'))
+    os.mkdir(os.path.join(opath_run, 'atmodat'))
+    journal = CheckpointJournal(opath_run, SETTINGS)
+    for n in range(3):
+        name = f'file{n}'
+        journal.add({'file': f'/data/{name}.nc', 'name': name}, {'atmodat': write_output(opath_run, name)})
+    journal.close()
+    # An interrupted write and a removed output file
+    with open(os.path.join(opath_run, checkpoint_util.CHECKPOINT_FILE), 'a') as f:
+        f.write('{"file": "/data/file3.nc", "na')
+    os.remove(os.path.join(opath_run, 'atmodat', 'file1_atmodat_result.json'))
+    assert(checkpoint_util.find_resumable_run(str(tmpdir)) == os.path.join(opath_run, ''))
+
+    with pytest.raises(RuntimeError):
+        CheckpointJournal(opath_run, dict(SETTINGS, input='/other'))
+    journal = CheckpointJournal(opath_run, SETTINGS)
+    records = journal.finished_files(load_record)
+    assert(sorted(records) == ['/data/file0.nc', '/data/file2.nc'])
+    assert(records['/data/file2.nc'] == {'file': '/data/file2.nc', 'name': 'file2', 'atmodat': {'name': 'file2'}})
+    journal.add({'file': '/data/file3.nc', 'name': 'file3', 'atmodat': {}})
+    journal.finish(4)
+
+    journal = CheckpointJournal(opath_run, SETTINGS)
+    journal.close()
+    assert(journal.complete)
+    assert(journal.finished_files(load_record)['/data/file3.nc']['atmodat'] == {})
+    with pytest.raises(RuntimeError):
+        checkpoint_util.find_resumable_run(str(tmpdir))
+
+
+def test_checkpoint_journal_records(tmpdir):
+    opath_run = str(tmpdir.mkdir('run'))
+    os.mkdir(os.path.join(opath_run, 'atmodat'))
+    os.mkdir(os.path.join(opath_run, 'CF'))
+    settings = dict(SETTINGS, check_types=['atmodat', 'CF'])
+    journal = CheckpointJournal(opath_run, settings)
+    for n, cf_record in enumerate([{'errors': []}, None]):
+        name = f'file{n}'
+        ofile_cf = os.path.join(opath_run, 'CF', name + '_CF_result.txt')
+        open(ofile_cf, 'w').close()
+        journal.add({'file': f'/data/{name}.nc', 'name': name, 'atmodat': {'name': name}, 'CF': cf_record},
+                    {'atmodat': write_output(opath_run, name), 'CF': ofile_cf}, ['CF'])
+    journal.close()
+
+    # The CF records are taken from the journal; files with failed CF checks are checked again
+    journal = CheckpointJournal(opath_run, settings)
+    journal.close()
+    assert(journal.finished_files(load_record) == {'/data/file0.nc': {'file': '/data/file0.nc', 'name': 'file0',
+                                                                      'atmodat': {'name': 'file0'},
+                                                                      'CF': {'errors': []}}})
+
+
+def test_checkpoint_journal_stream(tmpdir):
+    opath_run = str(tmpdir.mkdir('run'))
+    settings = dict(SETTINGS, check_types=['atmodat', 'CF'])
+    journal = CheckpointJournal(opath_run, settings)
+    for n, records in enumerate([({'name': 'file0'}, None), (None, None), (None, {'errors': []})]):
+        name = f'file{n}'
+        journal.add({'file': f'/data/{name}.nc', 'name': name, 'atmodat': records[0], 'CF': records[1]})
+    journal.close()
+
+    # Files whose checks all failed are checked again, as in per-file mode
+    journal = CheckpointJournal(opath_run, settings)
+    journal.close()
+    assert(sorted(journal.finished_files(load_record)) == ['/data/file0.nc', '/data/file2.nc'])
+    with open(os.path.join(opath_run, checkpoint_util.CHECKPOINT_FILE)) as f:
+        assert('file1' not in f.read())
@@ -0,0 +1,96 @@
+"""
+test_daemon_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.daemon_util module.
+"""
+
+import multiprocessing
+import os
+import stat
+import threading
+import time
+import pytest
+import atmodat_checklib.utils.daemon_util as daemon
+
+
+class RecordChecker(object):
+    """FileChecker which only records the checked files"""
+
+    check_types = ['atmodat']
+
+    def check_file_record(self, ifile_in, filename_base_in):
+        if filename_base_in.startswith('slow'):
+            time.sleep(1)
+        return {'file': ifile_in, 'name': filename_base_in, 'atmodat': {'pid': os.getpid()}}, 0
+
+
+def test_checker_daemon(tmpdir):
+    ifile = os.path.join(str(tmpdir), 'test_file.nc')
+    open(ifile, 'w').close()
+    socket_path = os.path.join(str(tmpdir), 'daemon.sock')
+    service = daemon.CheckerService(RecordChecker(), 2)
+    server = daemon.CheckUnixHTTPServer(socket_path, service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, record = daemon.request_check(socket_path, ifile)
+        assert(status == 200)
+        assert(record['file'] == ifile and record['name'] == 'test_file')
+        assert(record['atmodat']['pid'] != os.getpid())
+        assert(record['elapsed'] >= 0)
+
+        assert(daemon.request_check(socket_path, os.path.join(str(tmpdir), 'missing.nc'))[0] == 404)
+        assert(daemon.request(socket_path, 'POST', '/check', {'path': ifile})[0] == 400)
+        assert(daemon.request(socket_path, 'GET', '/unknown')[0] == 404)
+
+        status, info = daemon.request(socket_path, 'GET', '/status')
+        assert(status == 200)
+        assert(info['checked'] == 1 and info['pending'] == 0 and info['jobs'] == 2)
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_checker_service_timeout(tmpdir, monkeypatch):
+    monkeypatch.setattr(daemon, 'PENDING_PER_WORKER', 1)
+    monkeypatch.setattr(daemon, 'REQUEST_TIMEOUT', 0.1)
+    service = daemon.CheckerService(RecordChecker(), 1)
+    try:
+        with pytest.raises(multiprocessing.TimeoutError):
+            service.check(os.path.join(str(tmpdir), 'slow.nc'))
+        # The slot of the request which timed out is held while the worker is still busy with it
+        assert(service.check(os.path.join(str(tmpdir), 'fast.nc')) is None)
+        assert(service.status()['pending'] == 1)
+        time.sleep(1.5)
+        monkeypatch.setattr(daemon, 'REQUEST_TIMEOUT', 10)
+        assert(service.check(os.path.join(str(tmpdir), 'fast.nc'))['name'] == 'fast')
+        status = service.status()
+        assert((status['checked'], status['failed'], status['rejected'], status['pending']) == (1, 1, 1, 0))
+    finally:
+        service.close()
+
+
+def test_unix_socket_path(tmpdir):
+    service = daemon.CheckerService(RecordChecker(), 1)
+    try:
+        # A regular file is not replaced by the socket
+        socket_path = os.path.join(str(tmpdir), 'daemon.sock')
+        open(socket_path, 'w').close()
+        with pytest.raises(RuntimeError):
+            daemon.CheckUnixHTTPServer(socket_path, service)
+        assert(os.path.isfile(socket_path))
+
+        # A socket left behind by an earlier daemon is replaced
+        os.remove(socket_path)
+        daemon.CheckUnixHTTPServer(socket_path, service).server_close()
+        assert(stat.S_ISSOCK(os.lstat(socket_path).st_mode))
+        daemon.CheckUnixHTTPServer(socket_path, service).server_close()
+    finally:
+        service.close()
+
+
+def test_is_loopback():
+    assert(daemon.is_loopback('127.0.0.1') and daemon.is_loopback('::1') and daemon.is_loopback('localhost'))
+    assert(not daemon.is_loopback('0.0.0.0') and not daemon.is_loopback('') and not daemon.is_loopback('::'))
+    assert(not daemon.is_loopback('192.0.2.1'))
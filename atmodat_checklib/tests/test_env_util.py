@@ -0,0 +1,52 @@
+"""
+test_env_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.env_util module.
+"""
+
+import os
+import atmodat_checklib.utils.env_util as env_util
+
+
+def test_resolve_environment(tmpdir, monkeypatch):
+    bin_paths = [str(tmpdir.mkdir(name).mkdir('bin')) for name in ['a', 'b']]
+    udunits_path = os.path.join(str(tmpdir), 'b', 'share', 'udunits')
+    os.makedirs(udunits_path)
+    monkeypatch.setenv('PATH', ':'.join(bin_paths))
+    monkeypatch.setenv(env_util.ENV_CACHE_VARIABLE, os.path.join(str(tmpdir), 'cache', 'env.json'))
+    monkeypatch.delenv('UDUNITS2_XML_PATH', raising=False)
+
+    environment = env_util.resolve_environment()
+    assert(environment['source'] == 'scan')
+    assert(environment['udunits2_xml_path'] == os.path.join(udunits_path, 'udunits2.xml'))
+    assert(env_util.resolve_environment()['source'] == 'cache')
+    assert(env_util.set_env_variables() == (environment['udunits2_xml_path'], environment['atmodat_cvs']))
+
+    # Stale when the udunits directory or $PATH change
+    mtime = os.stat(udunits_path).st_mtime
+    os.utime(udunits_path, (mtime + 10, mtime + 10))
+    assert(env_util.resolve_environment()['source'] == 'scan')
+    assert(env_util.resolve_environment()['source'] == 'cache')
+    monkeypatch.setenv('PATH', bin_paths[1])
+    assert(env_util.resolve_environment()['source'] == 'scan')
+
+    # UDUNITS2_XML_PATH takes precedence over the cache
+    monkeypatch.setenv('UDUNITS2_XML_PATH', '/opt/udunits2.xml')
+    environment = env_util.resolve_environment()
+    assert(environment['source'] == 'cache, UDUNITS2_XML_PATH')
+    assert(environment['udunits2_xml_path'] == '/opt/udunits2.xml')
+
+
+def test_read_cv_revision(tmpdir):
+    atmodat_cvs = str(tmpdir.mkdir('AtMoDat_CVs'))
+    git_dir = tmpdir.mkdir('modules')
+    with open(os.path.join(atmodat_cvs, '.git'), 'w') as f:
+        f.write('gitdir: ../modules\n')
+    git_dir.join('HEAD').write('ref: refs/heads/master\n')
+    assert(env_util.read_cv_revision(atmodat_cvs)[0] is None)
+    git_dir.join('packed-refs').write('0123abcd refs/heads/master\n')
+    assert(env_util.read_cv_revision(atmodat_cvs)[0] == '0123abcd')
+    git_dir.mkdir('refs').mkdir('heads').join('master').write('4567ef01\n')
+    revision, files = env_util.read_cv_revision(atmodat_cvs)
+    assert(revision == '4567ef01')
+    assert(os.path.join(atmodat_cvs, '../modules', 'HEAD') in files)
@@ -0,0 +1,40 @@
+"""
+test_fill_attributes.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.fill_attributes.fill_attributes module.
+"""
+
+import os
+import pytest
+from netCDF4 import Dataset
+from atmodat_checklib.utils.fill_attributes.fill_attributes import run_fill_attributes
+from atmodat_checklib.utils.result_stream_util import read_result_stream
+
+
+def test_run_fill_attributes_manifest(tmpdir):
+    att_dir = str(tmpdir.mkdir('csv'))
+    with open(os.path.join(att_dir, 'mandatory_attributes.csv'), 'w') as f:
+        f.write('attribute,use,append,string\n')
+        f.write('Conventions,true,false,CF-1.8 ATMODAT-3.0\n')
+    ipath = str(tmpdir.mkdir('data'))
+    for n, conventions in enumerate(['CF-1.8 ATMODAT-3.0', 'CF-1.6']):
+        with Dataset(os.path.join(ipath, f'file{n}.nc'), 'w') as ds:
+            ds.setncattr('Conventions', conventions)
+
+    # Only the file with a change is listed in the manifest and modified when applying it
+    manifest = os.path.join(str(tmpdir), 'changes.jsonl.gz')
+    assert(run_fill_attributes(att_dir, None, ipath, dry_run=manifest) == [])
+    records = list(read_result_stream(manifest))
+    assert(records[0]['restore'] is False)
+    assert([record['file'] for record in records[1:]] == [os.path.join(ipath, 'file1.nc')])
+    mtime = os.path.getmtime(os.path.join(ipath, 'file0.nc'))
+    run_fill_attributes(att_dir, None, None, apply=manifest)
+    assert(os.path.getmtime(os.path.join(ipath, 'file0.nc')) == mtime)
+    with Dataset(os.path.join(ipath, 'file1.nc')) as ds:
+        assert(ds.Conventions == 'CF-1.8 ATMODAT-3.0')
+
+    with pytest.raises(RuntimeError):
+        run_fill_attributes(att_dir, None, None, restore=True, apply=manifest)
+    run_fill_attributes(att_dir, None, ipath, restore=True)
+    with Dataset(os.path.join(ipath, 'file1.nc')) as ds:
+        assert(ds.Conventions == 'CF-1.6')
@@ -0,0 +1,51 @@
+"""
+test_nc_batch_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.nc_batch_util module.
+"""
+
+import numpy as np
+import os
+from netCDF4 import Dataset
+from atmodat_checklib.utils.env_util import set_env_variables
+
+udunits2_xml_path, pyessv_archive_home = set_env_variables()
+os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+from atmodat_checklib.utils import nc_util, nc_batch_util  # noqa: E402
+
+
+attribute_values = [{'Conventions': 'CF-1.8 ATMODAT-3.0', 'creation_date': '2022-06-23T10:00:00Z',
+                     'geospatial_lat_resolution': '0.1 degree', 'version': 'v1'},
+                    {'Conventions': 'CF-1.4', 'creation_date': '23.06.2022', 'geospatial_lat_resolution': '10 km',
+                     'version': np.int32(1)},
+                    {'Conventions': 'CF-1.8 ATMODAT-3.0', 'creation_date': '2022-06-23T10:00:00Z',
+                     'geospatial_lat_resolution': '10 xyz', 'version': ''},
+                    {'creation_date': '', 'geospatial_lat_resolution': 'point', 'version': 2.5},
+                    {'Conventions': 'ATMODAT-2.0', 'version': 'v1'}]
+
+
+def test_batch_checks_match_single_file_checks(tmpdir):
+    ifiles = []
+    for nf, attrs in enumerate(attribute_values):
+        ifiles.append(str(tmpdir.join(f'tmp{nf}.nc')))
+        with Dataset(ifiles[-1], 'w') as ds:
+            ds.setncatts(attrs)
+
+    columns = nc_batch_util.read_attribute_columns(ifiles, ['Conventions', 'creation_date',
+                                                            'geospatial_lat_resolution', 'version'])
+    batch_scores = [nc_batch_util.check_conventions_version_number(columns['Conventions'], 'CF', 1.4, 1.8),
+                    nc_batch_util.check_conventions_version_number(columns['Conventions'], 'ATMODAT', 3.0, 3.0),
+                    nc_batch_util.check_global_attr_iso8601(columns['creation_date']),
+                    nc_batch_util.check_global_attribute_resolution_format(columns['geospatial_lat_resolution'])]
+    batch_scores += [nc_batch_util.check_global_attr_type(columns['version'], attr_type)
+                     for attr_type in ['str', 'int', 'float', 'list']]
+
+    for nf, ifile in enumerate(ifiles):
+        with Dataset(ifile, 'r') as ds:
+            scores = [nc_util.check_conventions_version_number(ds, 'Conventions', 'CF', 1.4, 1.8),
+                      nc_util.check_conventions_version_number(ds, 'Conventions', 'ATMODAT', 3.0, 3.0),
+                      nc_util.check_global_attr_iso8601(ds, 'creation_date'),
+                      nc_util.check_global_attribute_resolution_format(ds, 'geospatial_lat_resolution')]
+            scores += [nc_util.check_global_attr_type(ds, 'version', attr_type)
+                       for attr_type in ['str', 'int', 'float', 'list']]
+        assert([batch_score[nf] for batch_score in batch_scores] == scores)
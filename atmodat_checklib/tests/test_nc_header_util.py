@@ -0,0 +1,56 @@
+"""
+test_nc_header_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.nc_header_util module.
+"""
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+from atmodat_checklib.utils import nc_header_util
+from atmodat_checklib.utils.nc_header_util import read_header
+
+
+def write_file(ifile, file_format):
+    with Dataset(ifile, 'w', format=file_format) as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('lat', 3)
+        var = ds.createVariable('tas', 'f4', ('time', 'lat'))
+        var.units = 'K'
+        var[0, :] = [280., 281., 282.]
+        ds.title = 'Test file ä'
+        ds.empty = ''
+        ds.Conventions = 'CF-1.8 ATMODAT-3.0'
+        ds.version_int = np.int32(3)
+        ds.version_float = 2.5
+        ds.levels = np.array([1, 2, 3], dtype='i2')
+
+
+@pytest.mark.parametrize('file_format', ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET', 'NETCDF3_64BIT_DATA',
+                                         'NETCDF4_CLASSIC', 'NETCDF4'])
+@pytest.mark.parametrize('use_h5py', [True, False])
+def test_read_header(tmpdir, monkeypatch, file_format, use_h5py):
+    if not use_h5py:
+        monkeypatch.setattr(nc_header_util, 'h5py', None)
+    elif nc_header_util.h5py is None:
+        pytest.skip('h5py not installed')
+    ifile = str(tmpdir.join('tmp.nc'))
+    write_file(ifile, file_format)
+
+    header = read_header(ifile)
+    with Dataset(ifile, 'r') as ds:
+        assert(header.ncattrs() == ds.ncattrs())
+        for attr in ds.ncattrs():
+            assert(type(getattr(header, attr)) is type(getattr(ds, attr)))
+            assert(np.array_equal(header.getncattr(attr), ds.getncattr(attr)))
+    assert(header.filepath() == ifile)
+    with pytest.raises(AttributeError):
+        getattr(header, 'missing')
+
+
+def test_read_header_no_netcdf(tmpdir):
+    ifile = str(tmpdir.join('tmp.nc'))
+    with open(ifile, 'w') as f:
+        f.write('no netCDF file')
+    with pytest.raises(ValueError):
+        read_header(ifile)
@@ -0,0 +1,33 @@
+"""
+test_nc_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.nc_util module.
+"""
+
+import os
+import pytest
+from atmodat_checklib.utils.env_util import set_env_variables
+
+udunits2_xml_path, pyessv_archive_home = set_env_variables()
+os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+from atmodat_checklib.utils import nc_util  # noqa: E402
+
+
+@pytest.mark.parametrize('string_in, value_exists, val_unit_dict', [
+    ('0.1 degree', True, {0.1: ['degree']}),
+    ('10km', True, {'10': ['km']}),
+    ('10km x', True, {'10': ['km', 'x']}),
+    ('10 km 5 m', True, {10.0: ['km', 'm'], 5.0: ['m']}),
+    ('10km 5 m', True, {'10': ['km'], 5.0: ['m']}),
+    ('1_000 m', True, {1000.0: ['m']}),
+    ('degree', False, None)])
+def test_split_value_unit(string_in, value_exists, val_unit_dict):
+    assert(nc_util.check_value_exists(string_in) == value_exists)
+    if value_exists:
+        assert(nc_util.split_value_unit(string_in) == val_unit_dict)
+
+
+@pytest.mark.parametrize('string_in, score', [('point', 4), ('km', 1), ('10', 2), ('10 xyz', 3), ('0.1 degree', 4),
+                                              ('10km', 4)])
+def test_value_unit_format_conformity(string_in, score):
+    assert(nc_util.value_unit_format_conformity(string_in) == score)
@@ -0,0 +1,91 @@
+"""
+test_output_directory_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.output_directory_util module.
+"""
+
+import os
+import pytest
+import atmodat_checklib.utils.output_directory_util as output_directory
+from atmodat_checklib.utils.output_directory_util import iter_netcdf_files, peek_first, prefetch
+
+
+def create_tree(tmpdir):
+    for rel_path in ['a.nc', 'a.txt', 'day/b.nc', 'day/deep/c.nc', 'mon/d.nc', 'mon/e.nc4']:
+        tmpdir.ensure(rel_path)
+    return str(tmpdir)
+
+
+def relative_paths(files, input_path):
+    return sorted(os.path.relpath(f, input_path) for f in files)
+
+
+def test_iter_netcdf_files(tmpdir):
+    input_path = create_tree(tmpdir)
+    files = relative_paths(iter_netcdf_files(input_path), input_path)
+    assert(files == ['a.nc', 'day/b.nc', 'day/deep/c.nc', 'mon/d.nc'])
+    files = relative_paths(iter_netcdf_files(input_path, max_depth=0), input_path)
+    assert(files == ['a.nc'])
+    files = relative_paths(iter_netcdf_files(input_path, max_depth=1), input_path)
+    assert(files == ['a.nc', 'day/b.nc', 'mon/d.nc'])
+    files = relative_paths(iter_netcdf_files(input_path, include=['day/*']), input_path)
+    assert(files == ['day/b.nc', 'day/deep/c.nc'])
+    files = relative_paths(iter_netcdf_files(input_path, exclude=['day/deep', 'mon']), input_path)
+    assert(files == ['a.nc', 'day/b.nc'])
+
+
+def test_iter_netcdf_files_symlinks(tmpdir):
+    input_path = create_tree(tmpdir)
+    # Symbolic links to directories are not followed: neither loops nor duplicates
+    os.symlink('..', os.path.join(input_path, 'day', 'up'))
+    os.symlink('day', os.path.join(input_path, 'day_link'))
+    os.symlink(os.path.join('day', 'b.nc'), os.path.join(input_path, 'b_link.nc'))
+    files = relative_paths(iter_netcdf_files(input_path), input_path)
+    assert(files == ['a.nc', 'b_link.nc', 'day/b.nc', 'day/deep/c.nc', 'mon/d.nc'])
+
+
+def test_iter_netcdf_files_unreadable(tmpdir, monkeypatch):
+    input_path = create_tree(tmpdir)
+    scandir = os.scandir
+
+    def scandir_unreadable(path):
+        if os.path.basename(path) == 'day':
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+    monkeypatch.setattr(os, 'scandir', scandir_unreadable)
+    # Like os.walk, unreadable directories are skipped
+    with pytest.warns(UserWarning, match='Skipping directory'):
+        files = relative_paths(iter_netcdf_files(input_path), input_path)
+    assert(files == ['a.nc', 'mon/d.nc'])
+
+
+def test_peek_first(tmpdir):
+    # A tree without netCDF files fails before any file is used
+    tmpdir.ensure('empty', 'a.txt')
+    with pytest.raises(RuntimeError):
+        peek_first(iter_netcdf_files(str(tmpdir.join('empty'))))
+    input_path = create_tree(tmpdir.mkdir('tree'))
+    files = relative_paths(peek_first(iter_netcdf_files(input_path)), input_path)
+    assert(files == ['a.nc', 'day/b.nc', 'day/deep/c.nc', 'mon/d.nc'])
+    assert(list(peek_first([])) == [])
+
+
+def test_iter_netcdf_files_errors(tmpdir):
+    tmpdir.ensure('a.txt')
+    with pytest.raises(RuntimeError):
+        list(iter_netcdf_files(str(tmpdir)))
+    tmpdir.ensure('b.NC')
+    with pytest.raises(RuntimeError):
+        list(prefetch(iter_netcdf_files(str(tmpdir))))
+
+
+def test_prefetch():
+    assert(list(prefetch(range(100), maxsize=2)) == list(range(100)))
+
+
+def test_create_directories(tmpdir):
+    opath_runs = [output_directory.create_directories(str(tmpdir), ['atmodat', 'CF']) for _ in range(3)]
+    assert(len(set(opath_runs)) == 3)
+    for opath_run in opath_runs:
+        assert(opath_run.endswith(os.sep))
+        assert(os.path.isdir(os.path.join(opath_run, 'atmodat')) and os.path.isdir(os.path.join(opath_run, 'CF')))
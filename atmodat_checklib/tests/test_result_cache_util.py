@@ -0,0 +1,101 @@
+"""
+test_result_cache_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.result_cache_util module.
+"""
+
+import os
+from atmodat_checklib.utils import result_cache_util
+from atmodat_checklib.utils.result_cache_util import ResultCache
+
+
+def write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_result_cache_reuse_and_invalidation(tmpdir):
+    ifile = str(tmpdir.join('tmp.nc'))
+    ofile = str(tmpdir.join('tmp_CF_result.txt'))
+    write_file(ifile, 'netcdf')
+    for strict in [False, True]:
+        cache = ResultCache(str(tmpdir.join('cache_' + str(strict))), {'cf_version': 'auto'}, strict=strict)
+        key = cache.key(ifile, 'CF')
+        assert(not cache.restore(key, [ofile]))
+
+        write_file(ofile, 'result')
+        cache.store(key, [ofile])
+        os.remove(ofile)
+        assert(cache.restore(key, [ofile]))
+        with open(ofile) as f:
+            assert(f.read() == 'result')
+
+        # Different check type or versions lead to different keys
+        assert(key != cache.key(ifile, 'atmodat'))
+        assert(key != ResultCache(cache.cache_dir, {'cf_version': '1.8'}, strict=strict).key(ifile, 'CF'))
+
+    # Records of the results are stored along with the output files
+    key_record = cache.key(ifile, 'CF:.txt')
+    cache.store(key_record, [ofile], {'errors': [[None, 'error']]})
+    assert(cache.restore(key_record, [ofile]))
+    assert(cache.restore_record(key_record) == {'errors': [[None, 'error']]})
+    assert(cache.restore_record(key) is None)
+
+    # Changed file content invalidates the cache entry
+    write_file(ifile, 'netcdf changed')
+    assert(key != cache.key(ifile, 'CF'))
+
+
+def test_result_cache_eviction(tmpdir):
+    cache = ResultCache(str(tmpdir.join('cache')), {}, max_size_mb=1)
+    ofile = str(tmpdir.join('tmp_CF_result.txt'))
+    write_file(ofile, 'x' * 400 * 1024)
+    keys = []
+    for nf in range(4):
+        ifile = str(tmpdir.join(f'tmp{nf}.nc'))
+        write_file(ifile, str(nf))
+        keys.append(cache.key(ifile, 'CF'))
+        cache.store(keys[-1], [ofile])
+        os.utime(os.path.join(cache.cache_dir, keys[-1][:2], keys[-1]), (nf, nf))
+
+    assert(cache.evict() <= 1024 * 1024)
+    assert(not cache.restore(keys[0], [ofile]))
+    assert(not cache.restore(keys[1], [ofile]))
+    assert(cache.restore(keys[3], [ofile]))
+
+
+def test_result_cache_strict_hash_once(tmpdir, monkeypatch):
+    ifile = str(tmpdir.join('tmp.nc'))
+    write_file(ifile, 'netcdf')
+    hashed = []
+    monkeypatch.setattr(result_cache_util, 'file_content_hash', lambda path: hashed.append(path) or 'hash')
+    cache = ResultCache(str(tmpdir.join('cache')), {}, strict=True)
+    file_key = cache.file_key(ifile)
+    keys = [cache.key(ifile, check) for check in ['atmodat', 'CF']] + [cache.key(ifile, 'CF', file_key)]
+    assert(hashed == [ifile] and keys[0] != keys[1] and keys[1] == keys[2])
+    # A changed file is hashed again
+    write_file(ifile, 'netcdf changed')
+    os.utime(ifile, ns=(0, 0))
+    cache.key(ifile, 'CF')
+    assert(hashed == [ifile, ifile])
+
+
+def test_result_cache_replace_incomplete_entry(tmpdir):
+    cache = ResultCache(str(tmpdir.join('cache')), {})
+    ifile = str(tmpdir.join('tmp.nc'))
+    ofiles = [str(tmpdir.join('tmp_atmodat_result.json')), str(tmpdir.join('tmp_atmodat_result.txt'))]
+    write_file(ifile, 'netcdf')
+    key = cache.key(ifile, 'atmodat')
+    # Entry with only one of the output files
+    write_file(ofiles[0], 'json')
+    cache.store(key, ofiles[:1])
+    assert(not cache.restore(key, ofiles))
+
+    write_file(ofiles[1], 'txt')
+    cache.store(key, ofiles)
+    for ofile in ofiles:
+        os.remove(ofile)
+    assert(cache.restore(key, ofiles))
+    with open(ofiles[1]) as f:
+        assert(f.read() == 'txt')
+    assert(os.listdir(os.path.join(cache.cache_dir, key[:2])) == [key])
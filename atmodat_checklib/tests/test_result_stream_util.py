@@ -0,0 +1,23 @@
+"""
+test_result_stream_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.result_stream_util module.
+"""
+
+import os
+from atmodat_checklib.utils.result_stream_util import ResultStreamWriter, read_result_stream
+
+
+def test_result_stream_roundtrip(tmpdir):
+    records = [{'file': '/data/a.nc', 'name': 'a', 'CF': {'version': 'CF-1.8', 'errors': [[None, 'ä']]}},
+               {'file': '/data/b.nc', 'name': 'b', 'CF': None}]
+    for stream_format in ['jsonl', 'jsonl.gz']:
+        ofile = os.path.join(str(tmpdir), 'results.' + stream_format)
+        with ResultStreamWriter(ofile) as result_stream:
+            for record in records:
+                result_stream.write(record)
+        assert(result_stream.nrecords == 2)
+        assert(list(read_result_stream(ofile)) == records)
+
+    with open(os.path.join(str(tmpdir), 'results.jsonl'), encoding='utf-8') as f:
+        assert(len(f.readlines()) == 2)
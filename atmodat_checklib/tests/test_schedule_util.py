@@ -0,0 +1,53 @@
+"""
+test_schedule_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.schedule_util module.
+"""
+
+import os
+import pytest
+import atmodat_checklib.utils.schedule_util as schedule_util
+from atmodat_checklib.utils.timing_util import TIMING_FILES_FILE
+
+
+def write_file(ofile_in, magic_in, size_in):
+    with open(ofile_in, 'wb') as f:
+        f.write(magic_in + b'\0' * (size_in - len(magic_in)))
+    return ofile_in
+
+
+def test_list_makespan():
+    assert(schedule_util.list_makespan([1., 1., 1., 1., 4.], 2) == 6.)
+    assert(schedule_util.list_makespan([4., 1., 1., 1., 1.], 2) == 4.)
+
+
+def test_fit_cost_model():
+    points = [(size, 0.01 + 0.5 * size) for size in range(schedule_util.MIN_FIT_FILES)]
+    base, per_mb = schedule_util.fit_cost_model(points)
+    assert(base == pytest.approx(0.01) and per_mb == pytest.approx(0.5))
+    assert(schedule_util.fit_cost_model(points[1:]) is None)
+
+
+def test_load_file_timings(tmpdir):
+    for run, elapsed in [('run1', 1.), ('run2', 2.)]:
+        tmpdir.mkdir(run).join(TIMING_FILES_FILE).write(f'File,Wall [s],CPU [s]\n/data/a.nc,{elapsed},0.5\n')
+        os.utime(os.path.join(str(tmpdir), run, TIMING_FILES_FILE), (int(run[-1]), int(run[-1])))
+    assert(schedule_util.load_file_timings(str(tmpdir)) == {'/data/a.nc': 2.})
+    assert(schedule_util.load_file_timings(str(tmpdir), os.path.join(str(tmpdir), 'run2')) == {'/data/a.nc': 1.})
+
+
+def test_lpt_schedule(tmpdir):
+    ifiles = [write_file(os.path.join(str(tmpdir), 'small.nc'), schedule_util.CLASSIC_MAGIC + b'\x01', 100),
+              write_file(os.path.join(str(tmpdir), 'timed.nc'), schedule_util.CLASSIC_MAGIC + b'\x01', 100),
+              write_file(os.path.join(str(tmpdir), 'large.nc'), schedule_util.HDF5_MAGIC, 4 * 2 ** 20)]
+    assert(schedule_util.file_format(ifiles[0]) == 'classic' and schedule_util.file_format(ifiles[2]) == 'netcdf4')
+    file_infos = [(ifile, os.path.basename(ifile)[:-3]) for ifile in ifiles]
+    schedule = schedule_util.LPTSchedule(file_infos, 2, {os.path.abspath(ifiles[1]): 10.})
+    assert([ifile for ifile, _ in schedule.file_infos] == [ifiles[1], ifiles[2], ifiles[0]])
+    assert(schedule.cost(ifiles[1]) == 10. and schedule.files_timed == 1)
+
+    report = schedule.report(12., {1: [2, 11., 0]}, {ifile: 1. for ifile in ifiles})
+    assert(report['files'] == 3 and report['predicted_makespan'] == 10.)
+    assert(report['lower_bound'] == 10. and report['actual_total'] == 3. and report['actual_makespan'] == 12.)
+    schedule_util.write_schedule_report(str(tmpdir), report)
+    assert(os.path.isfile(os.path.join(str(tmpdir), schedule_util.SCHEDULE_REPORT_FILE)))
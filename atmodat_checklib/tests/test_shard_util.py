@@ -0,0 +1,63 @@
+"""
+test_shard_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.shard_util module.
+"""
+
+import os
+import pytest
+import atmodat_checklib.utils.shard_util as shard_util
+from atmodat_checklib.utils.summary_creation_util import SummaryAggregator
+
+
+def atmodat_summary(license_in, passed_in):
+    return {'testname': 'atmodat_standard_checker:3.0',
+            'high_priorities': [{'name': 'Global attribute: license', 'value': [2, 2] if passed_in else [0, 2],
+                                 'msgs': [license_in if passed_in else "Global attribute 'license' missing"]}],
+            'medium_priorities': [], 'low_priorities': []}
+
+
+def test_select_shard():
+    ifiles = [f'/data/dir{n % 7}/file{n}.nc' for n in range(200)]
+    shards = [list(shard_util.select_shard(ifiles, shard, 4)) for shard in range(4)]
+    assert(sorted(sum(shards, [])) == sorted(ifiles))
+    assert(all(shards))
+    assert(shard_util.shard_of('/data/./dir1/file1.nc', 4) == shard_util.shard_of('/data/dir1/file1.nc', 4))
+    assert(shard_util.parse_shard('3/16') == (3, 16))
+    with pytest.raises(RuntimeError):
+        shard_util.parse_shard('16/16')
+
+
+def test_read_file_manifest(tmpdir):
+    ifile = os.path.join(str(tmpdir), 'files.txt')
+    with open(ifile, 'w') as f:
+        f.write('# files\n/data/a.nc\n\n  /data/b.nc \n')
+    assert(list(shard_util.read_file_manifest(ifile)) == ['/data/a.nc', '/data/b.nc'])
+
+
+def test_merge_shard_results(tmpdir):
+    summary_all = SummaryAggregator(['atmodat'])
+    for shard in range(3):
+        summary = SummaryAggregator(['atmodat'])
+        for n in range(2):
+            summary.add_atmodat_summary(atmodat_summary(f'License {shard}', n == 0), f'file{shard}_{n}.nc')
+            summary_all.add_atmodat_summary(atmodat_summary(f'License {shard}', n == 0), f'file{shard}_{n}.nc')
+        opath = str(tmpdir.mkdir(shard_util.shard_dir_name(shard, 3)))
+        shard_util.write_shard_result(opath, shard, 3, '/data', 2, summary)
+        if shard == 0:
+            os.symlink(opath, os.path.join(str(tmpdir), 'latest'))
+
+    ifiles = shard_util.find_shard_results(str(tmpdir))
+    assert(len(ifiles) == 3)
+    summary, file_counter = shard_util.merge_shard_results(ifiles)
+    assert(file_counter == 6)
+    assert(summary.to_dict() == summary_all.to_dict())
+
+    # All shards of the same run are needed
+    with pytest.raises(RuntimeError):
+        shard_util.merge_shard_results(ifiles[1:])
+    summary, file_counter = shard_util.merge_shard_results(ifiles[1:], allow_missing_in=True)
+    assert(file_counter == 4)
+    shard_util.write_shard_result(str(tmpdir), 0, 2, '/data', 2, SummaryAggregator(['atmodat']))
+    with pytest.raises(RuntimeError):
+        shard_util.merge_shard_results(ifiles + [os.path.join(str(tmpdir), shard_util.SHARD_RESULT_FILE)])
@@ -0,0 +1,56 @@
+"""
+test_startup.py
+======================
+Startup time of the entry points: --help and --version must not import the checkers or numerical libraries.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pytest
+
+base_path = str(Path(__file__).resolve().parents[2])
+entry_points = ['run_checks.py', 'merge_shards.py', 'run_checks_daemon.py',
+                os.path.join('atmodat_checklib', 'utils', 'fill_attributes', 'fill_attributes.py')]
+# Modules which are only imported on the code paths that use them
+heavy_modules = ['numpy', 'pandas', 'netCDF4', 'compliance_checker', 'cfchecker', 'cfunits', 'pyessv', 'yaml']
+# Maximum startup time of an entry point on top of the startup time of the interpreter
+startup_budget = 0.1
+
+
+def run_python(args_in):
+    """wall time of the fastest of three runs of the interpreter with `args_in`"""
+    env = dict(os.environ, PYTHONPATH=base_path)
+    elapsed = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable] + args_in, cwd=base_path, env=env, check=True, stdout=subprocess.DEVNULL)
+        elapsed.append(time.perf_counter() - start_time)
+    return min(elapsed)
+
+
+@pytest.mark.parametrize('entry_point', entry_points)
+def test_no_heavy_imports(entry_point):
+    module = os.path.splitext(os.path.basename(entry_point))[0]
+    code = (f'import sys; sys.path.insert(0, {os.path.dirname(os.path.join(base_path, entry_point))!r}); '
+            f'import {module}; print(",".join(m for m in {heavy_modules!r} if m in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=base_path, env=dict(os.environ, PYTHONPATH=base_path),
+                            check=True, capture_output=True, text=True).stdout.strip()
+    assert(output == '')
+
+
+@pytest.mark.parametrize('args', [['run_checks.py', '--version'], ['run_checks.py', '--help'],
+                                  [entry_points[-1], '--help']])
+def test_startup_budget(args):
+    assert(run_python(args) - run_python(['-c', 'pass']) < startup_budget)
+
+
+@pytest.mark.parametrize('entry_point', ['run_checks.py', 'run_checks_daemon.py'])
+def test_help_skips_environment(entry_point, tmpdir):
+    # The environment is only resolved (and its cache written) after the command line has been parsed
+    env_cache = str(tmpdir.join('env.json'))
+    subprocess.run([sys.executable, entry_point, '--help'], cwd=base_path, check=True, stdout=subprocess.DEVNULL,
+                   env=dict(os.environ, PYTHONPATH=base_path, ATMODAT_ENV_CACHE=env_cache))
+    assert(not os.path.exists(env_cache))
@@ -0,0 +1,116 @@
+"""
+test_summary_creation_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.summary_creation_util module.
+"""
+
+import csv
+import json
+import os
+from atmodat_checklib.utils.summary_creation_util import SummaryAggregator
+
+
+def write_atmodat_result(opath, file_base, values):
+    checks = [{'name': 'Global attribute: license', 'weight': 3, 'value': values[0], 'children': [],
+               'msgs': ['CC-BY-4.0'] if values[0][0] == values[0][1] else ["'license' global attribute is empty"]},
+              {'name': 'Global attribute: title', 'weight': 3, 'value': values[1], 'children': [],
+               'msgs': [] if values[1][0] == values[1][1] else ["'title' global attribute is not present"]}]
+    result = {'source_name': file_base + '.nc', 'testname': 'atmodat_standard:3.0', 'high_priorities': checks,
+              'medium_priorities': [], 'low_priorities': []}
+    ofile = os.path.join(opath, file_base + '_atmodat_result.json')
+    with open(ofile, 'w') as f:
+        json.dump({file_base + '.nc': {'atmodat_standard:3.0': result}}, f)
+    return ofile
+
+
+def cf_record(cf_version, n_errors, n_warns):
+    return {'version': 'CF-' + cf_version, 'std_name_table': '79', 'fatal': [],
+            'errors': [[None, '(2.6.1) bla']] * n_errors, 'warnings': [['tas', '(3.1) bla']] * n_warns}
+
+
+def write_cf_result(opath, file_base, cf_version, n_errors, n_warns):
+    ofile = os.path.join(opath, file_base + '_CF_record.json')
+    with open(ofile, 'w') as f:
+        json.dump(cf_record(cf_version, n_errors, n_warns), f)
+    return ofile
+
+
+def write_cf_text_result(opath, file_base, cf_version, n_errors, n_warns):
+    ofile = os.path.join(opath, file_base + '_CF_result.txt')
+    with open(ofile, 'w') as f:
+        f.write(f'CHECKING NetCDF FILE: {file_base}.nc\n=====================\n')
+        f.write(f'Checking against CF Version CF-{cf_version}\nUsing Standard Name Table Version 79 (2022-03-19)\n')
+        f.write('ERROR: (2.6.1) bla\n' * n_errors + 'WARN: (3.1) bla\n' * n_warns)
+        f.write(f'\nERRORS detected: {n_errors}\nWARNINGS given: {n_warns}\n')
+    return ofile
+
+
+def test_summary_aggregator(tmpdir):
+    opath = str(tmpdir)
+    summary = SummaryAggregator(['atmodat', 'CF'])
+    summary.add_result_file(write_atmodat_result(opath, 'b', [(4, 4), (0, 4)]))
+    summary.add_result_file(write_atmodat_result(opath, 'a', [(2, 4), (4, 4)]))
+    summary.add_result_file(write_cf_result(opath, 'a', '1.8', 2, 1))
+    summary.add_result_file(write_cf_result(opath, 'b', '1.8', 1, 0))
+    summary.write(2, opath)
+
+    with open(os.path.join(opath, 'short_summary.txt')) as f:
+        short_summary = f.read()
+    assert('Checking against: ATMODAT Standard 3.0, CF Version 1.8' in short_summary)
+    assert('Mandatory ATMODAT Standard checks passed: 2/4 (1 missing, 1 error(s))' in short_summary)
+    assert('CF checker errors: 3\n' in short_summary)
+    assert('CF checker warnings: 1' in short_summary)
+
+    with open(os.path.join(opath, 'summary_used_licences.txt')) as f:
+        assert(f.read() == 'CC-BY-4.0 \n')
+
+    with open(os.path.join(opath, 'long_summary_mandatory.csv')) as f:
+        rows = list(csv.reader(f))
+    assert(rows == [['File', 'Check level', 'Global Attribute', 'Error Message'], ['', '', '', ''],
+                    ['a.nc', 'mandatory', 'license', 'global attribute is empty'], ['', '', '', ''],
+                    ['b.nc', 'mandatory', 'title', 'global attribute is not present']])
+
+
+def test_summary_aggregator_records(tmpdir):
+    opath_files, opath_records = str(tmpdir.mkdir('files')), str(tmpdir.mkdir('records'))
+    summary_files = SummaryAggregator(['atmodat', 'CF'])
+    summary_records = SummaryAggregator(['atmodat', 'CF'])
+    for file_base, values, n_errors in [('a', [(2, 4), (4, 4)], 2), ('b', [(4, 4), (0, 4)], 1)]:
+        atmodat_result = write_atmodat_result(opath_files, file_base, values)
+        summary_files.add_result_file(atmodat_result)
+        summary_files.add_result_file(write_cf_result(opath_files, file_base, '1.8', n_errors, 1))
+        with open(atmodat_result) as f:
+            atmodat_record = json.load(f)[file_base + '.nc']['atmodat_standard:3.0']
+        summary_records.add_record({'file': file_base + '.nc', 'name': file_base, 'atmodat': atmodat_record,
+                                    'CF': cf_record('1.8', n_errors, 1)})
+    summary_files.write(2, opath_files)
+    summary_records.write(2, opath_records)
+
+    for ofile in ['short_summary.txt', 'summary_used_licences.txt', 'long_summary_mandatory.csv']:
+        with open(os.path.join(opath_files, ofile)) as f_files, open(os.path.join(opath_records, ofile)) as f_records:
+            content_files = [line for line in f_files if 'Checked at' not in line]
+            assert(content_files == [line for line in f_records if 'Checked at' not in line])
+
+
+def test_summary_aggregator_cf_records(tmpdir):
+    summary = SummaryAggregator(['CF'])
+    record = cf_record('1.6', 1, 2)
+    record['errors'] += [['lev_bnds', '(4.3.3): formula_terms attribute is not allowed'],
+                         [None, '(3.1): Invalid attribute name: _CoordinateAxisType']]
+    summary.add_record({'file': 'a.nc', 'name': 'a', 'CF': record})
+    # Records of files whose checks failed do not contain results
+    summary.add_record({'file': 'b.nc', 'name': 'b', 'CF': None})
+    assert((summary.cf_errors, summary.cf_warns) == (1, 2))
+    assert(summary.cf_versions == {'CF-1.6'})
+    assert(summary.cf_to_be_ignored_errors == {'formula_terms': True, 'invalid_attribute_name': True})
+
+
+def test_summary_aggregator_cf_text_results(tmpdir):
+    opath = str(tmpdir)
+    summary = SummaryAggregator(['CF'])
+    # Text output is only read for files without a CF checker record
+    for ofile in [write_cf_result(opath, 'a', '1.8', 2, 1), write_cf_text_result(opath, 'a', '1.8', 2, 1),
+                  write_cf_text_result(opath, 'b', '1.8', 3, 2)]:
+        summary.add_result_file(ofile)
+    assert((summary.cf_errors, summary.cf_warns) == (5, 3))
+    assert(summary.cf_versions == {'CF-1.8'} and summary.std_name_table == '79')
@@ -0,0 +1,60 @@
+"""
+test_timing_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.timing_util module.
+"""
+
+import csv
+import json
+import os
+import time
+import atmodat_checklib.utils.timing_util as timing
+from atmodat_checklib.utils.timing_util import TimingRecorder
+
+
+def test_timing_recorder():
+    recorder = TimingRecorder()
+    with recorder.stage('summary') as elapsed:
+        time.sleep(0.01)
+    assert(elapsed[0] >= 0.01)
+    assert(list(recorder.timed_iter('discovery', ['a.nc', 'b.nc'])) == ['a.nc', 'b.nc'])
+    assert(recorder.stages['discovery'][0] == 3)
+    recorder.add_check('a (FooCheck)', 0.5, 0.25)
+    recorder.add_check('a (FooCheck)', 0.5, 0.25)
+    recorder.add_file('a.nc', 2., 1., {'atmodat': 1.5, 'CF': 0.5})
+    assert(recorder.checks['a (FooCheck)'] == [2, 1., 0.5])
+
+    # Timings of other processes are merged via JSON
+    worker = TimingRecorder()
+    worker.merge(json.loads(json.dumps(recorder.to_dict())))
+    worker.add_file('b.nc', 3., 1., {'atmodat': 3.})
+    report = worker.report(5.)
+    assert(report['files'] == 2)
+    assert(report['stages']['summary']['count'] == 1)
+    assert(report['slowest_checks'] == {'a (FooCheck)': {'calls': 2, 'wall': 1., 'cpu': 0.5}})
+    assert([file_timings['file'] for file_timings in report['slowest_files']] == ['b.nc', 'a.nc'])
+
+
+def test_write_timing_report(tmpdir):
+    opath = str(tmpdir)
+    timing.timings.clear()
+    timing.timings.add_file('a.nc', 2., 1., {'atmodat': 1.5, 'CF': 0.5})
+    timing_file = os.path.join(opath, timing.TIMING_REPORT_FILE + '.json')
+    worker_timings = {'stages': {'check: CF': [1, 0.5, 0.5]}, 'checks': {}, 'files': [['b.nc', 1., 1., {'CF': 1.}]]}
+    with open(timing.worker_timing_file(timing_file, 1234), 'w') as f:
+        json.dump(worker_timings, f)
+    timing.merge_worker_timings(timing_file)
+    assert(not os.path.isfile(timing.worker_timing_file(timing_file, 1234)))
+
+    timing.write_timing_report(opath, 3.)
+    with open(timing_file) as f:
+        report = json.load(f)
+    assert(report['total_wall'] == 3.)
+    assert(report['stages']['check: CF']['wall'] == 0.5)
+    with open(os.path.join(opath, timing.TIMING_REPORT_FILE + '.txt')) as f:
+        assert('2.0000 s (CPU 1.0000 s; atmodat: 1.5000 s, CF: 0.5000 s) a.nc' in f.read())
+    with open(os.path.join(opath, timing.TIMING_FILES_FILE)) as f:
+        rows = list(csv.reader(f))
+    assert(rows == [['File', 'Wall [s]', 'CPU [s]', 'CF wall [s]', 'atmodat wall [s]'],
+                    ['a.nc', '2.0', '1.0', '0.5', '1.5'], ['b.nc', '1.0', '1.0', '1.0', '']])
+    timing.timings.clear()
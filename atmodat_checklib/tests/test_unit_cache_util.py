@@ -0,0 +1,57 @@
+"""
+test_unit_cache_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.unit_cache_util module.
+"""
+
+import json
+import os
+from atmodat_checklib.utils.env_util import set_env_variables
+from atmodat_checklib.utils import unit_cache_util as unit_cache
+from atmodat_checklib.utils.unit_cache_util import LRUCache
+
+udunits2_xml_path, pyessv_archive_home = set_env_variables()
+os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put('km', True)
+    cache.put('m', True)
+    assert(cache.get('km'))
+    cache.put('xyz', False)
+    assert(cache.get('m') is None)
+    assert(cache.get('xyz') is False)
+    assert(cache.stats() == {'hits': 2, 'misses': 1, 'size': 2, 'maxsize': 2, 'hit_rate': 2 / 3})
+
+
+def test_unit_table(tmpdir):
+    unit_table = str(tmpdir.join(unit_cache.UNIT_TABLE_FILE))
+    unit_cache.unit_validity.clear()
+    unit_cache.resolution_scores.clear()
+    unit_cache.unit_validity.put('km', True)
+    unit_cache.resolution_scores.put('10 km', 4)
+    unit_cache.save_unit_table(unit_table)
+    unit_cache.save_unit_table(unit_cache.worker_table_file(unit_table, 1))
+
+    unit_cache.unit_validity.clear()
+    unit_cache.resolution_scores.clear()
+    assert(unit_cache.load_unit_table(unit_table))
+    assert(unit_cache.unit_validity.get('km'))
+    assert(unit_cache.resolution_scores.get('10 km') == 4)
+
+    # Tables of worker processes are merged and removed
+    unit_cache.resolution_scores.clear()
+    unit_cache.merge_worker_tables(unit_table)
+    assert(unit_cache.resolution_scores.get('10 km') == 4)
+    assert(not os.path.isfile(unit_cache.worker_table_file(unit_table, 1)))
+
+    # Tables of other versions are ignored
+    with open(unit_table) as f:
+        table = json.load(f)
+    table['info']['cfunits'] = '0.0'
+    with open(unit_table, 'w') as f:
+        json.dump(table, f)
+    unit_cache.unit_validity.clear()
+    assert(not unit_cache.load_unit_table(unit_table))
+    assert(unit_cache.unit_validity.get('km') is None)
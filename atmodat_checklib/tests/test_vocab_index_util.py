@@ -0,0 +1,78 @@
+"""
+test_vocab_index_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.vocab_index_util module.
+"""
+
+import numpy as np
+from netCDF4 import Dataset
+from atmodat_checklib.utils import vocab_index_util
+from atmodat_checklib.utils.vocab_index_util import VocabIndex
+
+
+class CountingVocabs(object):
+    """vocabulary with the interface of ESSVocabs.check_global_attribute that counts its lookups"""
+
+    def __init__(self, terms):
+        self.terms = terms
+        self.lookups = 0
+
+    def check_global_attribute(self, ds, attr, vocab_lookup='canonical_name'):
+        self.lookups += 1
+        if attr not in ds.ncattrs():
+            return 0
+        return 2 if str(ds.getncattr(attr)) in self.terms else 1
+
+
+def write_file(ifile, **kwargs):
+    ds = Dataset(ifile, 'w')
+    ds.setncatts(kwargs)
+    return ds
+
+
+def test_vocab_index(tmpdir):
+    index = VocabIndex()
+    vocabs = CountingVocabs(['point', 'timeSeries'])
+    index.vocabs[('atmodat', 'atmodat')] = vocabs
+    ifile = str(tmpdir.join('tmp.nc'))
+    for feature_type, score in [('point', 2), ('trajectory', 1), ('point', 2), ('trajectory', 1), (None, 0),
+                                (np.array([1, 2]), 1)]:
+        attrs = {'featureType': feature_type} if feature_type is not None else {}
+        with write_file(ifile, **attrs) as ds:
+            assert(index.check_global_attribute(ds, 'featureType', 'atmodat:atmodat', 'featureType:label') == score)
+    assert(vocabs.lookups == 3)
+    assert(index.stats()['hits'] == 2)
+
+
+def test_vocab_snapshot(tmpdir, monkeypatch):
+    cv_path = tmpdir.mkdir('AtMoDat_CVs')
+    cv_path.mkdir('.git').join('HEAD').write('0123abcd\n')
+    monkeypatch.setenv('PYESSV_ARCHIVE_HOME', str(cv_path.join('pyessv-archive')))
+    monkeypatch.setattr(vocab_index_util, 'vocab_index', VocabIndex())
+    snapshot = str(tmpdir.join(vocab_index_util.VOCAB_SNAPSHOT_FILE))
+    key = ('atmodat:atmodat', 'featureType', 'featureType:label', 'str', 'point')
+    key_int = ('atmodat:atmodat', 'nominal_resolution', 'canonical_name', 'int32', np.int32(25))
+    vocab_index_util.vocab_index.scores[key] = 2
+    vocab_index_util.vocab_index.scores[key_int] = 1
+    # Values which cannot be written to the JSON snapshot are left out
+    vocab_index_util.vocab_index.scores[key[:-1] + (float('nan'),)] = 1
+    vocab_index_util.save_vocab_snapshot(vocab_index_util.worker_snapshot_file(snapshot, 1))
+
+    vocab_index_util.vocab_index.scores.clear()
+    vocab_index_util.merge_worker_snapshots(snapshot)
+    assert(vocab_index_util.vocab_index.scores == {key: 2, key_int: 1})
+    assert(vocab_index_util.vocab_index.scores.get(key_int[:-1] + (np.int32(25),)) == 1)
+    vocab_index_util.save_vocab_snapshot(snapshot)
+
+    # Invalid snapshots are ignored
+    invalid_snapshot = str(tmpdir.join('invalid.json'))
+    for content in ['{"info": ', '[]', '{"scores": 1}']:
+        with open(invalid_snapshot, 'w') as f:
+            f.write(content)
+        assert(not vocab_index_util.load_vocab_snapshot(invalid_snapshot))
+
+    # Snapshots of other revisions of the vocabularies are ignored
+    vocab_index_util.vocab_index.scores.clear()
+    cv_path.join('.git', 'HEAD').write('4567ef01\n')
+    assert(not vocab_index_util.load_vocab_snapshot(snapshot))
+    assert(not vocab_index_util.vocab_index.scores)
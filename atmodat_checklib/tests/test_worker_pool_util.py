@@ -0,0 +1,62 @@
+"""
+test_worker_pool_util.py
+======================
+Unit tests for the contents of the atmodat_checklib.utils.worker_pool_util module.
+"""
+
+import os
+import atmodat_checklib.utils.worker_pool_util as worker_pool
+from atmodat_checklib.utils import batch_util
+
+
+class RecordChecker(object):
+    """FileChecker which only records the checked files and fails on files named bad*"""
+
+    check_types = ['atmodat']
+
+    def check_file_record(self, ifile_in, filename_base_in):
+        if filename_base_in.startswith('bad'):
+            raise ValueError('cannot check ' + filename_base_in)
+        return {'file': ifile_in, 'name': filename_base_in, 'atmodat': {'pid': os.getpid()}}, 1
+
+
+def test_run_checks_parallel(tmpdir, capsys):
+    names = ['good_0', 'good_1', 'bad_2', 'good_3', 'good_4', 'good_5', 'good_6']
+    file_infos = [(os.path.join(str(tmpdir), name + '.nc'), name) for name in names]
+    records = {}
+
+    def file_done(filename_base, record):
+        records[filename_base] = record
+
+    # Batches of three files, the failing file shares its batch with two others
+    worker_stats = worker_pool.run_checks_parallel(iter(file_infos), 2, RecordChecker(), file_done_callback=file_done,
+                                                   stream_in=True,
+                                                   cost_func_in=lambda _: batch_util.BATCH_COST / 3)
+
+    good = [name for name in names if name != 'bad_2']
+    assert(sorted(records) == good)
+    for ifile, name in file_infos:
+        if name in records:
+            assert(records[name]['file'] == ifile)
+            assert(records[name]['atmodat']['pid'] in worker_stats)
+    assert(os.getpid() not in worker_stats and 1 <= len(worker_stats) <= 2)
+    assert(sum(stats[0] for stats in worker_stats.values()) == len(good))
+    assert(sum(stats[2] for stats in worker_stats.values()) == len(good))
+    assert(all(stats[1] >= 0 for stats in worker_stats.values()))
+    assert(capsys.readouterr().out.splitlines() == [f'Checking {file_infos[2][0]}: cannot check bad_2'])
+
+
+def test_run_checks_parallel_callback_error(tmpdir, capsys):
+    file_infos = [(os.path.join(str(tmpdir), f'good_{nfile}.nc'), f'good_{nfile}') for nfile in range(4)]
+    done = []
+
+    def file_done(filename_base, record):
+        if filename_base == 'good_1':
+            raise KeyError(filename_base)
+        done.append(filename_base)
+
+    worker_stats = worker_pool.run_checks_parallel(file_infos, 2, RecordChecker(), file_done_callback=file_done,
+                                                   stream_in=True)
+    assert(sorted(done) == ['good_0', 'good_2', 'good_3'])
+    assert(sum(stats[0] for stats in worker_stats.values()) == 4)
+    assert('Processing results of good_1 failed' in capsys.readouterr().out)
@@ -0,0 +1,127 @@
+"""module atmodat_check_util.py to run the AtMoDat checks in-process"""
+
+import importlib
+import io
+import json
+import os
+import time
+import yaml
+from compliance_checker.base import BaseCheck, BaseNCCheck
+from compliance_checker.runner import ComplianceChecker, stdout_redirector
+from compliance_checker.suite import CheckSuite
+from netCDF4 import Dataset
+from atmodat_checklib.utils.nc_header_util import NCHeader, read_header
+from atmodat_checklib.utils.timing_util import timings
+
+ATMODAT_CHECKS_YML = 'atmodat_standard_checks.yml'
+# Same strictness as the default of the compliance-checker command line ('normal')
+CHECKER_LIMIT = 2
+
+
+def get_check_class(check_name):
+    """
+    Import the check class referenced in the YAML check definitions,
+    e.g. 'atmodat_checklib.register.GlobalAttrTypeCheck'.
+    """
+    module_name, class_name = check_name.rsplit('.', 1)
+    return importlib.import_module(module_name).get_check_class(class_name)
+
+
+def make_check_method(check, name_in):
+    """
+    wrap a check object into a check method of a compliance-checker checker class; the time spent in the check is
+    recorded as `name_in` in timing_util.timings
+    """
+    def check_method(self, ds):
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            return check(ds)
+        finally:
+            timings.add_check(name_in, time.perf_counter() - start_wall, time.thread_time() - start_cpu)
+    return check_method
+
+
+def load_checker_class(ifile_yml_in):
+    """
+    Parse YAML check definitions and build the compliance-checker checker class from them.
+    The check objects are created only once and reused for every dataset.
+    """
+    with open(ifile_yml_in, 'r', encoding='utf-8') as f_yml:
+        config = yaml.safe_load(f_yml)
+
+    suite_name = config['suite_name']
+    spec, spec_version = suite_name.split(':')
+    class_properties = {'_cc_spec': spec, '_cc_spec_version': spec_version,
+                        '_cc_description': config.get('description', ''), '_cc_url': ''}
+
+    for check_info in config['checks']:
+        check_cls = get_check_class(check_info['check_name'])
+        check = check_cls(check_info.get('parameters', {}), level=check_info.get('check_level', 'HIGH'),
+                          vocabulary_ref=check_info.get('vocabulary_ref', None))
+        class_properties['check_' + check_info['check_id']] = make_check_method(
+            check, f"{check_info['check_id']} ({check_cls.__name__})")
+
+    # The checks only use global attributes, so they can also run on the header of a file
+    class_properties['supported_ds'] = BaseNCCheck.supported_ds | {NCHeader}
+    checker_class = type(spec + '_check', (BaseNCCheck, BaseCheck), class_properties)
+    return suite_name, checker_class
+
+
+class AtmodatChecker(object):
+    """
+    In-process replacement for calls of 'compliance-checker --y atmodat_standard_checks.yml'.
+
+    The check suite is loaded once and afterwards applied to any number of files. The output files
+    are identical to those created by the compliance-checker command line with '-f json_new -f text'.
+    With `header_only_in`, only the global attributes are read from the files instead of opening them as
+    netCDF4 Dataset.
+    """
+
+    def __init__(self, idiryml_in, header_only_in=False):
+        self.header_only = header_only_in
+        self.suite_name, checker_class = load_checker_class(os.path.join(idiryml_in, ATMODAT_CHECKS_YML))
+        CheckSuite.checkers[self.suite_name] = checker_class
+        self.check_suite = CheckSuite()
+
+    def run(self, ds, source_name):
+        """run all checks on an opened dataset and return the scored groups"""
+        score_groups = self.check_suite.run(ds, None, self.suite_name)
+        if not score_groups:
+            raise ValueError(f'No checks found for {source_name}')
+        return score_groups
+
+    def run_file(self, ifile_in):
+        open_file = read_header if self.header_only else Dataset
+        with open_file(ifile_in) as ds:
+            return self.run(ds, ifile_in)
+
+    def result_record(self, ifile_in, score_groups_in):
+        """results of the checks of a file in the structure of the json output"""
+        groups, _ = score_groups_in[self.suite_name]
+        return self.check_suite.dict_output(self.suite_name, groups, ifile_in, CHECKER_LIMIT)
+
+    def check_record(self, ifile_in):
+        """check a single file and return the results in the structure of the json output"""
+        score_groups = self.run_file(ifile_in)
+        record = self.result_record(ifile_in, score_groups)
+        ComplianceChecker.check_errors(score_groups, 0)
+        return record
+
+    def check_file(self, ifile_in, ofile_json_in, text_output=True):
+        """
+        check a single file, write json (and text) output of the checks and return the results in the
+        structure of the json output
+        """
+        score_groups = self.run_file(ifile_in)
+        record = self.result_record(ifile_in, score_groups)
+
+        # Same as ComplianceChecker.json_output with 'json_new', without evaluating the results twice
+        with io.open(ofile_json_in, 'w', encoding='utf8') as f_json:
+            f_json.write(json.dumps({ifile_in: {self.suite_name: record}}, indent=2, ensure_ascii=False))
+        if text_output:
+            ofile_text = '{}.txt'.format(os.path.splitext(ofile_json_in)[0])
+            with io.open(ofile_text, 'w', encoding='utf-8') as f_text:
+                with stdout_redirector(f_text):
+                    ComplianceChecker.stdout_output(self.check_suite, {ifile_in: score_groups}, 0, CHECKER_LIMIT)
+        ComplianceChecker.check_errors(score_groups, 0)
+        return record
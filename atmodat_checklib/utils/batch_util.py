@@ -0,0 +1,48 @@
+"""module batch_util.py to group the files of a run into batches of similar estimated checking time"""
+
+import os
+
+# Estimated time in seconds to check a file: fixed part (opening the file, checking its header) and part per MB
+FILE_COST_BASE = 0.003
+FILE_COST_PER_MB = 0.002
+# Estimated checking time of a batch of files handed to a worker process at once
+BATCH_COST = 0.05
+# Maximum number of files of a batch
+BATCH_MAX_FILES = 64
+
+
+def estimate_cost(size_in):
+    """estimated time in seconds to check a file of `size_in` bytes"""
+    return FILE_COST_BASE + FILE_COST_PER_MB * size_in / 2 ** 20
+
+
+def file_cost(ifile_in):
+    try:
+        return estimate_cost(os.path.getsize(ifile_in))
+    except OSError:
+        return FILE_COST_BASE
+
+
+def cost_batches(file_infos_in, batch_cost_in=BATCH_COST, max_files_in=BATCH_MAX_FILES, cost_func=file_cost):
+    """
+    Group the (file path, base name) tuples of `file_infos_in` into batches whose estimated checking time
+    (see `cost_func`) reaches `batch_cost_in`. Many small files are checked in one task, which saves the
+    overhead of handing each file to a worker process, while files which take at least `batch_cost_in` on their own
+    are handed over alone, so that they do not hold back small files on the same worker. A batch has at most
+    `max_files_in` files; `file_infos_in` is consumed while the batches are yielded.
+
+    :return: generator of lists of (file path, base name) tuples
+    """
+    batch, batch_cost = [], 0.
+    for file_info in file_infos_in:
+        cost = cost_func(file_info[0])
+        if cost >= batch_cost_in:
+            yield [file_info]
+            continue
+        batch.append(file_info)
+        batch_cost += cost
+        if batch_cost >= batch_cost_in or len(batch) >= max_files_in:
+            yield batch
+            batch, batch_cost = [], 0.
+    if batch:
+        yield batch
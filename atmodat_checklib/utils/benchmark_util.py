@@ -0,0 +1,221 @@
+"""module benchmark_util.py to generate synthetic netCDF corpora and record benchmark results"""
+
+import datetime
+import json
+import os
+import platform
+import random
+import time
+import numpy as np
+from netCDF4 import Dataset
+from atmodat_checklib import __version__
+
+# Version of the layout of the benchmark results
+BENCHMARK_FORMAT_VERSION = 1
+# Description of a generated corpus, stored in the corpus directory
+CORPUS_MANIFEST = 'corpus.json'
+# Number of loops over the calls of a single check; the fastest loop is reported
+MICRO_REPEAT = 5
+
+# Global attributes of a file that follows the ATMODAT Standard
+VALID_GLOBAL_ATTRS = {
+    'Conventions': 'CF-1.8 ATMODAT-3.0',
+    'title': 'Synthetic benchmark data',
+    'institution': 'Benchmark Institute',
+    'source': 'Synthetic data generated by run_benchmarks',
+    'contact': 'benchmark@example.org',
+    'creation_date': '2022-06-23T12:00:00Z',
+    'creator': 'run_benchmarks',
+    'crs': 'WGS84',
+    'frequency': 'day',
+    'geospatial_lat_resolution': '0.25 degree',
+    'geospatial_lon_resolution': '0.25 degree',
+    'geospatial_vertical_resolution': '10 m',
+    'history': 'Generated for benchmarks of the atmodat data checker',
+    'institution_id': 'BENCH',
+    'keywords': 'benchmark',
+    'license': 'CC-BY-4.0',
+    'nominal_resolution': '25 km',
+    'product_version': '1.0',
+    'realm': 'atmos',
+    'source_type': 'AOGCM',
+    'standard_name_vocabulary': 'CF Standard Name Table v79',
+    'summary': 'Synthetic file for benchmarks of the atmodat data checker',
+}
+# Values which violate the ATMODAT Standard (or the CF Conventions)
+INVALID_GLOBAL_ATTRS = {
+    'Conventions': 'CF-0.1',
+    'creation_date': '23.06.2022 12:00',
+    'frequency': 'sometimes',
+    'geospatial_lat_resolution': 'quarter degree',
+    'geospatial_lon_resolution': '0.25 no_unit',
+    'license': '',
+    'nominal_resolution': 25,
+    'product_version': np.int32(1),
+    'realm': 'outer_space',
+}
+# Data variables are given these standard names and units in turn
+VARIABLE_TEMPLATES = [('air_temperature', 'K'), ('air_pressure', 'Pa'), ('specific_humidity', '1'),
+                      ('eastward_wind', 'm s-1'), ('northward_wind', 'm s-1'), ('precipitation_flux', 'kg m-2 s-1')]
+INVALID_VARIABLE_ATTRS = {'standard_name': 'not_a_standard_name', 'units': 'no_unit'}
+# Size of the dimensions of the synthetic data variables
+CORPUS_DIMS = {'time': 2, 'lat': 4, 'lon': 8}
+
+
+def corpus_global_attrs(nattrs_in, file_index_in):
+    """valid global attributes of a corpus file; attributes beyond those of the standard are filled up"""
+    attrs = dict(list(VALID_GLOBAL_ATTRS.items())[:nattrs_in])
+    creation_date = datetime.datetime(2022, 1, 1) + datetime.timedelta(hours=file_index_in)
+    if 'creation_date' in attrs:
+        attrs['creation_date'] = creation_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+    for n in range(len(attrs), nattrs_in):
+        attrs[f'extra_attribute_{n}'] = f'Additional attribute {n}'
+    return attrs
+
+
+def write_corpus_file(ofile_in, global_attrs_in, nvars_in, invalid_vars_in, file_format_in):
+    with Dataset(ofile_in, 'w', format=file_format_in) as ds:
+        ds.setncatts(global_attrs_in)
+        for dim, size in CORPUS_DIMS.items():
+            ds.createDimension(dim, size)
+        for dim, units, standard_name in [('time', 'days since 2022-01-01', 'time'),
+                                          ('lat', 'degrees_north', 'latitude'),
+                                          ('lon', 'degrees_east', 'longitude')]:
+            coord = ds.createVariable(dim, 'f8', (dim,))
+            coord.setncatts({'standard_name': standard_name, 'units': units})
+            coord[:] = np.arange(CORPUS_DIMS[dim], dtype='f8')
+        for nvar in range(nvars_in):
+            standard_name, units = VARIABLE_TEMPLATES[nvar % len(VARIABLE_TEMPLATES)]
+            var_attrs = {'standard_name': standard_name, 'long_name': standard_name.replace('_', ' '),
+                         'units': units}
+            if nvar in invalid_vars_in:
+                var_attrs.update(INVALID_VARIABLE_ATTRS)
+            var = ds.createVariable(f'var{nvar}', 'f4', tuple(CORPUS_DIMS))
+            var.setncatts(var_attrs)
+            var[:] = np.full(tuple(CORPUS_DIMS.values()), nvar, dtype='f4')
+
+
+def generate_corpus(opath_in, nfiles_in, nattrs_in=len(VALID_GLOBAL_ATTRS), nvars_in=1, invalid_fraction_in=0.25,
+                    files_per_dir_in=100, file_format_in='NETCDF4', seed_in=0):
+    """
+    Write a corpus of synthetic netCDF files into `opath_in`.
+
+    Each file has `nattrs_in` global attributes and `nvars_in` data variables. A share of `invalid_fraction_in`
+    of the files gets invalid or missing global attributes and one variable with invalid attributes. The files
+    are distributed across subdirectories with `files_per_dir_in` files each. The corpus only depends on the
+    parameters and `seed_in`; it is described in the manifest CORPUS_MANIFEST.
+
+    :return: manifest of the corpus
+    """
+    params = {'nfiles': nfiles_in, 'nattrs': nattrs_in, 'nvars': nvars_in, 'invalid_fraction': invalid_fraction_in,
+              'files_per_dir': files_per_dir_in, 'file_format': file_format_in, 'seed': seed_in}
+    rng = random.Random(seed_in)
+    invalid_files = []
+    for nfile in range(nfiles_in):
+        global_attrs = corpus_global_attrs(nattrs_in, nfile)
+        invalid_vars = set()
+        if rng.random() < invalid_fraction_in:
+            for attr in rng.sample(sorted(global_attrs), min(3, len(global_attrs))):
+                if attr in INVALID_GLOBAL_ATTRS and rng.random() < 0.5:
+                    global_attrs[attr] = INVALID_GLOBAL_ATTRS[attr]
+                else:
+                    del global_attrs[attr]
+            if nvars_in:
+                invalid_vars.add(rng.randrange(nvars_in))
+            invalid_files.append(nfile)
+
+        opath_file = os.path.join(opath_in, f'd{nfile // files_per_dir_in:04d}')
+        os.makedirs(opath_file, exist_ok=True)
+        write_corpus_file(os.path.join(opath_file, f'bench_{nfile:06d}.nc'), global_attrs, nvars_in, invalid_vars,
+                          file_format_in)
+
+    manifest = {'params': params, 'invalid_files': invalid_files}
+    with open(os.path.join(opath_in, CORPUS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_corpus_manifest(ipath_in):
+    """manifest of a corpus written by generate_corpus or None"""
+    try:
+        with open(os.path.join(ipath_in, CORPUS_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def environment_info():
+    """versions and platform the benchmarks were run with"""
+    from compliance_checker import __version__ as compliance_checker_version
+    from cfchecker import __version__ as cfchecker_version
+    from netCDF4 import __version__ as netcdf4_version
+    return {'atmodat_checker': __version__, 'compliance_checker': compliance_checker_version,
+            'cfchecker': cfchecker_version, 'netCDF4': netcdf4_version, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+
+class BenchmarkResults(object):
+    """Timings of pipeline stages and single checks, serialised as JSON"""
+
+    def __init__(self, corpus_in, settings_in=None):
+        self.results = {'format_version': BENCHMARK_FORMAT_VERSION,
+                        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                        'environment': environment_info(), 'corpus': corpus_in, 'settings': settings_in or {},
+                        'stages': {}, 'micro': {}}
+
+    def add_stage(self, name_in, runs_in, nfiles_in):
+        """add the run times (seconds) of a stage; the fastest run is used for comparisons"""
+        seconds = min(runs_in)
+        self.results['stages'][name_in] = {'seconds': seconds, 'runs': runs_in, 'files': nfiles_in,
+                                           'files_per_second': nfiles_in / seconds if seconds > 0 else None}
+
+    def add_micro(self, name_in, ncalls_in, seconds_in):
+        self.results['micro'][name_in] = {'calls': ncalls_in, 'seconds_per_call': seconds_in / ncalls_in}
+
+    def write(self, ofile_in):
+        with open(ofile_in, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2)
+
+
+def time_runs(func, repeat_in=1, setup=None):
+    """
+    run `func` `repeat_in` times and return the run times in seconds; `setup` is called before each run
+    and not timed
+    """
+    runs = []
+    for _ in range(repeat_in):
+        if setup:
+            setup()
+        start_time = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start_time)
+    return runs
+
+
+def time_calls(func, ncalls_in):
+    """run time in seconds of `ncalls_in` calls of `func` (fastest of MICRO_REPEAT loops)"""
+    loop_times = []
+    for _ in range(MICRO_REPEAT):
+        start_time = time.perf_counter()
+        for _ in range(ncalls_in):
+            func()
+        loop_times.append(time.perf_counter() - start_time)
+    return min(loop_times)
+
+
+def compare_results(baseline_in, results_in, tolerance_in=0.1):
+    """
+    Compare two sets of benchmark results (as written by BenchmarkResults.write).
+
+    :param tolerance_in: relative slowdown that is not reported as regression
+    :return: list of (name, baseline seconds, seconds, ratio, regression) for the stages and single checks of both
+    """
+    comparison = []
+    for section, key in [('stages', 'seconds'), ('micro', 'seconds_per_call')]:
+        for name, result in results_in.get(section, {}).items():
+            if name not in baseline_in.get(section, {}):
+                continue
+            old, new = baseline_in[section][name][key], result[key]
+            ratio = new / old if old > 0 else float('inf')
+            comparison.append((f'{section}:{name}', old, new, ratio, ratio > 1 + tolerance_in))
+    return comparison
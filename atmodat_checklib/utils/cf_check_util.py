@@ -0,0 +1,174 @@
+"""module cf_check_util.py to run the CF checker in-process with tables loaded only once"""
+
+import contextlib
+import io
+import os
+from xml.sax import make_parser
+from xml.sax.handler import feature_namespaces
+import netCDF4
+from cfchecker import __version__ as cfchecker_version
+from cfchecker.cfchecks import CFChecker, CFVersion, ConstructDict, ConstructList, FatalCheckerError, \
+    AREATYPES, REGIONNAMES, STANDARDNAME, cfVersions, newest_version, vn1_4
+from atmodat_checklib.utils.timing_util import timings
+
+# Beginning of the CF checker messages reporting the CF version and standard name table used
+CF_VERSION_MSG = 'Checking against CF Version '
+STD_NAME_TABLE_MSG = 'Using Standard Name Table Version '
+
+
+def parse_cf_version(cfversion_in):
+    """convert the version given on the command line into a CFVersion (as done by cfchecks -v)"""
+    if cfversion_in == 'auto':
+        return CFVersion()
+    try:
+        version = CFVersion(cfversion_in)
+    except ValueError:
+        print("WARNING: '%s' cannot be parsed as a version number." % cfversion_in)
+        print("Performing check against newest version: %s" % newest_version)
+        return newest_version
+    if version not in cfVersions:
+        print("WARNING: %s is not a valid CF version." % version)
+        print("Performing check against newest version: %s" % newest_version)
+        version = newest_version
+    return version
+
+
+def parse_table(table_handler, table_location):
+    """parse xml table (file or URL) with the given content handler"""
+    with timings.stage('setup: CF tables'):
+        parser = make_parser()
+        parser.setFeature(feature_namespaces, 0)
+        parser.setContentHandler(table_handler)
+        parser.parse(table_location)
+    return table_handler
+
+
+def results_record(results_in):
+    """
+    compact record of the results of the CF checker for one file: the CF version and standard name table
+    used, and lists of [variable, message] pairs (variable is None for global messages) for each category
+    """
+    record = {'version': None, 'std_name_table': None}
+    for msg in results_in['global']['VERSION']:
+        if msg.startswith(CF_VERSION_MSG):
+            record['version'] = msg.replace(CF_VERSION_MSG, '')
+        elif msg.startswith(STD_NAME_TABLE_MSG):
+            record['std_name_table'] = msg.replace(STD_NAME_TABLE_MSG, '').split(' ')[0]
+    for category, key in [('FATAL', 'fatal'), ('ERROR', 'errors'), ('WARN', 'warnings')]:
+        record[key] = [[None, msg] for msg in results_in['global'][category]]
+        for var, var_results in results_in['variables'].items():
+            record[key] += [[var, msg] for msg in var_results[category]]
+    return record
+
+
+class PersistentCFChecker(CFChecker):
+    """
+    CF checker that can be used for many files in one process.
+
+    The standard name, area type and region name tables are parsed once, when they are needed for the
+    first time. Each file is checked against the requested CF version, i.e. the version detected for
+    'auto' is not carried over from one file to the next.
+    """
+
+    def __init__(self, cfversion_in='auto'):
+        super().__init__(cfStandardNamesXML=os.environ.get('CF_STANDARD_NAMES', STANDARDNAME),
+                         cfAreaTypesXML=os.environ.get('CF_AREA_TYPES', AREATYPES),
+                         cfRegionNamesXML=os.environ.get('CF_REGION_NAMES', REGIONNAMES),
+                         version=parse_cf_version(cfversion_in))
+        self.requested_version = self.version
+        self.std_name_table, self.area_type_table, self.region_name_table = None, None, None
+
+    def _reset(self):
+        """reset state that the CF checker keeps across files"""
+        self.version = self.requested_version
+        self.all_results.clear()
+        self.all_messages = []
+        self.cf_roleCount = 0
+        self.raggedArrayFlag = 0
+
+    def _load_tables(self):
+        if self.std_name_table is None:
+            self.std_name_table = parse_table(ConstructDict(), self.standardNames)
+        if self.region_name_table is None:
+            self.region_name_table = parse_table(ConstructList(), self.regionNames)
+        if self.version >= vn1_4 and self.area_type_table is None:
+            self.area_type_table = parse_table(ConstructList(), self.areaTypes)
+        self.std_name_dh = self.std_name_table
+        self.region_name_lh = self.region_name_table
+        self.area_type_lh = self.area_type_table
+
+    def checker(self, file):
+        """Same as CFChecker.checker, but using the tables that have already been parsed."""
+        self._reset()
+        self._init_results(file)
+        self._add_version("CHECKING NetCDF FILE: %s" % file)
+
+        if not self.silent:
+            print("=====================")
+
+        # Check for valid filename
+        if not file.endswith('.nc'):
+            self._fatal("Filename must have .nc suffix", code="2.1")
+
+        # Read in netCDF file
+        try:
+            self.f = netCDF4.Dataset(file, "r")
+        except RuntimeError as e:
+            self._fatal("%s: %s" % (e, file))
+
+        # if 'auto' version, check the CF version in the file
+        # if none found, use the default
+        if not self.version:
+            self.version = self.getFileCFVersion()
+            if not self.version:
+                self._add_warn("Cannot determine CF version from the Conventions attribute; checking against "
+                               "latest CF version: %s" % newest_version)
+                self.version = newest_version
+
+        # Set up dictionary of all valid attributes, their type and use
+        self.setUpAttributeList()
+        self.validGridMappingAttributes()
+        self._load_tables()
+
+        self._add_version("Using CF Checker Version %s" % cfchecker_version)
+        self._add_version("Checking against CF Version %s" % self.version)
+        self._add_version("Using Standard Name Table Version %s (%s)" %
+                          (self.std_name_dh.version_number, self.std_name_dh.last_modified))
+        if self.version >= vn1_4:
+            self._add_version("Using Area Type Table Version %s (%s)" %
+                              (self.area_type_lh.version_number, self.area_type_lh.last_modified))
+        self._add_version("Using Standardized Region Name Table Version %s (%s)" %
+                          (self.region_name_lh.version_number, self.region_name_lh.last_modified))
+
+        if not self.silent:
+            print("")
+
+        try:
+            return self._checker()
+        finally:
+            self.f.close()
+
+    def run_silent(self, ifile_in):
+        """check a single file without printing the CF checker output"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                self.checker(ifile_in)
+            except FatalCheckerError:
+                pass
+        return self.results
+
+    def check_record(self, ifile_in):
+        """check a single file and return a compact record of the results (see results_record)"""
+        return results_record(self.run_silent(ifile_in))
+
+    def check_file(self, ifile_in, ofile_in):
+        """check a single file and write the CF checker output into `ofile_in`"""
+        output_cf = io.StringIO()
+        with contextlib.redirect_stdout(output_cf):
+            try:
+                self.checker(ifile_in)
+            except FatalCheckerError:
+                print("Checking of file %s aborted due to error" % ifile_in)
+        with open(ofile_in, 'w', encoding='utf-8') as f_cf:
+            f_cf.write(output_cf.getvalue())
+        return self.results
@@ -0,0 +1,154 @@
+"""module checkpoint_util.py to journal the finished files of a run so that interrupted runs can be resumed"""
+
+import json
+import os
+import time
+
+# Journal in the run directory
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+# Version of the layout of the journal
+CHECKPOINT_VERSION = 1
+# Maximum number of seconds between writing the journal to disk
+CHECKPOINT_SYNC_INTERVAL = 5.
+
+
+class CheckpointJournal(object):
+    """
+    Append-only journal of the files of a run whose checks are finished.
+
+    The first line holds the settings of the run, each further line one finished file with the locations of its
+    output files relative to the run directory and the records of the checks which cannot be loaded from their
+    output files (or, for result streams, the record of all results). Lines are
+    written in one piece and synced to disk at least every CHECKPOINT_SYNC_INTERVAL seconds; a line that was cut off
+    by an interruption is dropped when the journal is opened again. The last line of a finished run is
+    {"complete": number of files}.
+    """
+
+    def __init__(self, opath_run_in, settings_in):
+        self.opath_run = opath_run_in
+        self.ofile = os.path.join(opath_run_in, CHECKPOINT_FILE)
+        self.entries = {}
+        self.complete = False
+        new_journal = not os.path.isfile(self.ofile)
+        if not new_journal:
+            self.load(settings_in)
+        self.f = open(self.ofile, 'a', encoding='utf-8')
+        self.last_sync = time.monotonic()
+        if new_journal:
+            self.write({'checkpoint': CHECKPOINT_VERSION, 'settings': settings_in}, sync_in=True)
+
+    def load(self, settings_in):
+        """read the entries of an existing journal; the settings of the run have to be `settings_in`"""
+        valid_size = 0
+        with open(self.ofile, 'rb') as f:
+            for nline, line in enumerate(f):
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                valid_size += len(line)
+                if nline == 0:
+                    self.check_settings(entry['settings'], settings_in)
+                elif 'complete' in entry:
+                    self.complete = True
+                else:
+                    self.entries[entry['file']] = entry
+        # Drop a line which was cut off, so that new entries start on a new line
+        if valid_size != os.path.getsize(self.ofile):
+            os.truncate(self.ofile, valid_size)
+
+    @staticmethod
+    def check_settings(settings_run_in, settings_in):
+        for key in sorted(set(settings_run_in) | set(settings_in)):
+            if settings_run_in.get(key) != settings_in.get(key):
+                raise RuntimeError(f'The run cannot be resumed with different settings ({key}: '
+                                   f'{settings_run_in.get(key)} instead of {settings_in.get(key)})')
+
+    def write(self, entry_in, sync_in=False):
+        self.f.write(json.dumps(entry_in, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.f.flush()
+        if sync_in or time.monotonic() - self.last_sync > CHECKPOINT_SYNC_INTERVAL:
+            os.fsync(self.f.fileno())
+            self.last_sync = time.monotonic()
+
+    def add(self, record_in, ofiles_in=None, journal_checks_in=()):
+        """
+        add a finished file with the record of its results and its output file of each check (None for result
+        streams); the records of the checks in `journal_checks_in` are kept in the journal. Result stream records
+        whose checks all failed are not added, so that these files are checked again when the run is resumed.
+        """
+        if ofiles_in is None:
+            if not stream_record_finished(record_in):
+                return
+            entry = {'file': record_in['file'], 'name': record_in['name'], 'record': record_in}
+        else:
+            entry = {'file': record_in['file'], 'name': record_in['name'],
+                     'outputs': {check: os.path.relpath(ofile, self.opath_run) for check, ofile in ofiles_in.items()}}
+            if journal_checks_in:
+                entry['records'] = {check: record_in[check] for check in journal_checks_in}
+        self.entries[entry['file']] = entry
+        self.write(entry)
+
+    def finished_files(self, load_record_in):
+        """
+        records of the finished files (by file path) whose output still exists; `load_record_in` is called with a
+        check and the path of its output file and returns the record of this check, unless it is kept in the journal.
+        Files with a failed check whose record is kept in the journal are not finished, nor are result stream records
+        without any result.
+        """
+        records = {}
+        for ifile, entry in self.entries.items():
+            if 'record' in entry:
+                if stream_record_finished(entry['record']):
+                    records[ifile] = entry['record']
+                continue
+            ofiles = {check: os.path.join(self.opath_run, ofile) for check, ofile in entry['outputs'].items()}
+            journal_records = entry.get('records', {})
+            if not all(os.path.isfile(ofile) for ofile in ofiles.values()) or None in journal_records.values():
+                continue
+            record = {'file': ifile, 'name': entry['name']}
+            for check, ofile in ofiles.items():
+                if check in journal_records:
+                    record[check] = journal_records[check]
+                else:
+                    record[check] = load_record_in(check, ofile)
+            records[ifile] = record
+        return records
+
+    def finish(self, file_counter_in):
+        self.write({'complete': file_counter_in}, sync_in=True)
+        self.complete = True
+        self.close()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+
+def stream_record_finished(record_in):
+    """whether at least one check of a result stream record has a result"""
+    return any(result is not None for key, result in record_in.items() if key not in ('file', 'name'))
+
+
+def find_resumable_run(opath_in):
+    """run directory in `opath_in` with the most recently updated journal of an unfinished run"""
+    runs = []
+    with os.scandir(opath_in) as entries:
+        for entry in entries:
+            journal = os.path.join(entry.path, CHECKPOINT_FILE)
+            if entry.is_dir(follow_symlinks=False) and os.path.isfile(journal):
+                runs.append((os.path.getmtime(journal), entry.path))
+    for _, opath_run in sorted(runs, reverse=True):
+        if not journal_complete(os.path.join(opath_run, CHECKPOINT_FILE)):
+            return os.path.join(opath_run, '')
+    raise RuntimeError(f'No unfinished run to resume found in {opath_in}')
+
+
+def journal_complete(ifile_in):
+    """whether the journal of a run has been finished"""
+    with open(ifile_in, 'rb') as f:
+        f.seek(max(0, os.path.getsize(ifile_in) - 256))
+        lines = f.read().splitlines()
+    return bool(lines) and lines[-1].startswith(b'{"complete":')
@@ -0,0 +1,241 @@
+"""module daemon_util.py to serve check requests from a pool of warm worker processes over HTTP"""
+
+import http.client
+import http.server
+import ipaddress
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import time
+from atmodat_checklib import __version__
+from atmodat_checklib.utils import unit_cache_util as unit_cache
+from atmodat_checklib.utils import vocab_index_util as vocab_index
+from atmodat_checklib.utils import worker_pool_util as worker_pool
+from atmodat_checklib.utils.benchmark_util import write_corpus_file, corpus_global_attrs, VALID_GLOBAL_ATTRS
+
+# Maximum number of requests waiting for a worker per worker process; further requests are rejected
+PENDING_PER_WORKER = 8
+# Seconds a request waits for its result
+REQUEST_TIMEOUT = 600
+# Maximum size of a request body in bytes
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def init_daemon_worker(file_checker_in, unit_table_in, vocab_snapshot_in):
+    """
+    set up a worker process of the daemon; the check suite, CF tables, vocabularies and units are loaded by
+    checking a synthetic file once
+    """
+    worker_pool.init_worker(file_checker_in, True, None, None, None, None)
+    if unit_table_in:
+        unit_cache.load_unit_table(unit_table_in)
+    if vocab_snapshot_in:
+        vocab_index.load_vocab_snapshot(vocab_snapshot_in)
+    try:
+        with tempfile.TemporaryDirectory(prefix='atmodat_daemon_') as tmp_dir:
+            warm_up_file = os.path.join(tmp_dir, 'warm_up.nc')
+            write_corpus_file(warm_up_file, corpus_global_attrs(len(VALID_GLOBAL_ATTRS), 0), 1, set(), 'NETCDF4')
+            file_checker_in.check_file_record(warm_up_file, 'warm_up')
+    except Exception as e:
+        # The worker is still usable; the checks are set up with the first request instead
+        print(f'Warm-up of worker process {os.getpid()} failed: {e}')
+
+
+class CheckerService(object):
+    """
+    Checks files with a pool of `njobs_in` warm worker processes, each using a copy of the FileChecker
+    `file_checker_in`. At most PENDING_PER_WORKER * `njobs_in` requests wait for or are checked by a worker at the
+    same time; a request which timed out holds its slot until the worker has finished its checks.
+    """
+
+    def __init__(self, file_checker_in, njobs_in=1, unit_table_in=None, vocab_snapshot_in=None):
+        self.njobs = njobs_in
+        self.check_types = file_checker_in.check_types
+        self.pool = multiprocessing.Pool(njobs_in, initializer=init_daemon_worker,
+                                         initargs=(file_checker_in, unit_table_in, vocab_snapshot_in))
+        self.slots = threading.BoundedSemaphore(PENDING_PER_WORKER * njobs_in)
+        self.lock = threading.Lock()
+        self.stats = {'checked': 0, 'failed': 0, 'rejected': 0, 'busy': 0., 'pending': 0}
+        self.start_time = time.time()
+
+    def count(self, key_in, value_in=1):
+        with self.lock:
+            self.stats[key_in] += value_in
+
+    def check(self, ifile_in):
+        """
+        run all checks on a file
+
+        :return: record of the results (see FileChecker.check_file_record) or None if too many requests are pending
+        """
+        if not self.slots.acquire(blocking=False):
+            self.count('rejected')
+            return None
+        self.count('pending')
+
+        def check_done(_):
+            self.count('pending', -1)
+            self.slots.release()
+
+        try:
+            filename_base = os.path.basename(os.path.realpath(ifile_in)).rstrip('.nc')
+            result = self.pool.apply_async(worker_pool.check_file, ((ifile_in, filename_base),),
+                                           callback=check_done, error_callback=check_done)
+        except Exception:
+            check_done(None)
+            raise
+        try:
+            _, elapsed, _, _, record = result.get(REQUEST_TIMEOUT)
+        except Exception:
+            self.count('failed')
+            raise
+        record['elapsed'] = elapsed
+        self.count('checked')
+        self.count('busy', elapsed)
+        return record
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, status='ok', version=__version__, jobs=self.njobs, check_types=self.check_types,
+                        uptime=time.time() - self.start_time)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class CheckRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP API of the daemon:
+
+    GET /status: state of the daemon and number of checked, failed and rejected requests
+    POST /check with JSON body {"file": path}: record of the results of all checks of the file
+    """
+
+    server_version = f'atmodat-checker/{__version__}'
+
+    def send_json(self, status_in, data_in):
+        body = json.dumps(data_in, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_in)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self.send_json(200, self.server.service.status())
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/check':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_REQUEST_SIZE:
+                raise ValueError('request too large')
+            ifile = json.loads(self.rfile.read(length))['file']
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f'Invalid request ({e}); expected {{"file": path}}'})
+            return
+        if not isinstance(ifile, str) or not ifile.endswith('.nc') or not os.path.isfile(ifile):
+            self.send_json(404, {'error': f'File {ifile} does not exist or is no netCDF file'})
+            return
+        try:
+            record = self.server.service.check(ifile)
+        except Exception as e:
+            self.send_json(500, {'error': f'Checking {ifile} failed: {e}'})
+            return
+        if record is None:
+            self.send_json(503, {'error': 'Too many pending requests'})
+        else:
+            self.send_json(200, record)
+
+    def address_string(self):
+        # Clients of Unix sockets have no address
+        return self.client_address[0] if self.client_address else 'unix socket'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CheckHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address_in, service_in, verbose_in=False):
+        self.service = service_in
+        self.verbose = verbose_in
+        super().__init__(address_in, CheckRequestHandler)
+
+
+class CheckUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path_in, service_in, verbose_in=False):
+        self.service = service_in
+        self.verbose = verbose_in
+        # Only a socket left behind by an earlier daemon is replaced
+        try:
+            mode = os.lstat(socket_path_in).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise RuntimeError(f'{socket_path_in} exists and is not a socket')
+            os.remove(socket_path_in)
+        super().__init__(socket_path_in, CheckRequestHandler)
+
+
+def is_loopback(host_in):
+    """whether the host name or address `host_in` only resolves to loopback addresses"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host_in, None)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_loopback
+                                   for address in addresses)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket"""
+
+    def __init__(self, socket_path_in, timeout=REQUEST_TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path_in
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(address_in, method_in, path_in, data_in=None):
+    """
+    send a request to a daemon listening on `address_in` ((host, port) or path of a Unix socket)
+
+    :return: HTTP status and decoded JSON response
+    """
+    if isinstance(address_in, str):
+        connection = UnixHTTPConnection(address_in)
+    else:
+        connection = http.client.HTTPConnection(*address_in, timeout=REQUEST_TIMEOUT)
+    try:
+        body = json.dumps(data_in).encode('utf-8') if data_in is not None else None
+        connection.request(method_in, path_in, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def request_check(address_in, ifile_in):
+    """check a file with the daemon listening on `address_in`; returns HTTP status and record (or error)"""
+    return request(address_in, 'POST', '/check', {'file': os.path.abspath(ifile_in)})
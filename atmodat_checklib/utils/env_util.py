@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 from pathlib import Path
 import platform
@@ -5,33 +7,176 @@ import platform
 UDUNITS_PATH_LINUX = ['share', 'udunits']
 UDUNITS_PATH_WINDOWS = ['Library', 'share', 'udunits']
 
+# Environment variable with the path of the cache of the resolved environment (empty: no cache)
+ENV_CACHE_VARIABLE = 'ATMODAT_ENV_CACHE'
+# Version of the layout of the cache of the resolved environment
+ENV_CACHE_VERSION = 1
 
-def set_env_variables():
+# Environment resolved in this process by resolve_environment
+_environment = {}
+
+
+def env_cache_file():
+    """cache of the resolved environment of this installation of the checker (None if disabled)"""
+    if ENV_CACHE_VARIABLE in os.environ:
+        return os.environ[ENV_CACHE_VARIABLE] or None
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    install_id = hashlib.blake2b(__file__.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(cache_home, 'atmodat_checker', f'env_{install_id}.json')
+
+
+def find_udunits2_xml_path():
+    """udunits2.xml in share/udunits next to the first directory in $PATH which has one"""
+    if platform.system() == 'Windows':
+        udunits_local_path = UDUNITS_PATH_WINDOWS
+    else:
+        udunits_local_path = UDUNITS_PATH_LINUX
+
+    for binpath in os.environ["PATH"].split(':'):
+        searchpath = Path(binpath).parents[0]
+        udunits_search_path = os.path.join(searchpath, *udunits_local_path)
+        if os.path.isdir(udunits_search_path):
+            return os.path.join(udunits_search_path, 'udunits2.xml')
+    raise RuntimeError("Could not find udunits xml path")
 
+
+def path_mtimes(paths_in):
+    """modification times of the paths (None for missing paths)"""
+    mtimes = {}
+    for path in paths_in:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def cache_key():
+    """settings for which a cached environment is valid"""
+    return {'env_cache': ENV_CACHE_VERSION, 'module_file': __file__, 'platform': platform.system(),
+            'path': os.environ.get('PATH', '')}
+
+
+def load_environment(ifile_in):
+    """
+    resolved environment from the cache file `ifile_in`; None if there is none or if the settings or the
+    modification time of any path it depends on have changed since
+    """
     try:
-        os.environ["UDUNITS2_XML_PATH"]
-    except KeyError:
-        if platform.system() == 'Windows':
-            udunits_local_path = UDUNITS_PATH_WINDOWS
-        else:
-            udunits_local_path = UDUNITS_PATH_LINUX
+        with open(ifile_in, 'r', encoding='utf-8') as f:
+            environment = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if environment.get('key') != cache_key():
+        return None
+    if path_mtimes(environment['mtimes']) != environment['mtimes']:
+        return None
+    return environment
+
+
+def save_environment(ofile_in, environment_in):
+    """write the resolved environment into the cache file; the cache is skipped if it cannot be written"""
+    try:
+        os.makedirs(os.path.dirname(ofile_in), exist_ok=True)
+        with open(ofile_in + f'.{os.getpid()}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(environment_in, f, indent=1)
+        os.replace(ofile_in + f'.{os.getpid()}.tmp', ofile_in)
+    except OSError:
+        pass
 
-        udunits2_xml_path_out = None
-        for binpath in os.environ["PATH"].split(':'):
-            searchpath = Path(binpath).parents[0]
-            udunits_search_path = os.path.join(searchpath, *udunits_local_path)
-            if os.path.isdir(udunits_search_path):
-                udunits2_xml_path_out = os.path.join(udunits_search_path, 'udunits2.xml')
-                break
 
-        if not udunits2_xml_path_out:
-            raise RuntimeError("Could not find udunits xml path")
+def resolve_environment(use_cache=True):
+    """
+    Resolve the udunits2.xml path, the path of the AtMoDat_CVs and their git revision. The result is kept in a cache
+    file (see env_cache_file) which is only used while $PATH is unchanged and the udunits directory, the
+    AtMoDat_CVs and the git files of their revision have their cached modification times; otherwise $PATH is
+    scanned again. UDUNITS2_XML_PATH takes precedence over the cached and the scanned path.
 
+    :return: dictionary with udunits2_xml_path, atmodat_cvs, pyessv_archive_home, cv_revision and the source of
+             the paths (scan or cache)
+    """
+    udunits2_xml_path_env = os.environ.get("UDUNITS2_XML_PATH")
+    ofile = env_cache_file() if use_cache else None
+    environment = load_environment(ofile) if ofile else None
+    if environment is not None and environment['udunits2_xml_path'] is None and not udunits2_xml_path_env:
+        # Cached while UDUNITS2_XML_PATH was set
+        environment = None
+    if environment is None:
+        # AtMoDat_CVs
+        atmodat_cv_base_path = str(Path(__file__).resolve().parents[1])
+        atmodat_cvs = os.path.join(atmodat_cv_base_path, 'AtMoDat_CVs')
+        cv_revision, cv_files = read_cv_revision(atmodat_cvs)
+
+        if udunits2_xml_path_env:
+            udunits2_xml_path, udunits_files = None, []
+        else:
+            udunits2_xml_path = find_udunits2_xml_path()
+            udunits_files = [os.path.dirname(udunits2_xml_path)]
+
+        environment = {'key': cache_key(), 'udunits2_xml_path': udunits2_xml_path, 'atmodat_cvs': atmodat_cvs,
+                       'pyessv_archive_home': os.path.join(atmodat_cvs, 'pyessv-archive'),
+                       'cv_revision': cv_revision, 'mtimes': path_mtimes(udunits_files + [atmodat_cvs] + cv_files)}
+        if ofile:
+            save_environment(ofile, environment)
+        environment['source'] = 'scan'
     else:
-        udunits2_xml_path_out = os.environ["UDUNITS2_XML_PATH"]
+        environment['source'] = 'cache'
+    environment['cache_file'] = ofile
+
+    if udunits2_xml_path_env:
+        environment['udunits2_xml_path'] = udunits2_xml_path_env
+        environment['source'] += ', UDUNITS2_XML_PATH'
+    _environment.clear()
+    _environment.update(environment)
+    return environment
+
+
+def set_env_variables():
+    environment = resolve_environment()
+    return environment['udunits2_xml_path'], environment['atmodat_cvs']
+
+
+def print_environment(environment_in):
+    """print the resolved environment (see resolve_environment)"""
+    for key, name in [('udunits2_xml_path', 'UDUNITS2_XML_PATH'), ('atmodat_cvs', 'AtMoDat_CVs'),
+                      ('pyessv_archive_home', 'PYESSV_ARCHIVE_HOME'), ('cv_revision', 'CV revision'),
+                      ('source', 'Resolved from'), ('cache_file', 'Cache file')]:
+        print(f'{name + ":":<22}{environment_in[key]}')
+
+
+def get_cv_revision(atmodat_cvs_in):
+    """Return git revision of the AtMoDat_CVs submodule or None if it cannot be determined"""
+    if _environment.get('atmodat_cvs') == atmodat_cvs_in:
+        return _environment['cv_revision']
+    return read_cv_revision(atmodat_cvs_in)[0]
+
 
-    # PYESSV_ARCHIVE_PATH
-    atmodat_cv_base_path = str(Path(__file__).resolve().parents[1])
-    pyessv_archive_home_out = os.path.join(atmodat_cv_base_path, 'AtMoDat_CVs')
+def read_cv_revision(atmodat_cvs_in):
+    """git revision of the AtMoDat_CVs submodule (or None) and the files of the git directory it depends on"""
+    git_path = os.path.join(atmodat_cvs_in, '.git')
+    # In a submodule, .git is a file pointing to the git directory
+    if os.path.isfile(git_path):
+        with open(git_path, 'r') as f_git:
+            git_path = os.path.join(atmodat_cvs_in, f_git.read().strip().split('gitdir: ')[-1])
+    head_file = os.path.join(git_path, 'HEAD')
+    files = [os.path.join(atmodat_cvs_in, '.git'), head_file]
+    if not os.path.isfile(head_file):
+        return None, files
 
-    return udunits2_xml_path_out, pyessv_archive_home_out
+    with open(head_file, 'r') as f_head:
+        head = f_head.read().strip()
+    if not head.startswith('ref: '):
+        return head, files
+    ref = head.split('ref: ')[1]
+    ref_file = os.path.join(git_path, ref)
+    packed_refs = os.path.join(git_path, 'packed-refs')
+    files += [ref_file, packed_refs]
+    if os.path.isfile(ref_file):
+        with open(ref_file, 'r') as f_ref:
+            return f_ref.read().strip(), files
+    if os.path.isfile(packed_refs):
+        with open(packed_refs, 'r') as f_packed:
+            for line in f_packed:
+                if line.rstrip().endswith(' ' + ref):
+                    return line.split(' ')[0], files
+    return None, files
@@ -0,0 +1,174 @@
+"""module file_check_util.py to run the AtMoDat and CF checks on single files"""
+
+import json
+import os
+import time
+from atmodat_checklib.utils.timing_util import timings
+
+
+class FileChecker(object):
+    """
+    Runs the selected checks on single files and writes the output into `opath_file_in`.
+
+    The AtMoDat check suite and the CF checker are only set up once they are needed for the first time.
+    If a ResultCache is given, output of unchanged files is taken from the cache. With `header_only_in`, the
+    AtMoDat checks only read the global attributes of the files. The text output of the AtMoDat checks is only
+    written with `text_output_in`. The time spent on each file and check is recorded in timing_util.timings.
+    """
+
+    # Checks whose first output file holds the record of their results (see load_record); the records of the other
+    # checks are not written to the output, but kept in the result cache and the checkpoint journal
+    RECORD_OUTPUT_CHECKS = ['atmodat']
+
+    def __init__(self, check_types_in, cfversion_in, opath_file_in, idiryml_in, result_cache_in=None,
+                 header_only_in=False, text_output_in=True):
+        self.check_types = check_types_in
+        self.cfversion = cfversion_in
+        self.opath_file = opath_file_in
+        self.idiryml = idiryml_in
+        self.result_cache = result_cache_in
+        self.header_only = header_only_in
+        self.text_output = text_output_in
+        self._atmodat_checker = None
+        self._cf_checker = None
+
+    @property
+    def atmodat_checker(self):
+        if self._atmodat_checker is None:
+            # Imported here as PYESSV_ARCHIVE_HOME has to be set before
+            from atmodat_checklib.utils.atmodat_check_util import AtmodatChecker
+            with timings.stage('setup: AtMoDat checks'):
+                self._atmodat_checker = AtmodatChecker(self.idiryml, self.header_only)
+        return self._atmodat_checker
+
+    @property
+    def cf_checker(self):
+        if self._cf_checker is None:
+            # Imported here as UDUNITS2_XML_PATH has to be set before
+            from atmodat_checklib.utils.cf_check_util import PersistentCFChecker
+            with timings.stage('setup: CF checker'):
+                self._cf_checker = PersistentCFChecker(self.cfversion)
+        return self._cf_checker
+
+    def output_files(self, check_in, filename_base_in):
+        """output files of a check; for RECORD_OUTPUT_CHECKS, the first one holds the record of the results"""
+        ofile_base = os.path.join(self.opath_file, check_in, filename_base_in + '_' + check_in)
+        if check_in == 'atmodat':
+            if self.text_output:
+                return [ofile_base + '_result.json', ofile_base + '_result.txt']
+            return [ofile_base + '_result.json']
+        return [ofile_base + '_result.txt']
+
+    def run_check(self, check_in, ifile_in, ofiles_in):
+        """run a check, write its output files and return the record of its results"""
+        if check_in == 'atmodat':
+            return self.atmodat_checker.check_file(ifile_in, ofiles_in[0], self.text_output)
+        elif check_in == 'CF':
+            # Imported here as UDUNITS2_XML_PATH has to be set before
+            from atmodat_checklib.utils.cf_check_util import results_record
+            return results_record(self.cf_checker.check_file(ifile_in, ofiles_in[0]))
+
+    @staticmethod
+    def load_record(check_in, ofile_in):
+        """
+        record of the results of a check from its first output file (see output_files); for the CF checks, this is
+        the *_CF_record.json written by earlier versions
+        """
+        with open(ofile_in, 'r', encoding='utf-8') as f_record:
+            record = json.load(f_record)
+        if check_in == 'atmodat':
+            # {file path: {suite name: results}}
+            return next(iter(next(iter(record.values())).values()))
+        return record
+
+    def file_key(self, ifile_in):
+        """key of the version of a file in the result cache (see ResultCache.file_key), or None"""
+        if not self.result_cache:
+            return None
+        try:
+            return self.result_cache.file_key(ifile_in)
+        except OSError:
+            # Reported by the checks
+            return None
+
+    def check_output_files(self, check_in, ifile_in, filename_base_in, file_key_in=None):
+        """
+        run a check and write its output files, or restore them from the cache; records which are not written to
+        the output (see RECORD_OUTPUT_CHECKS) are stored in the cache entry
+        """
+        ofiles = self.output_files(check_in, filename_base_in)
+        record_output = check_in in self.RECORD_OUTPUT_CHECKS
+        if self.result_cache:
+            cache_key = self.result_cache.key(ifile_in, check_in + ':' + ','.join(
+                os.path.splitext(ofile)[1] for ofile in ofiles), file_key_in)
+            if self.result_cache.restore(cache_key, ofiles):
+                record = self.load_record(check_in, ofiles[0]) if record_output \
+                    else self.result_cache.restore_record(cache_key)
+                if record is not None:
+                    return record, True
+        record = self.run_check(check_in, ifile_in, ofiles)
+        if self.result_cache:
+            self.result_cache.store(cache_key, ofiles, None if record_output else record)
+        return record, False
+
+    def run_checks_timed(self, ifile_in, filename_base_in, check_func):
+        """
+        run `check_func(check)`, which returns the results of a check and whether they are taken from the cache,
+        for all checks and record the timings of the file
+
+        :return: record of the results (see check_file_record) and the number of results taken from the cache
+        """
+        record = {'file': ifile_in, 'name': filename_base_in}
+        cache_hits = 0
+        check_walls = {}
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        for check in self.check_types:
+            with timings.stage('check: ' + check) as elapsed:
+                try:
+                    record[check], cache_hit = check_func(check)
+                    cache_hits += cache_hit
+                except Exception as e:
+                    print(f'{check} checks of {ifile_in} failed: {e}')
+                    record[check] = None
+            check_walls[check] = elapsed[0]
+        timings.add_file(ifile_in, time.perf_counter() - start_wall, time.thread_time() - start_cpu, check_walls)
+        return record, cache_hits
+
+    def check_file(self, ifile_in, filename_base_in):
+        """
+        run all checks on a single file and write their output files
+
+        :return: record of the results (see check_file_record) and the number of results taken from the cache
+        """
+        file_key = self.file_key(ifile_in)
+        return self.run_checks_timed(ifile_in, filename_base_in,
+                                     lambda check: self.check_output_files(check, ifile_in, filename_base_in,
+                                                                           file_key))
+
+    def check_record(self, check_in, ifile_in):
+        if check_in == 'atmodat':
+            return self.atmodat_checker.check_record(ifile_in)
+        elif check_in == 'CF':
+            return self.cf_checker.check_record(ifile_in)
+
+    def check_record_cached(self, check_in, ifile_in, file_key_in=None):
+        """run a check and return the record of its results, or take the record from the cache"""
+        if self.result_cache:
+            cache_key = self.result_cache.key(ifile_in, check_in + ':record', file_key_in)
+            record = self.result_cache.restore_record(cache_key)
+            if record is not None:
+                return record, True
+        record = self.check_record(check_in, ifile_in)
+        if self.result_cache:
+            self.result_cache.store_record(cache_key, record)
+        return record, False
+
+    def check_file_record(self, ifile_in, filename_base_in):
+        """
+        run all checks on a single file and return a record of the results for the result stream (no output files
+        are written) and the number of results taken from the cache. The record holds the path and base name of the
+        file and the results of each check; the results of a failed check are None.
+        """
+        file_key = self.file_key(ifile_in)
+        return self.run_checks_timed(ifile_in, filename_base_in,
+                                     lambda check: self.check_record_cached(check, ifile_in, file_key))
@@ -0,0 +1,148 @@
+"""module attribute_backup_util.py to store the original attributes of the files processed by fill_attributes"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+import numpy as np
+
+# Name of the backup store in the backup directory
+BACKUP_STORE_FILE = 'attr_backup.sqlite'
+# Seconds a process waits for the store while another process writes to it
+BACKUP_STORE_TIMEOUT = 600
+# Key of the global attributes in the attributes of a file
+GLOBAL_KEY = 'global_attr'
+
+
+def encode_value(value_in):
+    """JSON representation of an attribute value which keeps numpy dtypes"""
+    if isinstance(value_in, (np.ndarray, np.generic)) and value_in.dtype.kind not in 'OSU':
+        return {'dtype': value_in.dtype.str, 'value': value_in.tolist(), 'array': isinstance(value_in, np.ndarray)}
+    if isinstance(value_in, np.ndarray):
+        return value_in.tolist()
+    if isinstance(value_in, np.generic):
+        return value_in.item()
+    return value_in
+
+
+def decode_value(value_in):
+    if isinstance(value_in, dict):
+        value = np.array(value_in['value'], dtype=np.dtype(value_in['dtype']))
+        return value if value_in['array'] else value[()]
+    return value_in
+
+
+def encode_attrs(attrs_in):
+    """compressed serialisation of an attribute set; equal attribute sets give equal results"""
+    attrs_encoded = {attr: encode_value(value) for attr, value in attrs_in.items()}
+    return zlib.compress(json.dumps(attrs_encoded, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_attrs(data_in):
+    return {attr: decode_value(value) for attr, value in json.loads(zlib.decompress(data_in)).items()}
+
+
+def legacy_backup_file(backup_dir_in, ifile_in):
+    """backup file of a single file written by earlier versions of fill_attributes"""
+    ifile_name = str(ifile_in.split('/')[-1])
+    return os.path.join(backup_dir_in, ifile_name.split('.nc')[0] + '_attsave.json')
+
+
+class AttributeBackupStore(object):
+    """
+    Original global and variable attributes of netCDF files in a single SQLite database, indexed by the absolute
+    path of the files. Each distinct set of attributes is stored only once; the attributes of a file refer to
+    these sets.
+    """
+
+    def __init__(self, backup_dir_in, read_only_in=False):
+        self.backup_dir = backup_dir_in
+        self.set_ids = {}
+        self.sets = {}
+        store_file = os.path.join(backup_dir_in, BACKUP_STORE_FILE)
+        if read_only_in:
+            # A read-only store is empty until a backup has been written
+            self.connection = None
+            if os.path.isfile(store_file):
+                self.connection = sqlite3.connect(f'file:{store_file}?mode=ro', uri=True,
+                                                  timeout=BACKUP_STORE_TIMEOUT)
+            return
+        self.connection = sqlite3.connect(store_file, timeout=BACKUP_STORE_TIMEOUT)
+        # Committed backups survive crashes of the process before the file is modified
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS attribute_sets '
+                                    '(id INTEGER PRIMARY KEY, digest BLOB UNIQUE, data BLOB)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, sets TEXT)')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def set_id(self, attrs_in):
+        data = encode_attrs(attrs_in)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest not in self.set_ids:
+            self.connection.execute('INSERT OR IGNORE INTO attribute_sets (digest, data) VALUES (?, ?)',
+                                    (digest, data))
+            self.set_ids[digest] = self.connection.execute('SELECT id FROM attribute_sets WHERE digest = ?',
+                                                           (digest,)).fetchone()[0]
+        return self.set_ids[digest]
+
+    def attribute_set(self, set_id_in):
+        if set_id_in not in self.sets:
+            data = self.connection.execute('SELECT data FROM attribute_sets WHERE id = ?', (set_id_in,)).fetchone()
+            self.sets[set_id_in] = decode_attrs(data[0])
+        return self.sets[set_id_in]
+
+    def put(self, ifile_in, attrs_in):
+        """store the attributes of a file ({GLOBAL_KEY: global attributes, variable: variable attributes})"""
+        with self.connection:
+            sets = {name: self.set_id(attrs) for name, attrs in attrs_in.items()}
+            self.connection.execute('INSERT OR REPLACE INTO files (path, sets) VALUES (?, ?)',
+                                    (os.path.abspath(ifile_in), json.dumps(sets)))
+
+    def get(self, ifile_in):
+        """stored attributes of a file or None"""
+        if self.connection is None:
+            return None
+        row = self.connection.execute('SELECT sets FROM files WHERE path = ?',
+                                      (os.path.abspath(ifile_in),)).fetchone()
+        if row is None:
+            return None
+        return {name: dict(self.attribute_set(set_id)) for name, set_id in json.loads(row[0]).items()}
+
+    def files_under(self, ipath_in):
+        """files in directory `ipath_in` (including subdirectories) whose attributes are stored"""
+        if self.connection is None:
+            return []
+        prefix = os.path.join(os.path.abspath(ipath_in), '')
+        # '0' is the character following the path separator
+        rows = self.connection.execute('SELECT path FROM files WHERE path >= ? AND path < ? ORDER BY path',
+                                       (prefix, prefix[:-1] + '0'))
+        return [row[0] for row in rows]
+
+    def original_attributes(self, ds_in, ifile_in):
+        """
+        original attributes of an opened file and whether they are stored; if the file has not been processed
+        before, they are read from the file
+        """
+        attrs_dict = self.get(ifile_in)
+        if attrs_dict is not None:
+            return attrs_dict, True
+        legacy_file = legacy_backup_file(self.backup_dir, ifile_in)
+        if os.path.isfile(legacy_file):
+            with open(legacy_file, 'r') as f:
+                return json.load(f), False
+        attrs_dict = {GLOBAL_KEY: {attr: ds_in.getncattr(attr) for attr in ds_in.ncattrs()}}
+        for var, variable in ds_in.variables.items():
+            attrs_dict[var] = {var_attr: variable.getncattr(var_attr) for var_attr in variable.ncattrs()}
+        return attrs_dict, False
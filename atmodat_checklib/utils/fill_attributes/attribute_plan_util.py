@@ -0,0 +1,373 @@
+"""module attribute_plan_util.py to compile the attribute csv files once and apply them to many netCDF files"""
+
+import contextlib
+import csv
+import datetime
+import math
+import multiprocessing
+import os
+import re
+import warnings
+import numpy as np
+from netCDF4 import Dataset
+from atmodat_checklib.utils.fill_attributes.attribute_backup_util import AttributeBackupStore, GLOBAL_KEY, encode_value
+
+STATUS_LIST = ['mandatory', 'recommended', 'optional']
+# Variable attributes which are never written
+NOT_WRITTEN_ATTRS = ['varname_new', '_FillValue']
+# Number of files handed to a worker process at once
+FILL_CHUNK_SIZE = 16
+# Entries of the csv files read as missing values (those of pandas.read_csv)
+CSV_NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+                 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+CSV_INT = re.compile(r'\s*[+-]?\d+\s*')
+CSV_FLOAT = re.compile(r'\s*[+-]?((\d+\.?\d*|\.\d+)(e[+-]?\d+)?|inf|infinity)\s*', re.IGNORECASE)
+
+
+def append_string(string_in, string_old_in, **kwargs):
+    delimiter = ' '
+    if 'delimiter' in kwargs:
+        delimiter = kwargs['delimiter']
+    if string_old_in:
+        out_string = delimiter.join([str(string_in), string_old_in])
+    else:
+        out_string = string_in
+    return out_string
+
+
+def find_attribute_csvs(att_dir_in):
+    """csv files with the attributes to fill (keys: mandatory, recommended, optional, variable)"""
+    fill_csv_file = {}
+    for att_csv_file in os.listdir(att_dir_in):
+        for fill_type in STATUS_LIST:
+            if fill_type in att_csv_file:
+                fill_csv_file[fill_type] = os.path.join(att_dir_in, att_csv_file)
+        if 'variable' in att_csv_file:
+            fill_csv_file['variable'] = os.path.join(att_dir_in, att_csv_file)
+    if not fill_csv_file:
+        raise AssertionError('No csv files with attributes to fill were found in ' + att_dir_in)
+    return fill_csv_file
+
+
+def values_equal(value_in, value_other_in):
+    """whether two attribute values are equal; numbers read from backups equal those of the same value in files"""
+    if isinstance(value_in, str) or isinstance(value_other_in, str):
+        return isinstance(value_in, str) and isinstance(value_other_in, str) and value_in == value_other_in
+    try:
+        return bool(np.array_equal(np.asarray(value_in), np.asarray(value_other_in)))
+    except (TypeError, ValueError):
+        return False
+
+
+def is_missing(value_in):
+    return value_in is None or (isinstance(value_in, float) and math.isnan(value_in))
+
+
+def is_filled(value_in):
+    if isinstance(value_in, str):
+        return len(value_in.strip()) != 0
+    return not is_missing(value_in)
+
+
+class AttributePlan(object):
+    """
+    Attributes to fill, compiled once from the csv files.
+
+    `global_rules` is a list of (attribute, append, string) of the global attributes to be used; rules of later csv
+    files replace those of earlier ones. A rule without string (empty entry in the csv file) keeps the present value
+    of the attribute if it is appended to, otherwise the attribute is left out. `variable_rules` holds the new name
+    (or None) and the attributes to fill for each variable, by its old name. `variable_rules_new` holds the
+    attributes to fill by the new name of the variables, which are used for variables that already have the new
+    name.
+    """
+
+    def __init__(self, global_rules_in, variable_rules_in, variable_rules_new_in, time_string_in):
+        self.global_rules = global_rules_in
+        self.variable_rules = variable_rules_in
+        self.variable_rules_new = variable_rules_new_in
+        self.time_string = time_string_in
+
+    def global_attrs(self, gattrs_old_in):
+        """global attributes of a file with the original global attributes `gattrs_old_in`, in alphabetical order"""
+        gattrs_new = {}
+        for attribute, append, string in self.global_rules:
+            string_old = gattrs_old_in.get(attribute) if append else None
+            if string is None:
+                string_out = string_old
+            elif attribute == 'history':
+                string_out = append_string(self.time_string + str(string) + '\n', string_old, delimiter=' ')
+            else:
+                string_out = append_string(string, string_old, delimiter=' ')
+            if string_out:
+                gattrs_new[attribute] = string_out
+        return dict(sorted(gattrs_new.items()))
+
+    def new_name(self, var_in):
+        varname_new = self.variable_rules.get(var_in, (None, {}))[0]
+        return varname_new or var_in
+
+    def variable_attrs(self, var_in, vattrs_old_in):
+        """attributes of variable `var_in` with the original attributes `vattrs_old_in`"""
+        vattrs_new = {attr: value for attr, value in vattrs_old_in.items() if attr not in NOT_WRITTEN_ATTRS}
+        if var_in in self.variable_rules:
+            vattrs_new.update(self.variable_rules[var_in][1])
+        elif var_in in self.variable_rules_new:
+            vattrs_new.update(self.variable_rules_new[var_in])
+        return vattrs_new
+
+    def file_changes(self, ds_in, attrs_orig_in, restore_in=False):
+        """
+        changes needed to bring the attributes of an opened file into the target state; the target state is the
+        filled (or with `restore_in` the original) state given the original attributes `attrs_orig_in`
+        (in the structure of the backup files)
+        """
+        changes = FileChanges()
+        if restore_in:
+            gattrs_target = attrs_orig_in['global_attr']
+        else:
+            gattrs_target = self.global_attrs(attrs_orig_in['global_attr'])
+        changes.add_attrs(None, {attr: ds_in.getncattr(attr) for attr in ds_in.ncattrs()}, gattrs_target,
+                          keep_order_in=not restore_in)
+
+        for var, vattrs_orig in attrs_orig_in.items():
+            if var == 'global_attr':
+                continue
+            # The variable has its original name or has been renamed before
+            if var in ds_in.variables:
+                var_current = var
+            elif self.new_name(var) in ds_in.variables:
+                var_current = self.new_name(var)
+            else:
+                continue
+            var_target = var if restore_in else self.new_name(var)
+            vattrs_target = vattrs_orig if restore_in else self.variable_attrs(var, vattrs_orig)
+            vattrs_target = {attr: value for attr, value in vattrs_target.items() if attr not in NOT_WRITTEN_ATTRS}
+            if var_current != var_target:
+                changes.renames.append((var_current, var_target))
+            variable = ds_in.variables[var_current]
+            vattrs_current = {attr: variable.getncattr(attr) for attr in variable.ncattrs()
+                              if attr not in NOT_WRITTEN_ATTRS}
+            changes.add_attrs(var_target, vattrs_current, vattrs_target)
+        return changes
+
+
+class FileChanges(object):
+    """Attribute changes of a single file; variables are given by their name after the renames"""
+
+    def __init__(self):
+        self.renames = []
+        self.set_attrs = {}
+        self.del_attrs = {}
+
+    def add_attrs(self, var_in, attrs_current_in, attrs_target_in, keep_order_in=False):
+        """
+        add changes of the global (`var_in` None) or variable attributes from the current to the target state; with
+        `keep_order_in`, all attributes are rewritten if they would not end up in the order of the target state
+        """
+        set_attrs = {attr: value for attr, value in attrs_target_in.items()
+                     if attr not in attrs_current_in or not values_equal(attrs_current_in[attr], value)}
+        del_attrs = [attr for attr in attrs_current_in if attr not in attrs_target_in]
+        # Changed attributes keep their position, new attributes are added at the end
+        order = [attr for attr in attrs_current_in if attr in attrs_target_in] + \
+            [attr for attr in attrs_target_in if attr not in attrs_current_in]
+        if keep_order_in and order != list(attrs_target_in):
+            set_attrs = dict(attrs_target_in)
+            del_attrs = list(attrs_current_in)
+        if set_attrs:
+            self.set_attrs[var_in] = set_attrs
+        if del_attrs:
+            self.del_attrs[var_in] = del_attrs
+
+    def __len__(self):
+        return (len(self.renames) + sum(len(attrs) for attrs in self.set_attrs.values())
+                + sum(len(attrs) for attrs in self.del_attrs.values()))
+
+    def to_record(self, ifile_in):
+        """JSON record of the changes of file `ifile_in` for the change manifest"""
+        def by_name(attrs_in):
+            return {GLOBAL_KEY if var is None else var: attrs for var, attrs in attrs_in.items()}
+        return {'file': os.path.abspath(ifile_in), 'renames': self.renames,
+                'set': {var: {attr: encode_value(value) for attr, value in attrs.items()}
+                        for var, attrs in by_name(self.set_attrs).items()},
+                'delete': by_name(self.del_attrs)}
+
+    def apply(self, ds_in):
+        """apply all changes to an opened file (a DefineModeDataset) within a single define mode session"""
+        with define_mode(ds_in):
+            for var_current, var_target in self.renames:
+                ds_in.renameVariable(var_current, var_target)
+            for var, attrs in self.del_attrs.items():
+                target = ds_in if var is None else ds_in.variables[var]
+                for attr in attrs:
+                    target.delncattr(attr)
+            for var, attrs in self.set_attrs.items():
+                target = ds_in if var is None else ds_in.variables[var]
+                target.setncatts(attrs)
+
+
+class DefineModeDataset(Dataset):
+    """
+    netCDF4.Dataset which can be kept in define mode for a block of header changes (see define_mode); by default,
+    the netCDF4 library enters and leaves define mode for every single change of a netCDF classic file, and each
+    time it leaves define mode the header is written again
+    """
+
+    def _redef(self):
+        if not self.__dict__.get('_keep_define_mode'):
+            Dataset._redef(self)
+
+    def _enddef(self):
+        if not self.__dict__.get('_keep_define_mode'):
+            Dataset._enddef(self)
+
+
+@contextlib.contextmanager
+def define_mode(ds_in):
+    """keep a netCDF classic file opened as DefineModeDataset in define mode while the enclosed block changes it"""
+    if isinstance(ds_in, DefineModeDataset) and ds_in.data_model.startswith('NETCDF3'):
+        ds_in._redef()
+        ds_in.__dict__['_keep_define_mode'] = True
+        try:
+            yield
+        finally:
+            ds_in.__dict__['_keep_define_mode'] = False
+            ds_in._enddef()
+    else:
+        yield
+
+
+def convert_csv_column(values_in):
+    """
+    convert the entries of a csv column like pandas.read_csv: columns of integers, floats or booleans (true or
+    false in any case) are converted to these types (integers with missing values to floats); missing values are NaN
+    """
+    present = [value for value in values_in if value not in CSV_NA_VALUES]
+    if all(CSV_INT.fullmatch(value) for value in present):
+        convert = int if len(present) == len(values_in) else float
+    elif all(CSV_FLOAT.fullmatch(value) for value in present):
+        convert = float
+    elif all(value.lower() in ('true', 'false') for value in present):
+        def convert(value):
+            return value.lower() == 'true'
+    else:
+        def convert(value):
+            return value
+    return [float('nan') if value in CSV_NA_VALUES else convert(value) for value in values_in]
+
+
+def read_csv_columns(ifile_csv_in):
+    """
+    values of the columns of a csv file with header (column: list of values), converted by convert_csv_column;
+    the standard csv module is used as the attribute csv files are small and pandas takes long to import
+    """
+    with open(ifile_csv_in, 'r', newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f) if any(value.strip() for value in row) or len(row) > 1]
+    if not rows:
+        raise ValueError('No columns found in ' + ifile_csv_in)
+    header, rows = rows[0], rows[1:]
+    for row in rows:
+        if len(row) > len(header):
+            raise ValueError(f'Expected {len(header)} fields in {ifile_csv_in}, found {len(row)}: {row}')
+    return {column: convert_csv_column([row[ncol] if ncol < len(row) else '' for row in rows])
+            for ncol, column in enumerate(header)}
+
+
+def compile_global_rules(ifile_csv_in, global_rules_in):
+    """add the global attributes to be used according to a csv file to `global_rules_in` (attribute: rule)"""
+    for attribute, use, append, string in zip(*read_csv_columns(ifile_csv_in).values()):
+        if not bool(use):
+            if not is_missing(string):
+                warnings.warn('Global attribute ' + attribute.strip() + ' should not be used but entry provided.')
+            continue
+        if is_missing(string):
+            if not append:
+                warnings.warn('Global attribute ' + attribute.strip() + ' should be used but empty entry provided.')
+            string = None
+        global_rules_in[attribute] = (attribute, bool(append), string)
+
+
+def compile_variable_rules(ifile_csv_in):
+    """new names and attributes of the variables, by old and by new name"""
+    varattrs_dict = read_csv_columns(ifile_csv_in)
+    variable_rules, variable_rules_new = {}, {}
+    for ind_var, var_old in enumerate(varattrs_dict['varname_old']):
+        varname_new = varattrs_dict['varname_new'][ind_var]
+        if not isinstance(varname_new, str) or len(varname_new.strip()) == 0:
+            varname_new = None
+        vattrs = {attr: values[ind_var] for attr, values in varattrs_dict.items()
+                  if attr not in ['varname_old', 'varname_new'] and is_filled(values[ind_var])}
+        # The first row of a variable is used
+        variable_rules.setdefault(var_old, (varname_new, vattrs))
+        if varname_new:
+            variable_rules_new.setdefault(varname_new, vattrs)
+    return variable_rules, variable_rules_new
+
+
+def compile_attribute_plan(att_dir_in):
+    """parse the csv files in `att_dir_in` into an AttributePlan"""
+    global_rules, variable_rules, variable_rules_new = {}, {}, {}
+    for fill_type, ifile_csv in find_attribute_csvs(att_dir_in).items():
+        if fill_type in STATUS_LIST:
+            compile_global_rules(ifile_csv, global_rules)
+        else:
+            variable_rules, variable_rules_new = compile_variable_rules(ifile_csv)
+    time_string = datetime.datetime.strftime(datetime.datetime.now(tz=datetime.timezone.utc), '%c: ')
+    return AttributePlan(list(global_rules.values()), variable_rules, variable_rules_new, time_string)
+
+
+def fill_file(ifile_in, plan_in, store_in, restore_in=False, dry_run_in=False):
+    """
+    fill (or restore) the attributes of a single file; the changes are computed on the file opened read-only, so
+    files without changes (and all files with `dry_run_in`) are not modified. The original attributes are stored
+    before the file is modified.
+
+    :return: FileChanges of the file
+    """
+    with Dataset(ifile_in, 'r') as ds:
+        attrs_orig, stored = store_in.original_attributes(ds, ifile_in)
+        changes = plan_in.file_changes(ds, attrs_orig, restore_in)
+    if changes and not dry_run_in:
+        if not stored:
+            store_in.put(ifile_in, attrs_orig)
+        with DefineModeDataset(ifile_in, 'a') as ds:
+            changes.apply(ds)
+    return changes
+
+
+# State of a worker process, set up once by init_fill_worker
+_worker = {}
+
+
+def init_fill_worker(plan_in, backup_dir_in, restore_in, dry_run_in):
+    _worker['args'] = (plan_in, restore_in, dry_run_in)
+    _worker['store'] = AttributeBackupStore(backup_dir_in, read_only_in=dry_run_in)
+
+
+def fill_file_safe(ifile_in):
+    """fill_file in a worker process; returns the file, the FileChanges or None and the error message"""
+    plan, restore, dry_run = _worker['args']
+    try:
+        return ifile_in, fill_file(ifile_in, plan, _worker['store'], restore, dry_run), None
+    except Exception as e:
+        return ifile_in, None, str(e)
+
+
+def fill_files(ifiles_in, plan_in, backup_dir_in, restore_in=False, njobs_in=1, dry_run_in=False):
+    """
+    fill (or restore) the attributes of many files with `njobs_in` processes; with `dry_run_in` the changes are
+    only computed
+
+    :return: iterator of (file, FileChanges or None, error message or None) in the order the files finish
+    """
+    if njobs_in <= 1:
+        init_fill_worker(plan_in, backup_dir_in, restore_in, dry_run_in)
+        try:
+            for ifile in ifiles_in:
+                yield fill_file_safe(ifile)
+        finally:
+            _worker.pop('store').close()
+        return
+    with multiprocessing.Pool(njobs_in, initializer=init_fill_worker,
+                              initargs=(plan_in, backup_dir_in, restore_in, dry_run_in)) as pool:
+        for result in pool.imap_unordered(fill_file_safe, ifiles_in, chunksize=FILL_CHUNK_SIZE):
+            yield result
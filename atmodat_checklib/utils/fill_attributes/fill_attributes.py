@@ -1,120 +1,84 @@
 import argparse
+import glob
 import os
-from netCDF4 import Dataset
-import numpy as np
-import json
-import pandas as pd
-import warnings
-import datetime
+from atmodat_checklib.utils.result_stream_util import ResultStreamWriter, read_result_stream
+
+# First record of change manifests
+MANIFEST_ID = 'fill_attributes changes'
 
 
 def main():
 
     # Command line parsing
     args = command_line_parse()
-    att_dir = args.attr_files_path
-    ifile = args.file
-    ipath = args.path
-    restore = args.restore
-
-    # Check if path to attribute is given and if CSVs exit
-    assert att_dir, "No path to attribute CSV files provided"
-
-    # Find all available attribute files
-    fill_csv_file = {}
-    status_list = ['mandatory', 'recommended', 'optional']
-    for att_csv_file in os.listdir(att_dir):
-        for fill_type in status_list:
-            if fill_type in att_csv_file:
-                fill_csv_file[fill_type] = os.path.join(att_dir, att_csv_file)
-        if 'variable' in att_csv_file:
-            fill_csv_file['variable'] = os.path.join(att_dir, att_csv_file)
-
-    # Check if csv files are provided and create directory for backup files
-    if not fill_csv_file:
-        raise AssertionError('No csv files with attributes to fill were found in ' + att_dir)
-    else:
-        backup_dir = os.path.join(att_dir, 'attr_backup')
-        os.makedirs(backup_dir, exist_ok=True)
-
-    # Find files to process
-    file_list = files_to_process(ipath, ifile)
+    njobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    run_fill_attributes(args.attr_files_path, args.file, args.path, args.restore, njobs, args.dry_run, args.apply)
 
-    for ifile in file_list:
 
-        # File name of backup file
-        ifile_name = str(ifile.split('/')[-1])
-        savegattr_file = os.path.join(backup_dir, ifile_name.split('.nc')[0] + '_attsave.json')
+def run_fill_attributes(att_dir, ifile, ipath, restore=False, njobs=1, dry_run=None, apply=None):
+    """
+    fill (or with `restore` restore) the attributes of the file `ifile` or all files in `ipath` with `njobs`
+    processes; with `dry_run` the changes are written into this change manifest instead, with `apply` only the
+    files listed in this change manifest are processed
+    """
 
-        # Open file
-        f = Dataset(ifile, 'a')
+    # Check if path to attribute is given and if CSVs exit
+    assert att_dir, "No path to attribute CSV files provided"
 
-        # Check if file has already been processed. Else backup of global attributes exits
-        if os.path.isfile(savegattr_file):
-            attrs_dict = json.loads(open(savegattr_file, 'r').read())
-        else:
-            attrs_dict = {}
-            attrs_dict['global_attr'] = f.__dict__
-            for var in f.variables.keys():
-                attrs_dict[var] = {}
-                for var_attr in f.variables[var].ncattrs():
-                    attrs_dict[var][var_attr] = f.variables[var].getncattr(var_attr)
-            open(savegattr_file, 'w').write(json.dumps(attrs_dict, cls=NumpyEncoder))
-
-        # Prepare global attributes to be written
-        global_attrs_write, var_attrs_write = {}, {}
-        for fill_type in fill_csv_file.keys():
-            if fill_type in status_list:
-                global_attrs_write = prepare_global_attributes(fill_csv_file[fill_type], attrs_dict['global_attr'],
-                                                               global_attrs_write)
-            else:
-                var_attrs_write = prepare_variable_attributes(fill_csv_file[fill_type], attrs_dict)
+    # Imported here as netCDF4 and numpy take long to import, which is not needed for --help
+    import atmodat_checklib.utils.fill_attributes.attribute_plan_util as attribute_plan
+    from atmodat_checklib.utils.fill_attributes.attribute_backup_util import AttributeBackupStore, legacy_backup_file
 
-        # Delete all preexisting global attributes
-        for gattr in f.ncattrs():
-            f.delncattr(gattr)
+    # Parse the csv files once and create directory for backup files (unless nothing is written)
+    plan = attribute_plan.compile_attribute_plan(att_dir)
+    backup_dir = os.path.join(att_dir, 'attr_backup')
+    if not dry_run:
+        os.makedirs(backup_dir, exist_ok=True)
 
-        # Write new/modified global attributes
-        global_attrs_write = dict(sorted(global_attrs_write.items()))
-        if not restore:
-            f.setncatts(global_attrs_write)
-        else:
-            f.setncatts(attrs_dict['global_attr'])
-
-        # Write new/modified variable attribute
-        for var in f.variables:
-            for var_attr in f.variables[var].ncattrs():
-                f.variables[var].delncattr(var_attr)
-
-        # First restore original variable information
-        var_keys = list(f.variables.keys())
-        for var in var_keys:
-            if var in attrs_dict.keys():
-                for attr, val_attrs in attrs_dict[var].items():
-                    if attr not in ['varname_new', '_FillValue']:
-                        f.variables[var].setncattr(attr, val_attrs)
-            else:
-                for var_old, attr_dict in var_attrs_write.items():
-                    if 'varname_new' in attr_dict:
-                        if var == attr_dict['varname_new']:
-                            f.renameVariable(var, var_old)
-                            for attr, val_attrs in attrs_dict[var_old].items():
-                                if attr not in ['varname_new', '_FillValue']:
-                                    f.variables[var_old].setncattr(attr, val_attrs)
-
-        # Write new variable attributes into file
-        if not restore:
-            for var, attr_dict in var_attrs_write.items():
-                if 'varname_new' in attr_dict:
-                    if attr_dict['varname_new'] != var:
-                        if var in f.variables:
-                            f.renameVariable(var, attr_dict['varname_new'])
-                        var = attr_dict['varname_new']
-                for attr, val_attrs in attr_dict.items():
-                    if attr not in ['varname_new', '_FillValue']:
-                        f.variables[var].setncattr(attr, val_attrs)
-
-        f.close()
+    # Find files to process; all files of a directory which have been filled before are restored in one pass
+    # (unless there are backups of earlier versions)
+    if apply:
+        file_list = manifest_files(apply, restore)
+    elif restore and ipath and not ifile and not glob.glob(legacy_backup_file(glob.escape(backup_dir), '*')):
+        with AttributeBackupStore(backup_dir, read_only_in=True) as store:
+            file_list = [ifile_stored for ifile_stored in store.files_under(ipath) if os.path.isfile(ifile_stored)]
+    else:
+        file_list = files_to_process(ipath, ifile)
+
+    manifest = None
+    if dry_run:
+        manifest = ResultStreamWriter(dry_run)
+        manifest.write({'manifest': MANIFEST_ID, 'restore': restore})
+    nchanges, nfiles_changed, failed = 0, 0, []
+    try:
+        for ifile_done, changes, error in attribute_plan.fill_files(file_list, plan, backup_dir, restore, njobs,
+                                                                    bool(dry_run)):
+            if error is not None:
+                print('Failed to process ' + ifile_done + ': ' + error)
+                failed.append(ifile_done)
+            elif changes:
+                nchanges += len(changes)
+                nfiles_changed += 1
+                if manifest:
+                    manifest.write(changes.to_record(ifile_done))
+    finally:
+        if manifest:
+            manifest.close()
+    print(f'--- {len(file_list)} files processed, {nfiles_changed} files with {nchanges} attribute changes'
+          f'{" (dry run)" if dry_run else ""}, {len(failed)} failed---')
+    return failed
+
+
+def manifest_files(ifile_manifest_in, restore_in):
+    """files listed in a change manifest written with the same `restore_in` setting"""
+    records = read_result_stream(ifile_manifest_in)
+    header = next(records, {})
+    if header.get('manifest') != MANIFEST_ID:
+        raise RuntimeError(ifile_manifest_in + ' is not a change manifest of fill_attributes')
+    if header['restore'] != restore_in:
+        raise RuntimeError(ifile_manifest_in + ' has been written ' + ('with' if header['restore'] else 'without')
+                           + ' the restore option')
+    return [record['file'] for record in records if os.path.isfile(record['file'])]
 
 
 def rename_path_file(ifile_in, var_in, var_new_in, attr_file):
@@ -136,82 +100,6 @@ def rename_path_file(ifile_in, var_in, var_new_in, attr_file):
         os.rename(ifile_in, os.path.join(file_path_new, file_new))
 
 
-def prepare_variable_attributes(ifile_csv_in, attrs_old_in):
-    # Read CSVs
-    varattrs_dict = pd.read_csv(ifile_csv_in, na_values='None').to_dict(orient='list')
-    var_info = {}
-    for var in attrs_old_in.keys():
-        if var != 'global_attr':
-            var_info[var] = attrs_old_in[var]
-            if var in varattrs_dict['varname_old']:
-                ind_var = varattrs_dict['varname_old'].index(var)
-                varname_new = varattrs_dict['varname_new'][ind_var]
-                if isinstance(varname_new, str):
-                    if len(varname_new.strip()) != 0:
-                        var_info[var]['varname_new'] = varname_new
-            elif var not in varattrs_dict['varname_old'] and var in varattrs_dict['varname_new']:
-                ind_var = varattrs_dict['varname_new'].index(var)
-            else:
-                continue
-            for tmp in varattrs_dict.keys():
-                if 'varname_old' not in tmp:
-                    att_fill = varattrs_dict[tmp][ind_var]
-                    if not pd.isna(att_fill) and len(att_fill.strip()) != 0:
-                        var_info[var][tmp] = varattrs_dict[tmp][ind_var]
-    return var_info
-
-
-def prepare_global_attributes(ifile_csv_in, gattrs_old_in, gattrs_new_in):
-    # Read csv and compare attributes to those already present
-    df_gattrs = pd.read_csv(ifile_csv_in, header=0, na_values='None')
-
-    for row in df_gattrs.itertuples(index=False):
-        attribute, use, append, string = row[:]
-        string_old, string_out = None, None
-        if not bool(use):
-            if not pd.isna(string):
-                warnings.warn('Global attribute ' + attribute.strip() + ' should not be used but entry provided.')
-        else:
-            if pd.isna(string) and not append:
-                warnings.warn('Global attribute ' + attribute.strip() + ' should be used but empty entry provided.')
-            if append:
-                try:
-                    string_old = gattrs_old_in[attribute]
-                except KeyError:
-                    string_old = None
-            if attribute == 'Conventions':
-                string_out = append_string(string, string_old, delimiter=' ')
-            elif attribute == 'history':
-                time_string = datetime.datetime.strftime(datetime.datetime.now(tz=datetime.timezone.utc), '%c: ')
-                history_string = time_string + str(string) + '\n'
-                string_out = append_string(history_string, string_old, delimiter=' ')
-            else:
-                string_out = append_string(string, string_old, delimiter=' ')
-        if string_out:
-            gattrs_new_in[attribute] = string_out
-    return gattrs_new_in
-
-
-def append_string(string_in, string_old_in, **kwargs):
-    delimiter = ' '
-    if 'delimiter' in kwargs:
-        delimiter = kwargs['delimiter']
-    if string_old_in:
-        out_string = delimiter.join([str(string_in), string_old_in])
-    else:
-        out_string = string_in
-    return out_string
-
-
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.int32):
-            return int(obj)
-        if isinstance(obj, np.float32):
-            return float(obj)
-        return json.JSONEncoder.default(self, obj)
-
-
 def files_to_process(ipath_in, ifile_in):
     file_list_out = []
     if ifile_in and not ipath_in:
@@ -241,6 +129,11 @@ def command_line_parse():
     parser.add_argument("-a", "--attr_files_path", help="Path where csv files for attribute to be filled are located")
     parser.add_argument("-r", "--restore", help="Restore variable/global attributes",
                         action="store_true", default=False)
+    parser.add_argument("-j", "--jobs", help="Number of processes which fill the attributes of the files "
+                                             "(0: all CPUs)", type=int, default=1)
+    parser.add_argument("-n", "--dry_run", help="Only write the changes of all files into this change manifest "
+                                                "(JSON lines, optionally .gz/.zst compressed)", default=None)
+    parser.add_argument("--apply", help="Only process the files listed in this change manifest", default=None)
     group = parser.add_mutually_exclusive_group()
     group.add_argument("-p", "--path", help="Add new attributes to all NetCDF in given directory "
                                             "(including subdirectories)")
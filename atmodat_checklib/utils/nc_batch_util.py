@@ -0,0 +1,97 @@
+"""module nc_batch_util.py to evaluate global attribute checks of many files at once"""
+
+import numpy as np
+from atmodat_checklib.utils import nc_util
+from atmodat_checklib.utils.nc_header_util import read_header
+
+STR_DTYPE = np.dtype(str).str
+
+
+class AttributeColumn(object):
+    """
+    Values of one global attribute across many files; missing attributes are given as None.
+
+    Besides the values, the column holds whether the attribute is present, the numpy type code and the
+    string representation of each value as arrays, which are used by the batch checks.
+    """
+
+    def __init__(self, values_in):
+        self.values = np.empty(len(values_in), dtype=object)
+        self.values[:] = values_in
+        self.present = np.array([value is not None for value in values_in], dtype=bool)
+        self.dtypes = np.array(['' if value is None else np.dtype(type(value)).str for value in values_in],
+                               dtype=str)
+        self.text = np.array(['' if value is None else str(value) for value in values_in], dtype=str)
+
+    def __len__(self):
+        return len(self.values)
+
+
+def attribute_columns(datasets_in, attrs_in):
+    """
+    Collect global attributes of many datasets into columns.
+
+    :param datasets_in: netCDF4 Datasets or NCHeader objects
+    :param attrs_in: names of the global attributes
+    :return: dictionary with an AttributeColumn for each attribute
+    """
+    values = {attr: [] for attr in attrs_in}
+    for ds in datasets_in:
+        ds_attrs = set(ds.ncattrs())
+        for attr in attrs_in:
+            values[attr].append(ds.getncattr(attr) if attr in ds_attrs else None)
+    return {attr: AttributeColumn(attr_values) for attr, attr_values in values.items()}
+
+
+def read_attribute_columns(ifiles_in, attrs_in):
+    """read global attributes of many files from their headers into columns"""
+    def headers():
+        for ifile in ifiles_in:
+            with read_header(ifile) as header:
+                yield header
+    return attribute_columns(headers(), attrs_in)
+
+
+def score_unique_values(column_in, value_score):
+    """
+    Scores of a check for an attribute column; 0 if the attribute is not present.
+    `value_score` is evaluated only once for each distinct string value.
+    """
+    scores = np.zeros(len(column_in), dtype=int)
+    is_str = column_in.dtypes == STR_DTYPE
+    if is_str.any():
+        unique_text, inverse = np.unique(column_in.text[is_str], return_inverse=True)
+        unique_scores = np.array([value_score(text) for text in unique_text.tolist()], dtype=int)
+        scores[is_str] = unique_scores[inverse]
+    for idx in np.flatnonzero(column_in.present & ~is_str):
+        scores[idx] = value_score(column_in.values[idx])
+    return scores
+
+
+def check_global_attr_type(column_in, attr_type):
+    """batch version of nc_util.check_global_attr_type"""
+    scores = np.zeros(len(column_in), dtype=int)
+    if attr_type not in nc_util.ATTR_TYPES:
+        scores[column_in.present] = 1
+        return scores
+    scores[column_in.present] = 4
+    wrong_type = column_in.dtypes != np.dtype(nc_util.ATTR_TYPES[attr_type]).str
+    scores[column_in.present & wrong_type] = 3
+    scores[column_in.present & (np.char.str_len(column_in.text) == 0)] = 2
+    return scores
+
+
+def check_global_attr_iso8601(column_in):
+    """batch version of nc_util.check_global_attr_iso8601"""
+    return score_unique_values(column_in, nc_util.iso8601_score)
+
+
+def check_conventions_version_number(column_in, conv_type, min_ver, max_ver):
+    """batch version of nc_util.check_conventions_version_number"""
+    return score_unique_values(column_in, lambda value: nc_util.conventions_version_number_score(
+        value, conv_type, min_ver, max_ver))
+
+
+def check_global_attribute_resolution_format(column_in):
+    """batch version of nc_util.check_global_attribute_resolution_format"""
+    return score_unique_values(column_in, nc_util.value_unit_format_conformity)
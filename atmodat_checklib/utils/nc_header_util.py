@@ -0,0 +1,192 @@
+"""module nc_header_util.py to read the global attributes of netCDF files without opening the data model"""
+
+import struct
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+CLASSIC_MAGIC = b'CDF'
+HDF5_MAGIC = b'\x89HDF\r\n\x1a\n'
+# Possible offsets of the HDF5 superblock (0 or a user block of 512 * 2^n bytes)
+HDF5_MAGIC_OFFSETS = [0] + [512 << n for n in range(8)]
+# Bytes read at once while parsing a classic header
+HEADER_CHUNK_SIZE = 64 * 1024
+
+NC_DIMENSION = 10
+NC_ATTRIBUTE = 12
+NC_CHAR = 2
+# Big-endian numpy types of the netCDF classic (CDF-1, CDF-2 and CDF-5) attribute types
+NC_CLASSIC_TYPES = {1: '>i1', 3: '>i2', 4: '>i4', 5: '>f4', 6: '>f8', 7: '>u1', 8: '>u2', 9: '>u4', 10: '>i8',
+                    11: '>u8'}
+# Attributes of the HDF5 root group that are hidden by the netCDF library
+NC4_HIDDEN_ATTRS = {'_NCProperties', '_IsNetcdf4', '_SuperblockVersion', '_nc3_strict', '_Netcdf4Dimid',
+                    '_Netcdf4Coordinates'}
+
+
+class NCHeader(object):
+    """
+    Global attributes of a netCDF file with the attribute interface of a netCDF4 Dataset
+    (ncattrs, getncattr, attribute access). Attribute values have the same types as those
+    returned by netCDF4.
+    """
+
+    def __init__(self, ifile_in, attributes_in):
+        self._filepath = ifile_in
+        self._attributes = attributes_in
+
+    def ncattrs(self):
+        return list(self._attributes)
+
+    def getncattr(self, name):
+        try:
+            return self._attributes[name]
+        except KeyError:
+            raise AttributeError(f"NetCDF: Attribute not found: {name}")
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_attributes', '_filepath'):
+            raise AttributeError(name)
+        return self.getncattr(name)
+
+    def filepath(self):
+        return self._filepath
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"<NCHeader of {self._filepath}: {len(self._attributes)} global attributes>"
+
+
+class ClassicHeaderReader(object):
+    """Sequential reader of a netCDF classic header that only reads as much of the file as needed"""
+
+    def __init__(self, f_in):
+        self.f = f_in
+        self.buffer = b''
+        self.pos = 0
+        self.version = None
+
+    def read(self, size):
+        end = self.pos + size
+        if end > len(self.buffer):
+            self.buffer += self.f.read(max(end - len(self.buffer), HEADER_CHUNK_SIZE))
+            if end > len(self.buffer):
+                raise ValueError('Truncated netCDF header')
+        data = self.buffer[self.pos:end]
+        self.pos = end
+        return data
+
+    def read_int(self):
+        return struct.unpack('>i', self.read(4))[0]
+
+    def read_non_neg(self):
+        if self.version == 5:
+            return struct.unpack('>q', self.read(8))[0]
+        return self.read_int()
+
+    def read_padded(self, size):
+        data = self.read(size)
+        self.read(-size % 4)
+        return data
+
+    def read_name(self):
+        return self.read_padded(self.read_non_neg()).decode('utf-8')
+
+    def read_list_header(self, tag_in):
+        tag = self.read_int()
+        nelems = self.read_non_neg()
+        if tag not in (0, tag_in) or (tag == 0 and nelems != 0):
+            raise ValueError('Invalid netCDF header')
+        return nelems
+
+    def read_attribute(self):
+        name = self.read_name()
+        nc_type = self.read_int()
+        nelems = self.read_non_neg()
+        if nc_type == NC_CHAR:
+            value = self.read_padded(nelems)
+            return name, value.decode('utf-8', errors='replace').replace('\x00', '')
+
+        try:
+            dtype = np.dtype(NC_CLASSIC_TYPES[nc_type])
+        except KeyError:
+            raise ValueError(f'Unsupported type {nc_type} of attribute {name}')
+        value = np.frombuffer(self.read_padded(nelems * dtype.itemsize), dtype=dtype)
+        value = value.astype(dtype.newbyteorder('='))
+        if nelems == 1:
+            return name, value[0]
+        return name, value
+
+    def read_global_attributes(self):
+        magic = self.read(4)
+        if magic[:3] != CLASSIC_MAGIC or magic[3] not in (1, 2, 5):
+            raise ValueError('Not a netCDF classic file')
+        self.version = magic[3]
+        # Number of records
+        self.read_non_neg()
+        for _ in range(self.read_list_header(NC_DIMENSION)):
+            self.read_name()
+            self.read_non_neg()
+        return dict(self.read_attribute() for _ in range(self.read_list_header(NC_ATTRIBUTE)))
+
+
+def convert_hdf5_attribute(value_in):
+    """convert an attribute value read by h5py to the type returned by netCDF4"""
+    if isinstance(value_in, h5py.Empty):
+        return ''
+    if isinstance(value_in, bytes):
+        return value_in.decode('utf-8', errors='replace').replace('\x00', '')
+    if isinstance(value_in, np.ndarray):
+        if value_in.dtype.kind in ('S', 'O', 'U'):
+            values = [convert_hdf5_attribute(value) for value in value_in.tolist()]
+            return values[0] if len(values) == 1 else values
+        if value_in.size == 1:
+            return value_in.reshape(-1)[0]
+    return value_in
+
+
+def read_hdf5_attributes(ifile_in):
+    """global attributes of a netCDF-4 file; only the root group header is read if h5py is available"""
+    if h5py is None:
+        from netCDF4 import Dataset
+        with Dataset(ifile_in, 'r') as ds:
+            return {attr: ds.getncattr(attr) for attr in ds.ncattrs()}
+    with h5py.File(ifile_in, 'r') as f:
+        return {attr: convert_hdf5_attribute(f.attrs[attr]) for attr in f.attrs if attr not in NC4_HIDDEN_ATTRS}
+
+
+def is_hdf5(f_in):
+    for offset in HDF5_MAGIC_OFFSETS:
+        f_in.seek(offset)
+        magic = f_in.read(len(HDF5_MAGIC))
+        if magic == HDF5_MAGIC:
+            return True
+        if len(magic) < len(HDF5_MAGIC):
+            break
+    return False
+
+
+def read_header(ifile_in):
+    """
+    Read the global attributes of a netCDF classic or netCDF-4 file without opening the file as netCDF4 Dataset.
+
+    :param ifile_in: path of the netCDF file
+    :return: NCHeader object
+    """
+    with open(ifile_in, 'rb') as f:
+        if f.read(len(CLASSIC_MAGIC)) == CLASSIC_MAGIC:
+            f.seek(0)
+            return NCHeader(ifile_in, ClassicHeaderReader(f).read_global_attributes())
+        if not is_hdf5(f):
+            raise ValueError(f'{ifile_in} is not a netCDF file')
+    return NCHeader(ifile_in, read_hdf5_attributes(ifile_in))
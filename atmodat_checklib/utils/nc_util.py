@@ -3,6 +3,18 @@ import re
 from cfunits import Units
 import dateutil.parser as parser
 from checklib.code.errors import ParameterError
+from atmodat_checklib.utils.unit_cache_util import unit_validity, resolution_scores
+from atmodat_checklib.utils.timing_util import timings
+
+# Python types of the attribute types used in the check definitions
+ATTR_TYPES = {'int': int, 'float': float, 'str': str}
+
+# Number, optionally directly followed by a unit
+VAR_UNIT_RE = re.compile(r'([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)(\s*)(\S*)')
+DIGIT_RE = re.compile(r'\d')
+FLOAT_SPECIAL_RE = re.compile(r'\s*[-+]?(nan|inf|infinity)\s*', re.IGNORECASE)
+# Kinds of tokens of value+unit strings
+TOKEN_VALUE, TOKEN_VALUE_UNIT, TOKEN_UNIT = range(3)
 
 
 def check_conventions_version_number(ds, attr, conv_type, min_ver, max_ver):
@@ -23,6 +35,12 @@ def check_conventions_version_number(ds, attr, conv_type, min_ver, max_ver):
         return 0
     global_attr = getattr(ds, attr)
 
+    return conventions_version_number_score(global_attr, conv_type, min_ver, max_ver)
+
+
+def conventions_version_number_score(global_attr, conv_type, min_ver, max_ver):
+    """score of check_conventions_version_number for an existing attribute value"""
+
     version = None
     global_attr_split = global_attr.split(' ')
     for conv in global_attr_split:
@@ -62,12 +80,8 @@ def check_global_attr_type(ds, attr, attr_type):
 
     global_attr = getattr(ds, attr)
 
-    if attr_type == 'int':
-        attr_type_class = int
-    elif attr_type == 'float':
-        attr_type_class = float
-    elif attr_type == 'str':
-        attr_type_class = str
+    if attr_type in ATTR_TYPES:
+        attr_type_class = ATTR_TYPES[attr_type]
     else:
         return 1
 
@@ -95,6 +109,12 @@ def check_global_attr_iso8601(ds, attr):
 
     global_attr = getattr(ds, attr)
 
+    return iso8601_score(global_attr)
+
+
+def iso8601_score(global_attr):
+    """score of check_global_attr_iso8601 for an existing attribute value"""
+
     try:
         parser.isoparse(global_attr)
         return 2
@@ -124,13 +144,34 @@ def value_unit_format_conformity(resol_string):
 
     resol_string = resol_string.strip()
 
+    score = resolution_scores.get(resol_string)
+    if score is None:
+        score = resolution_format_score(resol_string)
+        resolution_scores.put(resol_string, score)
+    return score
+
+
+def unit_is_valid(units):
+    """validity of a unit string according to udunits; results are cached"""
+    valid = unit_validity.get(units)
+    if valid is None:
+        with timings.stage('unit validation (uncached)'):
+            valid = Units(units).isvalid
+        unit_validity.put(units, valid)
+    return valid
+
+
+def resolution_format_score(resol_string):
+
     if resol_string == 'point':
         return 4
-    elif not check_value_exists(resol_string):
+
+    tokens = tokenize_value_unit(resol_string)
+    if not value_exists(tokens):
         # Missing value
         return 1
     else:
-        val_unit_dict = split_value_unit(resol_string)
+        val_unit_dict = value_unit_dict(tokens)
         unit_valid = True
         for val in val_unit_dict.keys():
             if not val_unit_dict[val]:
@@ -139,7 +180,7 @@ def value_unit_format_conformity(resol_string):
             else:
                 unit_valid = True
                 for units in val_unit_dict[val]:
-                    if not Units(units).isvalid and not units == "''":
+                    if not units == "''" and not unit_is_valid(units):
                         unit_valid = False
         if unit_valid:
             # All okay
@@ -157,31 +198,68 @@ def isfloat(value):
         return False
 
 
-def check_value_exists(string_in):
-    var_unit_re = re.compile(r'([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)(\s*)(\S*)')
-    val_ex = False
+def tokenize_value_unit(string_in):
+    """
+    Split a value+unit string at spaces into typed tokens in a single pass.
+
+    :param string_in: value+unit string, e.g. '0.1 degree' or '10km'
+    :return: list of (kind, value, unit) tuples: (TOKEN_VALUE, float, None) for numbers,
+    (TOKEN_VALUE_UNIT, number string, unit) for numbers directly followed by a unit and
+    (TOKEN_UNIT, None, token) for all other tokens
+    """
+    tokens = []
     for substring in string_in.split(' '):
-        if isfloat(substring) or re.match(var_unit_re, substring):
-            val_ex = True
-    return val_ex
+        val_unit_match = VAR_UNIT_RE.match(substring)
+        if val_unit_match and not val_unit_match[6]:
+            tokens.append((TOKEN_VALUE, float(substring), None))
+            continue
+        # float() only succeeds for strings containing digits or special values like 'nan'
+        if val_unit_match or DIGIT_RE.search(substring) or FLOAT_SPECIAL_RE.fullmatch(substring):
+            try:
+                tokens.append((TOKEN_VALUE, float(substring), None))
+                continue
+            except ValueError:
+                pass
+        if val_unit_match:
+            tokens.append((TOKEN_VALUE_UNIT, val_unit_match[1], val_unit_match[6]))
+        else:
+            tokens.append((TOKEN_UNIT, None, substring))
+    return tokens
 
 
-def split_value_unit(string_in):
-    var_unit_re = re.compile(r'([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)(\s*)(\S*)')
+def value_exists(tokens_in):
+    """whether tokens of a value+unit string contain a number"""
+    return any(kind != TOKEN_UNIT for kind, _, _ in tokens_in)
+
+
+def value_unit_dict(tokens_in):
+    """
+    Assign units to the numbers of a tokenized value+unit string.
+
+    A number separated from its unit by a space gets all following unit tokens. A number directly followed
+    by a unit gets this unit and, if no separate number precedes it, the following unit tokens.
+    """
+    unit_tokens = [unit for kind, _, unit in tokens_in if kind == TOKEN_UNIT]
     val_unit_dict_out = {}
     val_space, val_nospace = None, None
-    for ns, substring in enumerate(string_in.split(' ')):
-        if isfloat(substring):
-            val_space = float(substring)
-            val_unit_dict_out[val_space] = []
-            for substring_loop in string_in.split(' ')[(ns + 1)::]:
-                if not isfloat(substring_loop) and not re.match(var_unit_re, substring_loop):
-                    val_unit_dict_out[val_space].append(substring_loop)
-        elif re.match(var_unit_re, substring) or not isfloat(substring) and not val_space:
-            if re.match(var_unit_re, substring):
-                val_unit_split = re.match(var_unit_re, substring)
-                val_nospace = val_unit_split[1]
-                val_unit_dict_out[val_nospace] = [val_unit_split[6]]
-            else:
-                val_unit_dict_out[val_nospace].append(substring)
+    n_units = 0
+    for kind, value, unit in tokens_in:
+        if kind == TOKEN_VALUE:
+            val_space = value
+            val_unit_dict_out[val_space] = unit_tokens[n_units:]
+        elif kind == TOKEN_VALUE_UNIT:
+            val_nospace = value
+            val_unit_dict_out[val_nospace] = [unit]
+        else:
+            n_units += 1
+            if not val_space:
+                val_unit_dict_out[val_nospace].append(unit)
     return val_unit_dict_out
+
+
+def check_value_exists(string_in):
+    return value_exists(tokenize_value_unit(string_in))
+
+
+def split_value_unit(string_in):
+    return value_unit_dict(tokenize_value_unit(string_in))
@@ -1,14 +1,30 @@
 """module output_directory_util.py to create output directory"""
 
+import fnmatch
+import itertools
 import os
+import queue
+import threading
+import warnings
 from datetime import datetime
 
+# Maximum number of discovered files waiting to be checked
+DISCOVERY_QUEUE_SIZE = 1024
+
 
 def create_directories(opath, check_types):
-    opath = os.path.join(opath, datetime.now().strftime("%Y%m%d_%H%M"), "")
-    # Create directory to store output from checker if it does not exist already
-    if not os.path.isdir(opath):
-        os.makedirs(opath)
+    """create a new run directory named by the current time in `opath` and its subdirectories for `check_types`"""
+    opath_time = os.path.join(opath, datetime.now().strftime("%Y%m%d_%H%M"))
+    # Runs started within the same minute get a suffix instead of sharing (and clearing) one directory
+    opath, suffix = opath_time, 0
+    while True:
+        try:
+            os.makedirs(opath)
+            break
+        except FileExistsError:
+            suffix += 1
+            opath = f'{opath_time}_{suffix}'
+    opath = os.path.join(opath, "")
     for check in check_types:
         check_dir = opath + check
         if not os.path.isdir(check_dir):
@@ -37,3 +53,89 @@ def return_files_in_directory(input_path):
         raise RuntimeError('Given directory contains no netCDF files')
 
     return file_names
+
+
+def matches_any(path_in, patterns_in):
+    return any(fnmatch.fnmatch(path_in, pattern) for pattern in patterns_in)
+
+
+def iter_netcdf_files(input_path, max_depth=None, include=None, exclude=None):
+    """
+    Yield the netCDF files in a directory tree while it is walked with os.scandir. Like os.walk, directories which
+    cannot be read are skipped (with a warning).
+
+    :param input_path: directory to search
+    :param max_depth: maximum depth of subdirectories to search (0: only `input_path` itself, None: no limit)
+    :param include: glob patterns of which one must match the path of a file relative to `input_path`
+    :param exclude: glob patterns of files and directories (relative to `input_path`) to be skipped
+    """
+    exclude = exclude or []
+    nfiles = 0
+    dirs = [(input_path, '', 0)]
+    while dirs:
+        dir_path, dir_rel, depth = dirs.pop()
+        try:
+            entries = os.scandir(dir_path)
+        except OSError as e:
+            warnings.warn(f'Skipping directory {dir_path}: {e}')
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = os.path.join(dir_rel, entry.name)
+                if exclude and matches_any(rel_path, exclude):
+                    continue
+                # Like os.walk, symbolic links to directories are not followed
+                if entry.is_dir(follow_symlinks=False):
+                    if max_depth is None or depth < max_depth:
+                        dirs.append((entry.path, rel_path, depth + 1))
+                elif entry.name.endswith('.nc'):
+                    if include and not matches_any(rel_path, include):
+                        continue
+                    if entry.is_file():
+                        nfiles += 1
+                        yield entry.path
+                elif entry.name.endswith('.NC'):
+                    raise RuntimeError(f'NetCDF file suffix in {entry.path} must be lower case. '
+                                       f'Please verify for other files')
+    if not nfiles:
+        raise RuntimeError('Given directory contains no netCDF files')
+
+
+def peek_first(iterable_in):
+    """
+    Take the first item of `iterable_in` right away, so that errors like a directory without netCDF files are raised
+    before anything is done with the items; returns an iterator over all items.
+    """
+    iterator = iter(iterable_in)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], iterator)
+
+
+def prefetch(iterable_in, maxsize=DISCOVERY_QUEUE_SIZE):
+    """
+    Consume `iterable_in` in a background thread and pass its items on through a bounded queue,
+    e.g. to walk a directory tree while the files found so far are already checked.
+    """
+    items = queue.Queue(maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable_in:
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+        else:
+            items.put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item, error = items.get()
+        if item is done:
+            if error:
+                raise error
+            return
+        yield item
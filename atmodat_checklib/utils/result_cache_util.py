@@ -0,0 +1,148 @@
+"""module result_cache_util.py to reuse checker output of unchanged files"""
+
+import hashlib
+import json
+import os
+import shutil
+
+# Default maximum size of the cache in MB
+CACHE_SIZE_DEFAULT = 1024
+# Name of the file holding a cached record of the results
+RECORD_FILE = 'record.json'
+
+
+def file_content_hash(ifile_in, chunk_size=1 << 20):
+    """sha256 hash of the content of a file"""
+    file_hash = hashlib.sha256()
+    with open(ifile_in, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def file_stat_key(ifile_in):
+    """identify a file version by its size, modification time and inode"""
+    stat = os.stat(ifile_in)
+    return f'{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}'
+
+
+class ResultCache(object):
+    """
+    On-disk cache of checker output files.
+
+    Entries are keyed by the checked file (path as given, plus size/mtime/inode or, in strict mode, the hash of
+    the file content), the check type and `key_info` (versions of the checkers, CF version and AtMoDat_CVs
+    revision). The least recently used entries are removed when the cache grows beyond `max_size_mb`.
+    The content hash of the last file is kept, so that a file is only read once for all its checks.
+    """
+
+    def __init__(self, cache_dir, key_info, strict=False, max_size_mb=CACHE_SIZE_DEFAULT):
+        self.cache_dir = cache_dir
+        self.key_info = json.dumps(key_info, sort_keys=True)
+        self.strict = strict
+        self.max_size = max_size_mb * 1024 * 1024
+        # (path, stat key, content hash) of the last file hashed in strict mode
+        self.last_hash = (None, None, None)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def file_key(self, ifile_in):
+        """identify the version of a file (see key); in strict mode, its content is only hashed once per version"""
+        stat_key = file_stat_key(ifile_in)
+        if not self.strict:
+            return stat_key
+        if self.last_hash[:2] != (ifile_in, stat_key):
+            self.last_hash = (ifile_in, stat_key, file_content_hash(ifile_in))
+        return self.last_hash[2]
+
+    def key(self, ifile_in, check_in, file_key_in=None):
+        """key of the entry of a check of a file; `file_key_in` is the result of file_key if already known"""
+        file_key = file_key_in or self.file_key(ifile_in)
+        key_string = '\n'.join([ifile_in, file_key, check_in, self.key_info])
+        return hashlib.sha256(key_string.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key_in):
+        return os.path.join(self.cache_dir, key_in[:2], key_in)
+
+    def restore(self, key_in, ofiles_in):
+        """copy cached output files to `ofiles_in`; returns False if there is no (complete) cache entry"""
+        entry_dir = self._entry_dir(key_in)
+        cached_files = [os.path.join(entry_dir, os.path.basename(ofile)) for ofile in ofiles_in]
+        if not all(os.path.isfile(cached_file) for cached_file in cached_files):
+            return False
+        try:
+            for cached_file, ofile in zip(cached_files, ofiles_in):
+                shutil.copyfile(cached_file, ofile)
+        except FileNotFoundError:
+            # Entry has been replaced by another process in the meantime
+            return False
+        # Mark entry as recently used
+        os.utime(entry_dir)
+        return True
+
+    def store(self, key_in, ofiles_in, record_in=None):
+        """add output files and, if given, the record of their results (see restore_record) to the cache"""
+        tmp_dir = self._tmp_entry_dir(key_in)
+        for ofile in ofiles_in:
+            shutil.copyfile(ofile, os.path.join(tmp_dir, os.path.basename(ofile)))
+        if record_in is not None:
+            with open(os.path.join(tmp_dir, RECORD_FILE), 'w', encoding='utf-8') as f:
+                json.dump(record_in, f)
+        self._commit_entry(key_in, tmp_dir)
+
+    def restore_record(self, key_in):
+        """cached record of the results or None"""
+        entry_dir = self._entry_dir(key_in)
+        try:
+            with open(os.path.join(entry_dir, RECORD_FILE), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(entry_dir)
+        return record
+
+    def store_record(self, key_in, record_in):
+        """add a record of the result stream to the cache"""
+        tmp_dir = self._tmp_entry_dir(key_in)
+        with open(os.path.join(tmp_dir, RECORD_FILE), 'w', encoding='utf-8') as f:
+            json.dump(record_in, f)
+        self._commit_entry(key_in, tmp_dir)
+
+    def _tmp_entry_dir(self, key_in):
+        tmp_dir = self._entry_dir(key_in) + f'.tmp{os.getpid()}'
+        os.makedirs(tmp_dir, exist_ok=True)
+        return tmp_dir
+
+    def _commit_entry(self, key_in, tmp_dir_in):
+        entry_dir = self._entry_dir(key_in)
+        try:
+            os.rename(tmp_dir_in, entry_dir)
+        except OSError:
+            # Replace an existing entry, which may be incomplete; it is moved away first, so that other processes
+            # never see a partly removed entry
+            stale_dir = entry_dir + f'.stale{os.getpid()}'
+            try:
+                os.rename(entry_dir, stale_dir)
+                os.rename(tmp_dir_in, entry_dir)
+            except OSError:
+                # Entry has been replaced by another process in the meantime
+                shutil.rmtree(tmp_dir_in, ignore_errors=True)
+            shutil.rmtree(stale_dir, ignore_errors=True)
+
+    def evict(self):
+        """remove least recently used entries until the cache is smaller than the maximum size"""
+        entries = []
+        cache_size = 0
+        for prefix_dir in os.scandir(self.cache_dir):
+            if not prefix_dir.is_dir():
+                continue
+            for entry in os.scandir(prefix_dir.path):
+                entry_size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, entry_size, entry.path))
+                cache_size += entry_size
+
+        for _, entry_size, entry_path in sorted(entries):
+            if cache_size <= self.max_size:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            cache_size -= entry_size
+        return cache_size
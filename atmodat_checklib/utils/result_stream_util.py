@@ -0,0 +1,59 @@
+"""module result_stream_util.py to write and read checker results as a stream of JSON lines"""
+
+import gzip
+import io
+import json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Formats of the result stream; compression is chosen by the file suffix
+STREAM_FORMATS = ['jsonl', 'jsonl.gz', 'jsonl.zst']
+
+
+def open_stream(path_in, mode_in):
+    """open a (compressed) JSON-lines file for reading ('r') or writing ('w') text"""
+    if path_in.endswith('.gz'):
+        return gzip.open(path_in, mode_in + 't', encoding='utf-8')
+    if path_in.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError('zstandard has to be installed for zstd compressed result streams')
+        f_raw = open(path_in, mode_in + 'b')
+        if mode_in == 'w':
+            f_zst = zstandard.ZstdCompressor().stream_writer(f_raw, closefd=True)
+        else:
+            f_zst = zstandard.ZstdDecompressor().stream_reader(f_raw, closefd=True)
+        return io.TextIOWrapper(f_zst, encoding='utf-8')
+    return open(path_in, mode_in, encoding='utf-8')
+
+
+class ResultStreamWriter(object):
+    """Appends one compact JSON record per checked file to a result stream"""
+
+    def __init__(self, ofile_in):
+        self.ofile = ofile_in
+        self.f = open_stream(ofile_in, 'w')
+        self.nrecords = 0
+
+    def write(self, record_in):
+        self.f.write(json.dumps(record_in, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.nrecords += 1
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_result_stream(ifile_in):
+    """yield the records of a result stream"""
+    with open_stream(ifile_in, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
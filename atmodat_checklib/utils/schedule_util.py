@@ -0,0 +1,153 @@
+"""module schedule_util.py to order the files of a run by their estimated checking time (largest first)"""
+
+import csv
+import glob
+import heapq
+import json
+import os
+from atmodat_checklib.utils import batch_util
+from atmodat_checklib.utils.timing_util import TIMING_FILES_FILE
+
+# Orders in which files are handed to the worker processes
+SCHEDULES = ['walk', 'lpt']
+# Report of predicted and actual makespan in the output directory of a run
+SCHEDULE_REPORT_FILE = 'schedule_report.json'
+# Number of most recent runs whose file timings are used
+HISTORY_RUNS = 5
+# Minimum number of timed files of a format to fit its cost model
+MIN_FIT_FILES = 10
+# First bytes of netCDF classic and netCDF-4 (HDF5) files
+CLASSIC_MAGIC = b'CDF'
+HDF5_MAGIC = b'\x89HDF'
+
+
+def file_format(ifile_in):
+    """'classic' for netCDF classic files, 'netcdf4' for HDF5 based files, None otherwise"""
+    try:
+        with open(ifile_in, 'rb') as f:
+            magic = f.read(len(HDF5_MAGIC))
+    except OSError:
+        return None
+    if magic.startswith(CLASSIC_MAGIC):
+        return 'classic'
+    if magic.startswith(HDF5_MAGIC):
+        return 'netcdf4'
+    return None
+
+
+def load_file_timings(opath_in, exclude_in=None, nruns_in=HISTORY_RUNS):
+    """
+    checking time of the files (by absolute path) in the timings of the `nruns_in` most recent runs in the output
+    path `opath_in` (except the run directory `exclude_in`); the most recent time of each file is used
+    """
+    exclude = os.path.realpath(exclude_in) if exclude_in else None
+    timing_files = [ifile for ifile in glob.glob(os.path.join(glob.escape(opath_in), '*', TIMING_FILES_FILE))
+                    if os.path.realpath(os.path.dirname(ifile)) != exclude]
+    file_timings = {}
+    for ifile in sorted(timing_files, key=os.path.getmtime)[-nruns_in:]:
+        try:
+            with open(ifile, 'r', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    file_timings[os.path.abspath(row[0])] = float(row[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return file_timings
+
+
+def fit_cost_model(points_in):
+    """
+    coefficients (time per file, time per MB) of a linear fit of checking times to file sizes in MB
+    (`points_in`: list of (size, time)); None if there are less than MIN_FIT_FILES points
+    """
+    if len(points_in) < MIN_FIT_FILES:
+        return None
+    mean_size = sum(size for size, _ in points_in) / len(points_in)
+    mean_time = sum(elapsed for _, elapsed in points_in) / len(points_in)
+    var_size = sum((size - mean_size) ** 2 for size, _ in points_in)
+    cov = sum((size - mean_size) * (elapsed - mean_time) for size, elapsed in points_in)
+    per_mb = max(cov / var_size, 0.) if var_size > 0 else 0.
+    return max(mean_time - per_mb * mean_size, 0.), per_mb
+
+
+def list_makespan(costs_in, njobs_in):
+    """makespan of handing tasks of the given costs in this order to the next free of `njobs_in` workers"""
+    loads = [0.] * njobs_in
+    for cost in costs_in:
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+    return max(loads)
+
+
+class LPTSchedule(object):
+    """
+    Longest processing time first: the files are handed to the worker processes in descending order of their
+    estimated checking time, so that the largest files do not start last while the other workers are idle.
+
+    The checking time of a file is the time measured in a recent run (see load_file_timings). For the other files
+    it is estimated from the file size with a linear model per file format (classic or netCDF-4), fitted to the
+    timed files of this run, or with the default coefficients of batch_util if there are too few of them.
+    """
+
+    def __init__(self, file_infos_in, njobs_in, file_timings_in):
+        self.njobs = njobs_in
+        self.walk_order = file_infos_in
+        files = {}
+        for ifile, _ in file_infos_in:
+            try:
+                size = os.path.getsize(ifile) / 2 ** 20
+            except OSError:
+                size = 0.
+            files[ifile] = (size, file_format(ifile), file_timings_in.get(os.path.abspath(ifile)))
+
+        timed = [(size, elapsed, nc_format) for size, nc_format, elapsed in files.values() if elapsed is not None]
+        coeffs_all = fit_cost_model([(size, elapsed) for size, elapsed, _ in timed]) \
+            or (batch_util.FILE_COST_BASE, batch_util.FILE_COST_PER_MB)
+        coeffs = {nc_format: fit_cost_model([(size, elapsed) for size, elapsed, f in timed if f == nc_format])
+                  or coeffs_all for nc_format in {nc_format for _, nc_format, _ in files.values()}}
+
+        self.costs = {}
+        for ifile, (size, nc_format, elapsed) in files.items():
+            if elapsed is None:
+                base, per_mb = coeffs[nc_format]
+                elapsed = base + per_mb * size
+            self.costs[ifile] = elapsed
+        self.files_timed = len(timed)
+        self.coeffs = coeffs
+        self.file_infos = sorted(file_infos_in, key=lambda file_info: self.costs[file_info[0]], reverse=True)
+
+    def cost(self, ifile_in):
+        return self.costs[ifile_in]
+
+    def report(self, makespan_in, worker_stats_in, file_timings_in):
+        """
+        predicted and actual makespan of the run; `makespan_in` is the wall time of the checks, `worker_stats_in`
+        the statistics of the workers (see worker_pool_util.run_checks_parallel) and `file_timings_in` the
+        measured checking time of the files (by path)
+        """
+        costs = [self.costs[ifile] for ifile, _ in self.file_infos]
+        actual = {ifile: file_timings_in[ifile] for ifile in self.costs if ifile in file_timings_in}
+        actual_total = sum(actual.values())
+        return {'schedule': 'lpt', 'jobs': self.njobs, 'files': len(costs), 'files_timed_before': self.files_timed,
+                'cost_model': {str(nc_format): {'per_file': base, 'per_mb': per_mb}
+                               for nc_format, (base, per_mb) in self.coeffs.items()},
+                'predicted_total': sum(costs),
+                'predicted_makespan': list_makespan(costs, self.njobs),
+                'predicted_makespan_walk_order': list_makespan([self.costs[ifile] for ifile, _ in self.walk_order],
+                                                               self.njobs),
+                'lower_bound': max(sum(costs) / self.njobs, max(costs, default=0.)),
+                'actual_total': actual_total,
+                'actual_makespan': makespan_in,
+                'actual_max_worker_busy': max((stats[1] for stats in worker_stats_in.values()), default=0.),
+                'prediction_error': sum(abs(self.costs[ifile] - elapsed) for ifile, elapsed in actual.items())
+                / actual_total if actual_total > 0 else None}
+
+
+def write_schedule_report(opath_in, report_in):
+    """write the report of LPTSchedule.report into the output directory of a run and print its summary"""
+    with open(os.path.join(opath_in, SCHEDULE_REPORT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report_in, f, indent=2)
+    print("--- Schedule %s on %s workers: predicted makespan %.4f s (walk order %.4f s, lower bound %.4f s), "
+          "actual %.4f s---" % (report_in['schedule'], report_in['jobs'], report_in['predicted_makespan'],
+                                report_in['predicted_makespan_walk_order'], report_in['lower_bound'],
+                                report_in['actual_makespan']))
@@ -0,0 +1,100 @@
+"""module shard_util.py to split the files of a run into shards and merge the summaries of the shards"""
+
+import glob
+import hashlib
+import json
+import os
+from atmodat_checklib import __version__
+from atmodat_checklib.utils.summary_creation_util import SummaryAggregator
+
+# Name of the partial result written by each shard into its run directory
+SHARD_RESULT_FILE = 'shard_result.json'
+
+
+def parse_shard(shard_in):
+    """shard index and number of shards from a string 'k/n' (0 <= k < n)"""
+    try:
+        shard, num_shards = (int(value) for value in shard_in.split('/'))
+    except ValueError:
+        raise RuntimeError(f'Invalid shard {shard_in}; expected k/n, e.g. 0/16')
+    if not 0 <= shard < num_shards:
+        raise RuntimeError(f'Invalid shard {shard_in}; k has to be between 0 and n - 1')
+    return shard, num_shards
+
+
+def shard_dir_name(shard_in, num_shards_in):
+    return f'shard_{shard_in:04d}_of_{num_shards_in:04d}'
+
+
+def shard_of(ifile_in, num_shards_in):
+    """shard of a file, determined by the hash of its normalised path"""
+    digest = hashlib.blake2b(os.path.normpath(ifile_in).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % num_shards_in
+
+
+def select_shard(ifiles_in, shard_in, num_shards_in):
+    """yield the files of `ifiles_in` which belong to shard `shard_in`"""
+    for ifile in ifiles_in:
+        if shard_of(ifile, num_shards_in) == shard_in:
+            yield ifile
+
+
+def read_file_manifest(ifile_in):
+    """yield the paths listed in a file manifest (one path per line; empty lines and lines starting with # skipped)"""
+    with open(ifile_in, 'r', encoding='utf-8') as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith('#'):
+                yield path
+
+
+def write_shard_result(opath_in, shard_in, num_shards_in, input_in, file_counter_in, summary_in):
+    """write the summary state of a shard into its run directory `opath_in`"""
+    shard_result = {'atmodat_checker': __version__, 'shard': shard_in, 'num_shards': num_shards_in,
+                    'input': input_in, 'file_counter': file_counter_in, 'check_types': summary_in.check_types,
+                    'summary': summary_in.to_dict()}
+    ofile = os.path.join(opath_in, SHARD_RESULT_FILE)
+    with open(ofile + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(shard_result, f, ensure_ascii=False)
+    os.replace(ofile + '.tmp', ofile)
+
+
+def find_shard_results(ipath_in):
+    """partial results of shards in the directory tree `ipath_in` (each file once, also if linked as 'latest')"""
+    return sorted({os.path.realpath(ifile) for ifile in
+                   glob.glob(os.path.join(glob.escape(ipath_in), '**', SHARD_RESULT_FILE), recursive=True)})
+
+
+def merge_shard_results(ifiles_in, allow_missing_in=False):
+    """
+    merge the partial results of the shards of one run
+
+    :return: SummaryAggregator of all shards and number of checked files
+    """
+    shard_results = {}
+    for ifile in ifiles_in:
+        with open(ifile, 'r', encoding='utf-8') as f:
+            shard_result = json.load(f)
+        key = (shard_result['num_shards'], shard_result['input'], tuple(shard_result['check_types']))
+        if shard_results and key != next(iter(shard_results.values()))[0]:
+            raise RuntimeError(f'{ifile} belongs to a different run (number of shards, input or checks differ)')
+        if shard_result['shard'] in shard_results:
+            # A shard which has been run again; its latest result is used
+            if os.path.getmtime(ifile) < os.path.getmtime(shard_results[shard_result['shard']][1]):
+                continue
+        shard_results[shard_result['shard']] = (key, ifile, shard_result)
+    if not shard_results:
+        raise RuntimeError('No shard results found')
+
+    num_shards = next(iter(shard_results.values()))[0][0]
+    missing = sorted(set(range(num_shards)) - set(shard_results))
+    if missing and not allow_missing_in:
+        raise RuntimeError(f'Results of shards {", ".join(str(shard) for shard in missing)} of {num_shards} missing')
+
+    summary = SummaryAggregator(next(iter(shard_results.values()))[2]['check_types'])
+    file_counter = 0
+    for shard in sorted(shard_results):
+        shard_result = shard_results[shard][2]
+        summary.merge(shard_result['summary'])
+        file_counter += shard_result['file_counter']
+    return summary, file_counter
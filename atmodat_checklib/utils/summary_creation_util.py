@@ -3,8 +3,7 @@
 import json
 import os
 from atmodat_checklib import __version__
-import pandas as pd
-import atmodat_checklib.utils.output_directory_util as output_directory
+from atmodat_checklib.utils.result_stream_util import read_result_stream
 import datetime
 import csv
 
@@ -53,19 +52,28 @@ def extract_overview_output_json(ifile_in):
     return summary
 
 
+def cf_error_to_be_ignored(message_in):
+    """name of the known issue a CF checker error is related to, or None if it has to be counted"""
+    if '4.3.3' in message_in:
+        return 'formula_terms'
+    elif 'Invalid attribute name: _CoordinateAxisType' in message_in:
+        return 'invalid_attribute_name'
+    return None
+
+
 def extracts_error_summary_cf_check(ifile_in, cf_verion_in, errors_in, warn_in, cf_to_be_ignored_errors_in):
     """extracts information from given txt file and returns them as a string"""
     std_name = 'Using Standard Name Table Version '
+    std_name_table_out = None
     with open(ifile_in) as f:
         data = f.read()
         for line in data.strip().split('\n'):
             if std_name in line:
                 std_name_table_out = line.replace(std_name, '').split(' ')[0]
             if line.startswith('ERROR:'):
-                if '4.3.3' in line:
-                    cf_to_be_ignored_errors_in['formula_terms'] = True
-                elif 'Invalid attribute name: _CoordinateAxisType' in line:
-                    cf_to_be_ignored_errors_in['invalid_attribute_name'] = True
+                ignored_error = cf_error_to_be_ignored(line)
+                if ignored_error:
+                    cf_to_be_ignored_errors_in[ignored_error] = True
                 else:
                     errors_in += 1
             elif line.startswith('WARN:'):
@@ -76,155 +84,234 @@ def extracts_error_summary_cf_check(ifile_in, cf_verion_in, errors_in, warn_in,
     return cf_verion_in, errors_in, warn_in, std_name_table_out, cf_to_be_ignored_errors_in
 
 
-def write_short_summary(json_summary, cf_version, cf_errors, cf_warns, cf_to_be_ignored_errors_in,
-                        file_counter, std_name_table_in, opath_in):
-    """create file which contains the short version of the summary"""
+class SummaryAggregator(object):
+    """
+    Folds the checker output of single files into the counters and tables needed for the summary output.
+
+    Results can be added one by one while the checks are still running; only the counters, the distinct
+    versions/licenses and the failed checks are kept.
+    """
+
     prio_dict = {'high_priorities': 'Mandatory', 'medium_priorities': 'Recommended', 'low_priorities': 'Optional'}
-    passed_checks = {'all': [0, 0, 0, 0]}  # all, failed, missing, error
-    license_list = []
-    if isinstance(json_summary, pd.DataFrame):
-        for prio in prio_dict.keys():
-            passed_checks[prio] = [0, 0, 0, 0]  # all, failed, missing, error
-            checks_prio = json_summary[prio]
-            for checks in checks_prio:
-                for check in checks:
-                    passed_checks[prio][0] += 1
-                    passed_checks['all'][0] += 1
-                    if check['value'][0] == check['value'][1]:
-                        passed_checks[prio][1] += 1
-                        passed_checks['all'][1] += 1
-
-                        # Find used license information
-                        if check['name'] == 'Global attribute: license':
-                            license_list.append(check['msgs'][0])
-
-                    elif check['value'][0] in [0, 1]:
-                        passed_checks[prio][2] += 1
+
+    def __init__(self, check_types_in):
+        self.check_types = list(check_types_in)
+        self.check_atmodat = 'atmodat' in check_types_in
+        self.check_cf = 'CF' in check_types_in
+
+        # all, failed, missing, error
+        self.passed_checks = {prio: [0, 0, 0, 0] for prio in ['all'] + list(self.prio_dict.keys())}
+        self.licenses = {}
+        self.testnames = set()
+        self.failed_checks = {prio: {} for prio in self.prio_dict.keys()}
+
+        self.cf_versions = set()
+        self.cf_errors, self.cf_warns = 0, 0
+        self.cf_to_be_ignored_errors = {'formula_terms': False, 'invalid_attribute_name': False}
+        self.std_name_table = None
+
+    def add_atmodat_result(self, ifile_in):
+        """add output of the AtMoDat checks of a single file (*_atmodat_result.json)"""
+        summary = extract_overview_output_json(ifile_in)
+        self.add_atmodat_summary(summary, os.path.basename(ifile_in).replace('_atmodat_result.json', '.nc'))
+
+    def add_atmodat_summary(self, summary, file_name):
+        """add results of the AtMoDat checks of a single file in the structure of the json output"""
+        self.testnames.add(summary['testname'])
+
+        for prio in self.prio_dict.keys():
+            failed_checks_file = []
+            for check in summary[prio]:
+                self.passed_checks[prio][0] += 1
+                self.passed_checks['all'][0] += 1
+                if check['value'][0] == check['value'][1]:
+                    self.passed_checks[prio][1] += 1
+                    self.passed_checks['all'][1] += 1
+
+                    # Find used license information
+                    if check['name'] == 'Global attribute: license':
+                        self.licenses[check['msgs'][0]] = None
+
+                else:
+                    if check['value'][0] in [0, 1]:
+                        self.passed_checks[prio][2] += 1
                     else:
-                        passed_checks[prio][3] += 1
-
-    # write summary of results into summary file
-    with open(os.path.join(opath_in, 'short_summary.txt'), 'w+') as f:
-        f.write("=== Short summary === \n \n")
-        f.write(f"ATMODAT Standard Compliance Checker Version: {str(__version__)}\n")
-
-        # Check for multiple CF Version
-        cf_verion_list = list(set(cf_version))
-
-        if len(cf_verion_list) == 1:
-            cf_version_string = f"CF Version {cf_verion_list[0].split('-')[1]}"
-        elif len(cf_verion_list) > 1:
-            cf_version_string = f"multiple CF versions ({', '.join(cf_verion_list)})"
-        else:
-            cf_version_string = ""
-
-        text_out = "Checking against: "
-        if isinstance(json_summary, pd.DataFrame):
-            text_out += f"ATMODAT Standard {list(set(json_summary['testname']))[0].split(':')[1]}"
-            if cf_version_string != "":
-                text_out += f", {cf_version_string}"
-        else:
-            text_out += f"{cf_version_string}"
-        text_out += "\n"
-        f.write(text_out)
-
-        f.write(f"Checked at: {datetime.datetime.now().isoformat(timespec='seconds')}\n \n")
-        f.write(f"Number of checked netCDF files: {str(file_counter)}\n")
-        f.write("\n")
-        if isinstance(json_summary, pd.DataFrame):
-            for prio in prio_dict.keys():
-                f.write(f"{prio_dict[prio]} ATMODAT Standard checks passed: "
-                        f"{str(passed_checks[prio][1])}/{str(passed_checks[prio][0])} ({passed_checks[prio][2]} "
-                        f"missing, {passed_checks[prio][3]} error(s))\n")
-            f.write("\n")
-        if cf_errors is not None:
-            if cf_to_be_ignored_errors_in.get('formula_terms', False):
-                f.write(f"CF checker errors: {str(cf_errors)} (Ignoring errors related to formula_terms in boundary "
-                        f"variables. See Known Issues section "
-                        f"https://github.com/AtMoDat/atmodat_data_checker#known-issues )\n")
-            if cf_to_be_ignored_errors_in.get('invalid_attribute_name', False):
-                f.write(f"CF checker errors: {str(cf_errors)} (Ignoring errors related to the leading underscore "
-                        f"in the attribute _CoordinateAxisType, which, according to CF convention section on "
-                        f"Naming Conventions, is not recommended but also not prohibited.)\n")
-            if (not cf_to_be_ignored_errors_in.get('formula_terms', False)
-                    and not cf_to_be_ignored_errors_in.get('invalid_attribute_name', False)):
-                f.write(f"CF checker errors: {str(cf_errors)}\n")
-        if cf_warns is not None:
-            f.write(f"CF checker warnings: {str(cf_warns)}")
-
-    license_list = list(set(license_list))
-    if len(license_list) != 0:
-        with open(os.path.join(opath_in, 'summary_used_licences.txt'), 'w+') as f_lic:
-            for license_str in license_list:
-                f_lic.write(f"{license_str} \n")
-
-
-def write_long_summary(json_summary_in, opath_in):
-
-    if json_summary_in is None:
-        return
-
-    prio_cat_all = ['high_priorities', 'medium_priorities', 'low_priorities']
-    prio_dict = {'high_priorities': 'mandatory', 'medium_priorities': 'recommended', 'low_priorities': 'optional'}
-    files_check = list(json_summary_in['file'])
-
-    # Read all errors and warnings into dict
-    data_table = {}
-    for prio_cat in prio_cat_all:
-        data_table[prio_cat] = {'File': [], 'Check level': [], 'Global Attribute': [], 'Error Message': []}
-        for nf in range(len(files_check)):
-            file_name = json_summary_in.iloc[nf]['file'].split('/')[-1].replace('_atmodat_result.json', '.nc')
-            for key in data_table[prio_cat].keys():
-                data_table[prio_cat][key].append('')
-
-            checks_prio_file = json_summary_in.iloc[nf][prio_cat]
-            for check in checks_prio_file:
-                if check['value'][0] != check['value'][1]:
-                    data_table[prio_cat]['File'].append(file_name)
+                        self.passed_checks[prio][3] += 1
                     msgs = check['msgs'][0].split("'")
-                    data_table[prio_cat]['Global Attribute'].append(msgs[1])
-                    data_table[prio_cat]['Error Message'].append(msgs[2].lstrip())
-                    data_table[prio_cat]['Check level'].append(prio_dict[prio_cat])
-
-    for prio_cat in prio_cat_all:
-        with open(os.path.join(opath_in, 'long_summary_' + prio_dict[prio_cat] + '.csv'), 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(list(data_table[prio_cat].keys()))
-            for row in zip(data_table[prio_cat]['File'], data_table[prio_cat]['Check level'],
-                           data_table[prio_cat]['Global Attribute'], data_table[prio_cat]['Error Message']):
-                writer.writerow((list(row)))
+                    failed_checks_file.append((msgs[1], msgs[2].lstrip()))
+            self.failed_checks[prio][file_name] = failed_checks_file
+
+    def add_cf_result(self, ifile_in):
+        """add output of the CF checker of a single file (*_CF_result.txt)"""
+        cf_version, self.cf_errors, self.cf_warns, std_name_table, self.cf_to_be_ignored_errors = \
+            extracts_error_summary_cf_check(ifile_in, [], self.cf_errors, self.cf_warns, self.cf_to_be_ignored_errors)
+        self.cf_versions.update(cf_version)
+        if std_name_table is not None:
+            self.std_name_table = std_name_table
+
+    def add_cf_record(self, cf_record_in):
+        """add a CF checker record (see cf_check_util.results_record)"""
+        if cf_record_in['version']:
+            self.cf_versions.add(cf_record_in['version'])
+        if cf_record_in['std_name_table'] is not None:
+            self.std_name_table = cf_record_in['std_name_table']
+        for _, message in cf_record_in['errors']:
+            ignored_error = cf_error_to_be_ignored(message)
+            if ignored_error:
+                self.cf_to_be_ignored_errors[ignored_error] = True
+            else:
+                self.cf_errors += 1
+        self.cf_warns += len(cf_record_in['warnings'])
+
+    def add_record(self, record_in):
+        """add the record of the results of all checks of a single file (see FileChecker.check_file_record)"""
+        if self.check_atmodat and record_in.get('atmodat'):
+            self.add_atmodat_summary(record_in['atmodat'], record_in['name'] + '.nc')
+        if self.check_cf and record_in.get('CF'):
+            self.add_cf_record(record_in['CF'])
+
+    def add_cf_record_file(self, ifile_in):
+        """add the CF checker record of a single file (*_CF_record.json)"""
+        with open(ifile_in, 'r', encoding='utf-8') as f:
+            self.add_cf_record(json.load(f))
+
+    def add_result_file(self, ifile_in):
+        """
+        add an output file of a check of a single file; the CF checker text output is only read if there is no
+        CF checker record of the file, e.g. in output directories written by earlier versions
+        """
+        if ifile_in.endswith('_atmodat_result.json') and self.check_atmodat:
+            self.add_atmodat_result(ifile_in)
+        elif ifile_in.endswith('_CF_record.json') and self.check_cf:
+            self.add_cf_record_file(ifile_in)
+        elif ifile_in.endswith('_CF_result.txt') and self.check_cf:
+            if not os.path.isfile(ifile_in[:-len('_result.txt')] + '_record.json'):
+                self.add_cf_result(ifile_in)
+
+    def to_dict(self):
+        """state of the aggregator as JSON serialisable dictionary"""
+        return {'passed_checks': self.passed_checks, 'licenses': list(self.licenses),
+                'testnames': sorted(self.testnames), 'failed_checks': self.failed_checks,
+                'cf_versions': sorted(self.cf_versions), 'cf_errors': self.cf_errors, 'cf_warns': self.cf_warns,
+                'cf_to_be_ignored_errors': self.cf_to_be_ignored_errors, 'std_name_table': self.std_name_table}
+
+    def merge(self, state_in):
+        """add the state of another aggregator (see to_dict), e.g. of another shard of the files"""
+        for prio, counts in state_in['passed_checks'].items():
+            self.passed_checks[prio] = [count + count_in for count, count_in in zip(self.passed_checks[prio], counts)]
+        for license_str in state_in['licenses']:
+            self.licenses[license_str] = None
+        self.testnames.update(state_in['testnames'])
+        for prio, failed_checks in state_in['failed_checks'].items():
+            self.failed_checks[prio].update({file_name: [tuple(failed_check) for failed_check in failed_checks_file]
+                                             for file_name, failed_checks_file in failed_checks.items()})
+        self.cf_versions.update(state_in['cf_versions'])
+        self.cf_errors += state_in['cf_errors']
+        self.cf_warns += state_in['cf_warns']
+        for ignored_error, found in state_in['cf_to_be_ignored_errors'].items():
+            self.cf_to_be_ignored_errors[ignored_error] = self.cf_to_be_ignored_errors.get(ignored_error) or found
+        if state_in['std_name_table'] is not None:
+            self.std_name_table = state_in['std_name_table']
+
+    def write_short_summary(self, file_counter, opath_in):
+        """create file which contains the short version of the summary"""
+        with open(os.path.join(opath_in, 'short_summary.txt'), 'w+') as f:
+            f.write("=== Short summary === \n \n")
+            f.write(f"ATMODAT Standard Compliance Checker Version: {str(__version__)}\n")
+
+            # Check for multiple CF Version
+            cf_verion_list = sorted(self.cf_versions)
+
+            if len(cf_verion_list) == 1:
+                cf_version_string = f"CF Version {cf_verion_list[0].split('-')[1]}"
+            elif len(cf_verion_list) > 1:
+                cf_version_string = f"multiple CF versions ({', '.join(cf_verion_list)})"
+            else:
+                cf_version_string = ""
+
+            text_out = "Checking against: "
+            if self.check_atmodat and self.testnames:
+                text_out += f"ATMODAT Standard {sorted(self.testnames)[0].split(':')[1]}"
+                if cf_version_string != "":
+                    text_out += f", {cf_version_string}"
+            else:
+                text_out += f"{cf_version_string}"
+            text_out += "\n"
+            f.write(text_out)
+
+            f.write(f"Checked at: {datetime.datetime.now().isoformat(timespec='seconds')}\n \n")
+            f.write(f"Number of checked netCDF files: {str(file_counter)}\n")
+            f.write("\n")
+            if self.check_atmodat:
+                for prio in self.prio_dict.keys():
+                    f.write(f"{self.prio_dict[prio]} ATMODAT Standard checks passed: "
+                            f"{str(self.passed_checks[prio][1])}/{str(self.passed_checks[prio][0])} "
+                            f"({self.passed_checks[prio][2]} missing, {self.passed_checks[prio][3]} error(s))\n")
+                f.write("\n")
+            if self.check_cf:
+                if self.cf_to_be_ignored_errors.get('formula_terms', False):
+                    f.write(f"CF checker errors: {str(self.cf_errors)} (Ignoring errors related to formula_terms in "
+                            f"boundary variables. See Known Issues section "
+                            f"https://github.com/AtMoDat/atmodat_data_checker#known-issues )\n")
+                if self.cf_to_be_ignored_errors.get('invalid_attribute_name', False):
+                    f.write(f"CF checker errors: {str(self.cf_errors)} (Ignoring errors related to the leading "
+                            f"underscore in the attribute _CoordinateAxisType, which, according to CF convention "
+                            f"section on Naming Conventions, is not recommended but also not prohibited.)\n")
+                if (not self.cf_to_be_ignored_errors.get('formula_terms', False)
+                        and not self.cf_to_be_ignored_errors.get('invalid_attribute_name', False)):
+                    f.write(f"CF checker errors: {str(self.cf_errors)}\n")
+                f.write(f"CF checker warnings: {str(self.cf_warns)}")
+
+        if len(self.licenses) != 0:
+            with open(os.path.join(opath_in, 'summary_used_licences.txt'), 'w+') as f_lic:
+                for license_str in self.licenses.keys():
+                    f_lic.write(f"{license_str} \n")
+
+    def write_long_summary(self, opath_in):
+        """create csv files which contain all failed checks (one file per check level)"""
+        if not self.check_atmodat:
+            return
+
+        prio_dict = {'high_priorities': 'mandatory', 'medium_priorities': 'recommended', 'low_priorities': 'optional'}
+        for prio_cat in self.prio_dict.keys():
+            with open(os.path.join(opath_in, 'long_summary_' + prio_dict[prio_cat] + '.csv'), 'w',
+                      newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['File', 'Check level', 'Global Attribute', 'Error Message'])
+                for file_name, failed_checks_file in sorted(self.failed_checks[prio_cat].items()):
+                    writer.writerow(['', '', '', ''])
+                    for attribute, message in failed_checks_file:
+                        writer.writerow([file_name, prio_dict[prio_cat], attribute, message])
+
+    def write(self, file_counter, opath_in):
+        self.write_short_summary(file_counter, opath_in)
+        self.write_long_summary(opath_in)
 
+
+def create_output_summary(file_counter, opath, check_types_in):
+    """main function to create summary output from the checker output in `opath`"""
+
+    summary = SummaryAggregator(check_types_in)
+    for check in check_types_in:
+        opath_check = os.path.join(opath, check)
+        if not os.path.isdir(opath_check):
+            continue
+        with os.scandir(opath_check) as result_files:
+            for result_file in result_files:
+                summary.add_result_file(result_file.path)
+
+    summary.write(file_counter, opath)
     return
 
 
-def create_output_summary(file_counter, opath, check_types_in):
-    """main function to create summary output"""
-
-    if 'atmodat' in check_types_in:
-        json_summary = pd.DataFrame()
-    else:
-        json_summary = None
-
-    std_name_table = None
-    if 'CF' in check_types_in:
-        cf_to_be_ignored_errors_in = {'formula_terms': False, 'invalid_attribute_name': False}
-        cf_errors, cf_warns = 0, 0
-        cf_version = []
-    else:
-        cf_errors, cf_warns = None, None
-        cf_to_be_ignored_errors_in = None
-        cf_version = None
-
-    files = output_directory.return_files_in_directory_tree(opath)
-    for file in files:
-        if file.endswith("_result.json") and isinstance(json_summary, pd.DataFrame):
-            json_summary = pd.concat([json_summary, pd.DataFrame.from_dict(extract_overview_output_json(file),
-                                                                           orient='index').transpose()], axis=0)
-        elif file.endswith("_CF_result.txt"):
-            cf_version, cf_errors, cf_warns, std_name_table, cf_to_be_ignored_errors_in = \
-                extracts_error_summary_cf_check(file, cf_version, cf_errors, cf_warns, cf_to_be_ignored_errors_in)
-
-    write_short_summary(json_summary, cf_version, cf_errors, cf_warns, cf_to_be_ignored_errors_in, file_counter,
-                        std_name_table, opath)
-    write_long_summary(json_summary, opath)
+def create_output_summary_from_stream(ifile_stream, opath, check_types_in):
+    """create summary output from a result stream"""
+
+    summary = SummaryAggregator(check_types_in)
+    file_counter = 0
+    for record in read_result_stream(ifile_stream):
+        summary.add_record(record)
+        file_counter += 1
+
+    summary.write(file_counter, opath)
     return
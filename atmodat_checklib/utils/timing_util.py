@@ -0,0 +1,178 @@
+"""module timing_util.py to record wall and CPU time of the stages of a run, of single files and checks"""
+
+import contextlib
+import csv
+import glob
+import json
+import multiprocessing.util
+import os
+import time
+
+# Name of the timing report and of the per-file timings in the output directory of a run
+TIMING_REPORT_FILE = 'timing_report'
+TIMING_FILES_FILE = 'timing_files.csv'
+# Name of the profile dump (with --profile)
+PROFILE_FILE = 'profile.pstats'
+# Number of slowest files and checks listed in the report
+SLOWEST_COUNT = 20
+
+
+class TimingRecorder(object):
+    """
+    Accumulates wall and CPU time (of the calling thread) of named stages and checks, and the timings of
+    single files. Recorders of worker processes are merged into the recorder of the main process.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.checks = {}
+        self.files = []
+
+    @staticmethod
+    def add(table_in, name_in, wall_in, cpu_in, count_in=1):
+        entry = table_in.setdefault(name_in, [0, 0., 0.])
+        entry[0] += count_in
+        entry[1] += wall_in
+        entry[2] += cpu_in
+
+    @contextlib.contextmanager
+    def stage(self, name_in):
+        """time the enclosed block as (part of) stage `name_in`; yields a list which is set to [wall, cpu] time"""
+        elapsed = [0., 0.]
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield elapsed
+        finally:
+            elapsed[:] = [time.perf_counter() - start_wall, time.thread_time() - start_cpu]
+            self.add(self.stages, name_in, *elapsed)
+
+    def timed_iter(self, name_in, iterable_in):
+        """yield the items of `iterable_in`, timing the production of the items as stage `name_in`"""
+        iterator = iter(iterable_in)
+        while True:
+            with self.stage(name_in):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_check(self, name_in, wall_in, cpu_in):
+        self.add(self.checks, name_in, wall_in, cpu_in)
+
+    def add_file(self, ifile_in, wall_in, cpu_in, check_walls_in):
+        """add timings of a single file; `check_walls_in` holds the wall time of each check"""
+        self.files.append((ifile_in, wall_in, cpu_in, check_walls_in))
+
+    def clear(self):
+        self.stages.clear()
+        self.checks.clear()
+        self.files.clear()
+
+    def to_dict(self):
+        return {'stages': self.stages, 'checks': self.checks, 'files': self.files}
+
+    def merge(self, timings_in):
+        """add timings in the structure of to_dict, e.g. those of a worker process"""
+        for name, (count, wall, cpu) in timings_in['stages'].items():
+            self.add(self.stages, name, wall, cpu, count)
+        for name, (count, wall, cpu) in timings_in['checks'].items():
+            self.add(self.checks, name, wall, cpu, count)
+        self.files.extend(tuple(file_timings) for file_timings in timings_in['files'])
+
+    def report(self, total_wall_in=None):
+        """timing report: all stages and the slowest files and checks"""
+        def table(entries_in, count_key):
+            return {name: {count_key: count, 'wall': wall, 'cpu': cpu}
+                    for name, (count, wall, cpu) in sorted(entries_in.items(), key=lambda item: -item[1][1])}
+        slowest_files = sorted(self.files, key=lambda file_timings: -file_timings[1])[:SLOWEST_COUNT]
+        return {'total_wall': total_wall_in, 'files': len(self.files),
+                'stages': table(self.stages, 'count'),
+                'slowest_checks': dict(list(table(self.checks, 'calls').items())[:SLOWEST_COUNT]),
+                'slowest_files': [{'file': ifile, 'wall': wall, 'cpu': cpu, 'checks': check_walls}
+                                  for ifile, wall, cpu, check_walls in slowest_files]}
+
+
+timings = TimingRecorder()
+
+
+def save_worker_timings(ofile_in):
+    """write the timings of this process to a JSON file"""
+    ofile_tmp = ofile_in + f'.tmp{os.getpid()}'
+    with open(ofile_tmp, 'w', encoding='utf-8') as f:
+        json.dump(timings.to_dict(), f)
+    os.replace(ofile_tmp, ofile_in)
+
+
+def worker_timing_file(ifile_in, pid_in):
+    return f'{ifile_in}.worker{pid_in}'
+
+
+def merge_worker_timings(ifile_in):
+    """add the timings written by worker processes (see worker_timing_file) to this process and remove them"""
+    for worker_file in glob.glob(worker_timing_file(glob.escape(ifile_in), '*')):
+        with open(worker_file, 'r', encoding='utf-8') as f:
+            timings.merge(json.load(f))
+        os.remove(worker_file)
+
+
+def write_timing_report(opath_in, total_wall_in=None):
+    """write the timing report (json and text) and the timings of all files (csv) into `opath_in`"""
+    report = timings.report(total_wall_in)
+    with open(os.path.join(opath_in, TIMING_REPORT_FILE + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    with open(os.path.join(opath_in, TIMING_REPORT_FILE + '.txt'), 'w', encoding='utf-8') as f:
+        f.write("=== Timing report === \n \n")
+        if total_wall_in is not None:
+            f.write("Total wall time: %.4f s\n" % total_wall_in)
+        f.write(f"Checked files: {report['files']}\n")
+        f.write("\nStages (wall time summed over all processes):\n")
+        f.write("%-40s %10s %12s %12s\n" % ('Stage', 'Count', 'Wall [s]', 'CPU [s]'))
+        for name, stage in report['stages'].items():
+            f.write("%-40s %10d %12.4f %12.4f\n" % (name, stage['count'], stage['wall'], stage['cpu']))
+        f.write(f"\nSlowest checks (at most {SLOWEST_COUNT}):\n")
+        f.write("%-60s %10s %12s %12s\n" % ('Check', 'Calls', 'Wall [s]', 'CPU [s]'))
+        for name, check in report['slowest_checks'].items():
+            f.write("%-60s %10d %12.4f %12.4f\n" % (name, check['calls'], check['wall'], check['cpu']))
+        f.write(f"\nSlowest files (at most {SLOWEST_COUNT}):\n")
+        for file_timings in report['slowest_files']:
+            check_walls = ', '.join("%s: %.4f s" % item for item in file_timings['checks'].items())
+            f.write("%.4f s (CPU %.4f s; %s) %s\n" %
+                    (file_timings['wall'], file_timings['cpu'], check_walls, file_timings['file']))
+
+    check_names = sorted({check for file_timings in timings.files for check in file_timings[3]})
+    with open(os.path.join(opath_in, TIMING_FILES_FILE), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['File', 'Wall [s]', 'CPU [s]'] + [check + ' wall [s]' for check in check_names])
+        for ifile, wall, cpu, check_walls in timings.files:
+            writer.writerow([ifile, wall, cpu] + [check_walls.get(check, '') for check in check_names])
+
+
+def start_worker_profile(ofile_in):
+    """profile this process until it exits and dump the statistics into `ofile_in`"""
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+
+    def dump_profile():
+        profile.disable()
+        profile.dump_stats(ofile_in)
+    multiprocessing.util.Finalize(None, dump_profile, exitpriority=10)
+
+
+def merge_profiles(profile_in, ofile_in):
+    """
+    dump the statistics of `profile_in` together with those of the worker processes
+    (see worker_timing_file) into `ofile_in` and write the top functions into a text file next to it
+    """
+    import pstats
+    profile_in.dump_stats(ofile_in)
+    stats = pstats.Stats(ofile_in)
+    for worker_file in glob.glob(worker_timing_file(glob.escape(ofile_in), '*')):
+        stats.add(worker_file)
+        os.remove(worker_file)
+    stats.dump_stats(ofile_in)
+    with open(os.path.splitext(ofile_in)[0] + '.txt', 'w', encoding='utf-8') as f:
+        stats.stream = f
+        stats.sort_stats('cumulative').print_stats(50)
@@ -0,0 +1,114 @@
+"""module unit_cache_util.py to memoise the validation of units and resolution strings"""
+
+import glob
+import json
+import os
+from collections import OrderedDict
+from atmodat_checklib import __version__
+
+# Maximum number of entries of each cache
+UNIT_CACHE_SIZE = 4096
+# Name of the persisted table in the checker output directory
+UNIT_TABLE_FILE = 'unit_cache.json'
+
+
+class LRUCache(object):
+    """Bounded mapping that drops the least recently used entries and counts hits and misses"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """cached value of `key` or None"""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.}
+
+
+# Validity of single units and scores of whole resolution strings (see nc_util.value_unit_format_conformity)
+unit_validity = LRUCache(UNIT_CACHE_SIZE)
+resolution_scores = LRUCache(UNIT_CACHE_SIZE)
+
+
+def cache_stats():
+    """hit statistics of the unit caches of this process"""
+    return {'units': unit_validity.stats(), 'resolution': resolution_scores.stats()}
+
+
+def table_info():
+    """versions which determine whether a persisted table can be reused"""
+    # Imported here as UDUNITS2_XML_PATH has to be set before
+    import cfunits
+    return {'atmodat_checker': __version__, 'cfunits': cfunits.__version__,
+            'udunits2_xml_path': os.environ.get('UDUNITS2_XML_PATH', '')}
+
+
+def save_unit_table(ofile_in):
+    """write cache entries and statistics to a JSON table"""
+    table = {'info': table_info(), 'stats': cache_stats(), 'units': dict(unit_validity.entries),
+             'resolution': dict(resolution_scores.entries)}
+    ofile_tmp = ofile_in + f'.tmp{os.getpid()}'
+    with open(ofile_tmp, 'w', encoding='utf-8') as f:
+        json.dump(table, f)
+    os.replace(ofile_tmp, ofile_in)
+
+
+def load_unit_table(ifile_in, add_stats=False):
+    """
+    Warm the caches from a table written by save_unit_table. Tables written with other versions
+    of the checker, cfunits or udunits database are ignored.
+
+    :param add_stats: add hits and misses of the table to the statistics of this process
+    :return: True if the table has been loaded
+    """
+    try:
+        with open(ifile_in, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if table.get('info') != table_info():
+        return False
+    for units, valid in table['units'].items():
+        unit_validity.put(units, valid)
+    for resol_string, score in table['resolution'].items():
+        resolution_scores.put(resol_string, score)
+    if add_stats:
+        for name, cache in [('units', unit_validity), ('resolution', resolution_scores)]:
+            cache.hits += table['stats'][name]['hits']
+            cache.misses += table['stats'][name]['misses']
+    return True
+
+
+def worker_table_file(ifile_in, pid_in):
+    return f'{ifile_in}.worker{pid_in}'
+
+
+def merge_worker_tables(ifile_in):
+    """add the tables written by worker processes (see worker_table_file) to the caches and remove them"""
+    for worker_table in glob.glob(worker_table_file(glob.escape(ifile_in), '*')):
+        load_unit_table(worker_table, add_stats=True)
+        os.remove(worker_table)
@@ -0,0 +1,143 @@
+"""module vocab_index_util.py to share controlled vocabulary lookups within a process and across runs"""
+
+import glob
+import json
+import math
+import os
+from atmodat_checklib import __version__
+from atmodat_checklib.utils.env_util import get_cv_revision
+from atmodat_checklib.utils.timing_util import timings
+
+# Name of the snapshot in the checker output directory
+VOCAB_SNAPSHOT_FILE = 'vocab_index.json'
+
+
+class VocabIndex(object):
+    """
+    Process-wide index of controlled vocabulary lookups.
+
+    The ESSVocabs object of each vocabulary (authority and scope) is only created once. The result of a
+    lookup is stored for each vocabulary, attribute, lookup property and attribute value, so that repeated
+    values are answered with a single dictionary lookup. The rules of the lookup itself are those of
+    ESSVocabs.check_global_attribute.
+    """
+
+    def __init__(self):
+        self.vocabs = {}
+        self.scores = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_vocabs(self, vocabulary_ref):
+        """ESSVocabs object for a vocabulary reference like 'atmodat:atmodat'"""
+        authority_scope = tuple(vocabulary_ref.split(':')[:2])
+        if authority_scope not in self.vocabs:
+            # Imported here as PYESSV_ARCHIVE_HOME has to be set before
+            from checklib.cvs.ess_vocabs import ESSVocabs
+            with timings.stage('setup: vocabularies'):
+                self.vocabs[authority_scope] = ESSVocabs(*authority_scope)
+        return self.vocabs[authority_scope]
+
+    def check_global_attribute(self, ds, attr, vocabulary_ref, vocab_lookup):
+        """
+        Checks global attribute `attr` of `ds` against the vocabulary.
+
+        :return: Integer (0: not found; 1: found (but invalid value); 2: valid value)
+        """
+        if attr not in ds.ncattrs():
+            return 0
+        value = ds.getncattr(attr)
+        try:
+            key = (vocabulary_ref, attr, vocab_lookup, type(value).__name__, value)
+            score = self.scores.get(key)
+        except TypeError:
+            # Unhashable values (arrays) are not indexed
+            return self.get_vocabs(vocabulary_ref).check_global_attribute(ds, attr, vocab_lookup=vocab_lookup)
+        if score is None:
+            self.misses += 1
+            vocabs = self.get_vocabs(vocabulary_ref)
+            with timings.stage('vocabulary lookup (uncached)'):
+                score = vocabs.check_global_attribute(ds, attr, vocab_lookup=vocab_lookup)
+            self.scores[key] = score
+        else:
+            self.hits += 1
+        return score
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.scores),
+                'hit_rate': self.hits / lookups if lookups else 0.}
+
+
+vocab_index = VocabIndex()
+
+
+def snapshot_info():
+    """
+    Versions which determine whether a snapshot can be reused, or None if the revision of the
+    vocabularies is unknown
+    """
+    pyessv_archive_home = os.environ.get('PYESSV_ARCHIVE_HOME', '')
+    cv_revision = get_cv_revision(os.path.dirname(pyessv_archive_home.rstrip(os.sep)))
+    if cv_revision is None:
+        return None
+    return {'atmodat_checker': __version__, 'pyessv_archive_home': pyessv_archive_home, 'cv_revision': cv_revision}
+
+
+def snapshot_entry(key_in, score_in):
+    """
+    JSON representation [vocabulary, attribute, lookup, value type, value, score] of a lookup result, or None for
+    values which cannot be represented
+    """
+    value = key_in[-1]
+    if hasattr(value, 'item'):
+        # numpy scalars
+        value = value.item()
+    if not isinstance(value, (str, int, float)) or (isinstance(value, float) and not math.isfinite(value)):
+        return None
+    return list(key_in[:-1]) + [value, int(score_in)]
+
+
+def save_vocab_snapshot(ofile_in):
+    """write the lookup results of the index to a JSON snapshot"""
+    info = snapshot_info()
+    if info is None:
+        return
+    entries = [snapshot_entry(key, score) for key, score in vocab_index.scores.items()]
+    ofile_tmp = ofile_in + f'.tmp{os.getpid()}'
+    with open(ofile_tmp, 'w', encoding='utf-8') as f:
+        json.dump({'info': info, 'scores': [entry for entry in entries if entry is not None]}, f)
+    os.replace(ofile_tmp, ofile_in)
+
+
+def load_vocab_snapshot(ifile_in):
+    """
+    Add the lookup results of a snapshot written by save_vocab_snapshot to the index. Snapshots of other
+    versions of the checker or the vocabularies are ignored.
+
+    :return: True if the snapshot has been loaded
+    """
+    info = snapshot_info()
+    if info is None:
+        return False
+    try:
+        with open(ifile_in, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get('info') != info:
+            return False
+        scores = {tuple(entry[:-1]): entry[-1] for entry in snapshot['scores']}
+    except (OSError, ValueError, AttributeError, KeyError, TypeError):
+        return False
+    vocab_index.scores.update(scores)
+    return True
+
+
+def worker_snapshot_file(ifile_in, pid_in):
+    return f'{ifile_in}.worker{pid_in}'
+
+
+def merge_worker_snapshots(ifile_in):
+    """add the snapshots written by worker processes (see worker_snapshot_file) to the index and remove them"""
+    for worker_snapshot in glob.glob(worker_snapshot_file(glob.escape(ifile_in), '*')):
+        load_vocab_snapshot(worker_snapshot)
+        os.remove(worker_snapshot)
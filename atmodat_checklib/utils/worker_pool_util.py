@@ -0,0 +1,129 @@
+"""module worker_pool_util.py to distribute the checks of many files across several processes"""
+
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import time
+from atmodat_checklib.utils import unit_cache_util as unit_cache
+from atmodat_checklib.utils import vocab_index_util as vocab_index
+from atmodat_checklib.utils import timing_util as timing
+from atmodat_checklib.utils import batch_util
+
+# Maximum number of pending batches of files per worker process
+QUEUE_SIZE_PER_WORKER = 4
+
+# State of a worker process, set up once by init_worker
+_worker = {}
+
+
+def init_worker(file_checker_in, stream_in, unit_table_in, vocab_snapshot_in, timing_file_in, profile_file_in):
+    """set up a worker process; check suite and CF tables are loaded once per process"""
+    _worker['file_checker'] = file_checker_in
+    _worker['stream'] = stream_in
+    if timing_file_in:
+        # Timings inherited from the main process are not counted twice
+        timing.timings.clear()
+        multiprocessing.util.Finalize(None, timing.save_worker_timings,
+                                      args=(timing.worker_timing_file(timing_file_in, os.getpid()),),
+                                      exitpriority=10)
+    if profile_file_in:
+        timing.start_worker_profile(timing.worker_timing_file(profile_file_in, os.getpid()))
+    if unit_table_in:
+        # Warm the unit caches and hand the entries back to the main process when the worker exits
+        unit_cache.load_unit_table(unit_table_in)
+        multiprocessing.util.Finalize(None, unit_cache.save_unit_table,
+                                      args=(unit_cache.worker_table_file(unit_table_in, os.getpid()),),
+                                      exitpriority=10)
+    if vocab_snapshot_in:
+        vocab_index.load_vocab_snapshot(vocab_snapshot_in)
+        multiprocessing.util.Finalize(None, vocab_index.save_vocab_snapshot,
+                                      args=(vocab_index.worker_snapshot_file(vocab_snapshot_in, os.getpid()),),
+                                      exitpriority=10)
+
+
+def check_file(file_info):
+    """run all checks on a single file inside a worker process"""
+    ifile, filename_base = file_info
+    start_time = time.perf_counter()
+    if _worker['stream']:
+        record, cache_hits = _worker['file_checker'].check_file_record(ifile, filename_base)
+    else:
+        record, cache_hits = _worker['file_checker'].check_file(ifile, filename_base)
+    return os.getpid(), time.perf_counter() - start_time, cache_hits, filename_base, record
+
+
+def check_files(file_infos):
+    """run all checks on a batch of files inside a worker process; a failing file does not stop the batch"""
+    results = []
+    for file_info in file_infos:
+        try:
+            results.append((check_file(file_info), None))
+        except Exception as e:
+            results.append((None, f'{file_info[0]}: {e}'))
+    return results
+
+
+def run_checks_parallel(file_infos_in, njobs_in, file_checker_in, file_done_callback=None, stream_in=False,
+                        unit_table_in=None, vocab_snapshot_in=None, timing_file_in=None, profile_file_in=None,
+                        cost_func_in=batch_util.file_cost):
+    """
+    Check files with a pool of `njobs_in` worker processes, each using a copy of the FileChecker `file_checker_in`.
+
+    `file_infos_in` is an iterable of (file path, base name) tuples; it is consumed while the checks are running.
+    The files are handed to the workers in batches of similar estimated checking time (see batch_util.cost_batches;
+    `cost_func_in` returns the estimated checking time of a file); at most QUEUE_SIZE_PER_WORKER * njobs_in batches
+    are queued at the same time. The output file names only depend on the input file names, so the output layout
+    does not depend on the order in which files finish.
+    `file_done_callback` is called with the base name of each file and the record of its results
+    (see FileChecker.check_file_record) as soon as its checks are finished. With `stream_in`, no output files
+    are written.
+    If `unit_table_in` (`vocab_snapshot_in`) is given, the unit caches (vocabulary index) of the workers are
+    warmed from this file and written to unit_cache_util.worker_table_file
+    (vocab_index_util.worker_snapshot_file) when the workers exit. Likewise, the timings of the workers are written
+    to timing_util.worker_timing_file(`timing_file_in`) and, if `profile_file_in` is given, the workers are profiled
+    and their statistics dumped to timing_util.worker_timing_file(`profile_file_in`).
+
+    :return: dictionary with number of checked files, busy time and cache hits for each worker process
+    """
+    worker_stats = {}
+    queue_slots = threading.BoundedSemaphore(QUEUE_SIZE_PER_WORKER * njobs_in)
+
+    def batch_done(results):
+        queue_slots.release()
+        for result, error in results:
+            if error is not None:
+                print(f'Checking {error}')
+                continue
+            pid, elapsed, cache_hits, filename_base, record = result
+            stats = worker_stats.setdefault(pid, [0, 0., 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += cache_hits
+            if file_done_callback:
+                try:
+                    file_done_callback(filename_base, record)
+                except Exception as e:
+                    print(f'Processing results of {filename_base} failed: {e}')
+
+    def batch_failed(error):
+        print(f'Worker process failed: {error}')
+        queue_slots.release()
+
+    with multiprocessing.Pool(njobs_in, initializer=init_worker,
+                              initargs=(file_checker_in, stream_in, unit_table_in, vocab_snapshot_in, timing_file_in,
+                                        profile_file_in)) as pool:
+        for batch in batch_util.cost_batches(file_infos_in, cost_func=cost_func_in):
+            queue_slots.acquire()
+            pool.apply_async(check_files, (batch,), callback=batch_done, error_callback=batch_failed)
+        pool.close()
+        pool.join()
+
+    return worker_stats
+
+
+def print_worker_stats(worker_stats_in):
+    """print throughput of each worker process"""
+    for nw, (pid, (nfiles, elapsed, _)) in enumerate(sorted(worker_stats_in.items())):
+        rate = nfiles / elapsed if elapsed > 0 else float('inf')
+        print("--- Worker %s (pid %s): %s files in %.4f seconds (%.2f files/s)---" % (nw, pid, nfiles, elapsed, rate))
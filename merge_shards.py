@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+
+import atmodat_checklib.utils.output_directory_util as output_directory
+import atmodat_checklib.utils.shard_util as shard_util
+
+
+def main():
+
+    args = command_line_parse()
+
+    # Find the partial results of the shards
+    shard_results = []
+    for ipath in args.path:
+        shard_results.extend(shard_util.find_shard_results(ipath))
+    summary, file_counter = shard_util.merge_shard_results(shard_results, args.allow_missing)
+
+    # Write the summary of all shards into a new run directory
+    opath = os.path.abspath(args.opath) if args.opath else os.getcwd()
+    opath_run = output_directory.create_directories(os.path.join(opath, 'atmodat_checker_output', 'merged', ''), [])
+    summary.write(file_counter, opath_run)
+    print(f"--- Merged the results of {len(shard_results)} shard runs ({file_counter} files) into {opath_run}---")
+
+
+def command_line_parse():
+    """parse command line input"""
+    parser = argparse.ArgumentParser(description="Merge the results of the shards of a run_checks run (--shard) "
+                                                 "into one summary.")
+    parser.add_argument("-p", "--path", help="Directory tree which contains the output of the shards. Can be given "
+                                             "several times", action="append", required=True)
+    parser.add_argument("-op", "--opath", help="Define custom path where the merged summary shall be written",
+                        default=False)
+    parser.add_argument("--allow_missing", help="Merge the results even if the results of some shards are missing",
+                        action="store_true", default=False)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import atmodat_checklib.utils.benchmark_util as benchmark
+import atmodat_checklib.utils.output_directory_util as output_directory
+import atmodat_checklib.utils.summary_creation_util as summary_creation
+from atmodat_checklib.utils.env_util import set_env_variables
+
+BENCHMARK_STAGES = ['discovery', 'atmodat', 'CF', 'summary', 'fill_attributes', 'micro']
+
+# Attributes written by the fill_attributes stage
+FILL_GLOBAL_ATTRS = [('mandatory', [('Conventions', 'false', 'CF-1.8 ATMODAT-3.0'), ('institution', 'false', ''),
+                                    ('source', 'false', '')]),
+                     ('recommended', [('title', 'false', 'Filled benchmark data'),
+                                      ('history', 'true', 'fill_attributes benchmark')]),
+                     ('optional', [('comment', 'false', 'Filled by run_benchmarks')])]
+
+
+def main():
+
+    # Set environment variables
+    udunits2_xml_path, atmodat_cvs = set_env_variables()
+    os.environ['PYESSV_ARCHIVE_HOME'] = os.path.join(atmodat_cvs, 'pyessv-archive')
+    os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+    idiryml = os.path.join(atmodat_cvs, '')
+
+    args = command_line_parse()
+    stages = args.stages or BENCHMARK_STAGES
+    njobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    # Generate the corpus unless a corpus with the same parameters exists
+    tmp_dir = tempfile.mkdtemp(prefix='atmodat_benchmark_')
+    corpus_path = os.path.abspath(args.corpus) if args.corpus else os.path.join(tmp_dir, 'corpus')
+    params = {'nfiles': args.nfiles, 'nattrs': args.nattrs, 'nvars': args.nvars,
+              'invalid_fraction': args.invalid_fraction, 'files_per_dir': args.files_per_dir,
+              'file_format': args.file_format, 'seed': args.seed}
+    manifest = benchmark.load_corpus_manifest(corpus_path)
+    if not manifest or manifest['params'] != params:
+        print(f'--- Generating corpus of {args.nfiles} files in {corpus_path}---')
+        manifest = benchmark.generate_corpus(corpus_path, args.nfiles, args.nattrs, args.nvars,
+                                             args.invalid_fraction, args.files_per_dir, args.file_format, args.seed)
+
+    results = benchmark.BenchmarkResults(manifest['params'], {'jobs': njobs, 'repeat': args.repeat,
+                                                              'header_only': args.header_only})
+    try:
+        run_benchmarks(results, stages, corpus_path, tmp_dir, idiryml, njobs, args.repeat, args.header_only,
+                       args.micro_calls)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    for name, stage in results.results['stages'].items():
+        print("--- %s: %.4f seconds (%.2f files/s)---" % (name, stage['seconds'], stage['files_per_second'] or 0))
+    for name, micro in results.results['micro'].items():
+        print("--- %s: %.2f microseconds per call---" % (name, 1e6 * micro['seconds_per_call']))
+    if args.output:
+        results.write(args.output)
+
+    # Compare with the results of a previous run
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, old, new, ratio, regression in benchmark.compare_results(baseline, results.results,
+                                                                           args.tolerance):
+            print("%-40s %12.6f %12.6f %8.2fx%s" % (name, old, new, ratio, '  REGRESSION' if regression else ''))
+            regressions += regression
+        if regressions:
+            sys.exit(1)
+
+
+def run_benchmarks(results_in, stages_in, corpus_path_in, tmp_dir_in, idiryml_in, njobs_in, repeat_in,
+                   header_only_in, micro_calls_in):
+    """time the selected stages of the checker pipeline on the corpus in `corpus_path_in`"""
+    # Imported here as UDUNITS2_XML_PATH and PYESSV_ARCHIVE_HOME have to be set before
+    from run_checks import run_checks
+
+    ifiles = list(output_directory.iter_netcdf_files(corpus_path_in))
+    nfiles = len(ifiles)
+    opath_run = output_directory.create_directories(os.path.join(tmp_dir_in, 'atmodat_checker_output'),
+                                                    ['atmodat', 'CF'])
+
+    if 'discovery' in stages_in:
+        results_in.add_stage('discovery', benchmark.time_runs(
+            lambda: list(output_directory.iter_netcdf_files(corpus_path_in)), repeat_in), nfiles)
+
+    for check in ['atmodat', 'CF']:
+        if check not in stages_in:
+            continue
+
+        def check_files():
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_checks(ifiles, False, [check], 'auto', opath_run, idiryml_in, njobs_in,
+                           header_only_in=header_only_in)
+        results_in.add_stage(check, benchmark.time_runs(check_files, repeat_in), nfiles)
+
+    if 'summary' in stages_in:
+        check_types = [check for check in ['atmodat', 'CF'] if check in stages_in]
+        results_in.add_stage('summary', benchmark.time_runs(
+            lambda: summary_creation.create_output_summary(nfiles, opath_run, check_types), repeat_in), nfiles)
+
+    if 'fill_attributes' in stages_in:
+        from atmodat_checklib.utils.fill_attributes.fill_attributes import run_fill_attributes
+        att_dir = write_fill_attribute_csvs(os.path.join(tmp_dir_in, 'fill_attributes_csv'))
+        fill_path = os.path.join(tmp_dir_in, 'fill_attributes_corpus')
+
+        def copy_corpus():
+            shutil.rmtree(fill_path, ignore_errors=True)
+            shutil.rmtree(os.path.join(att_dir, 'attr_backup'), ignore_errors=True)
+            shutil.copytree(corpus_path_in, fill_path)
+
+        results_in.add_stage('fill_attributes', benchmark.time_runs(
+            lambda: run_fill_attributes(att_dir, None, fill_path), repeat_in, setup=copy_corpus), nfiles)
+
+    if 'micro' in stages_in:
+        run_micro_benchmarks(results_in, ifiles[0], micro_calls_in)
+
+
+def write_fill_attribute_csvs(opath_in):
+    """write the csv files used by the fill_attributes stage into `opath_in`"""
+    os.makedirs(opath_in, exist_ok=True)
+    for fill_type, attrs in FILL_GLOBAL_ATTRS:
+        with open(os.path.join(opath_in, fill_type + '_attributes.csv'), 'w', encoding='utf-8') as f:
+            f.write('attribute,use,append,string\n')
+            for attr, append, string in attrs:
+                f.write(f'{attr},{"true" if string else "false"},{append},{string}\n')
+    with open(os.path.join(opath_in, 'variable_attributes.csv'), 'w', encoding='utf-8') as f:
+        f.write('varname_old,varname_new,long_name,standard_name,units,cell_methods,bounds,comment\n')
+        f.write('var0,,filled long name,,,time: mean,,filled by run_benchmarks\n')
+    return opath_in
+
+
+def run_micro_benchmarks(results_in, ifile_in, ncalls_in):
+    """time single calls of the nc_util checks on the global attributes of `ifile_in`"""
+    from atmodat_checklib.utils import nc_util
+    from atmodat_checklib.utils.nc_header_util import read_header
+
+    with read_header(ifile_in) as ds:
+        micro_checks = {
+            'check_global_attr_type': lambda: nc_util.check_global_attr_type(ds, 'title', 'str'),
+            'check_global_attr_iso8601': lambda: nc_util.check_global_attr_iso8601(ds, 'creation_date'),
+            'check_conventions_version_number': lambda: nc_util.check_conventions_version_number(
+                ds, 'Conventions', 'CF', 1.4, 1.8),
+            'check_global_attribute_resolution_format': lambda: nc_util.check_global_attribute_resolution_format(
+                ds, 'geospatial_lat_resolution'),
+            'resolution_format_score': lambda: nc_util.resolution_format_score('0.25 degree'),
+            'split_value_unit': lambda: nc_util.split_value_unit('0.25 degree'),
+        }
+        for name, func in micro_checks.items():
+            results_in.add_micro(name, ncalls_in, benchmark.time_calls(func, ncalls_in))
+
+
+def command_line_parse():
+    """parse command line input"""
+    parser = argparse.ArgumentParser(description="Benchmark the AtMoDat checker pipeline on a synthetic corpus "
+                                                 "of netCDF files.")
+    parser.add_argument("-n", "--nfiles", help="Number of files of the corpus", type=int, default=100)
+    parser.add_argument("--nattrs", help="Number of global attributes of each file", type=int,
+                        default=len(benchmark.VALID_GLOBAL_ATTRS))
+    parser.add_argument("--nvars", help="Number of data variables of each file", type=int, default=1)
+    parser.add_argument("--invalid_fraction", help="Share of files with invalid metadata", type=float,
+                        default=0.25)
+    parser.add_argument("--files_per_dir", help="Number of files in each subdirectory of the corpus", type=int,
+                        default=100)
+    parser.add_argument("--file_format", help="netCDF format of the corpus files", default='NETCDF4',
+                        choices=['NETCDF4', 'NETCDF4_CLASSIC', 'NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET',
+                                 'NETCDF3_64BIT_DATA'])
+    parser.add_argument("--seed", help="Seed of the random choice of invalid metadata", type=int, default=0)
+    parser.add_argument("-c", "--corpus", help="Directory of the corpus; it is reused if it has been generated "
+                                               "with the same parameters (default: temporary directory)",
+                        default=None)
+    parser.add_argument("-s", "--stages", help="Stages to benchmark (default: all)", nargs='+',
+                        choices=BENCHMARK_STAGES, default=None)
+    parser.add_argument("-j", "--jobs", help="Number of worker processes for the checks (0: all CPUs)", type=int,
+                        default=1)
+    parser.add_argument("-r", "--repeat", help="Number of runs of each stage; the fastest run is reported",
+                        type=int, default=1)
+    parser.add_argument("--header_only", help="Run the AtMoDat checks on the file headers", action="store_true",
+                        default=False)
+    parser.add_argument("--micro_calls", help="Number of calls of each single check", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="Write the results as JSON into this file", default=None)
+    parser.add_argument("--compare", help="Compare the results with those of a previous run (JSON file); exits "
+                                          "with status 1 if a stage got slower", default=None)
+    parser.add_argument("--tolerance", help="Relative slowdown that is not reported as regression", type=float,
+                        default=0.1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,39 @@
 #!/usr/bin/env python
 
 import argparse
+import json
 import os
+import time
 from datetime import datetime
-import subprocess
-import numpy as np
 
 import atmodat_checklib.utils.output_directory_util as output_directory
 import atmodat_checklib.utils.summary_creation_util as summary_creation
-from atmodat_checklib.utils.env_util import set_env_variables
+import atmodat_checklib.utils.worker_pool_util as worker_pool
+import atmodat_checklib.utils.unit_cache_util as unit_cache
+import atmodat_checklib.utils.vocab_index_util as vocab_index
+import atmodat_checklib.utils.timing_util as timing
+import atmodat_checklib.utils.batch_util as batch_util
+import atmodat_checklib.utils.shard_util as shard_util
+import atmodat_checklib.utils.checkpoint_util as checkpoint_util
+import atmodat_checklib.utils.schedule_util as schedule_util
+from atmodat_checklib.utils.timing_util import timings
+from atmodat_checklib.utils.env_util import set_env_variables, get_cv_revision, resolve_environment, \
+    print_environment
+from atmodat_checklib.utils.file_check_util import FileChecker
+from atmodat_checklib.utils.result_cache_util import ResultCache, CACHE_SIZE_DEFAULT
+from atmodat_checklib.utils.result_stream_util import ResultStreamWriter, STREAM_FORMATS
 from atmodat_checklib import __version__
 
 
 def main():
 
+    # read command line input (first, so that --help and --version return at once)
+    args = command_line_parse()
+
     # Set environment variables
+    if args.env_info:
+        print_environment(resolve_environment())
+        return
     udunits2_xml_path, atmodat_cvs = set_env_variables()
     os.environ['PYESSV_ARCHIVE_HOME'] = os.path.join(atmodat_cvs, 'pyessv-archive')
     os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
@@ -24,16 +43,24 @@ def main():
     # record start time
     start_time = datetime.now()
 
-    # read command line input
-    args = command_line_parse()
     verbose = args.verbose
     ifile = args.file
     ipath = args.path
     ipath_norec = args.path_no_recursive
+    ifile_manifest = args.manifest
     opath_in = args.opath
     cfversion = args.cfversion
     whatchecks = args.whatchecks
     parsed_summary = args.summary
+    njobs = args.jobs
+    use_cache = args.cache or args.cache_strict
+    header_only = args.header_only
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+    else:
+        profile = None
+    shard = shard_util.parse_shard(args.shard) if args.shard else None
 
     # Define output path for checker output
     # user-defined opath
@@ -46,6 +73,9 @@ def main():
         # default path with subdirectory containing timestamp of check
         opath = os.getcwd()
     opath = os.path.join(opath, 'atmodat_checker_output', '')
+    # Each shard gets its own output directory, as shards may run at the same time
+    if shard:
+        opath = os.path.join(opath, shard_util.shard_dir_name(*shard), '')
 
     # Define version of CF table against which the files shall be checked.
     # Default is auto --> CF table version parsed from global attribute 'Conventions'.
@@ -61,8 +91,12 @@ def main():
             print('User-defined -check option invalid; using \'both\' instead')
             whatchecks = 'both'
 
-    # Check that either ifile or ipath exist
-    if not ifile and not ipath and not ipath_norec:
+    # Number of worker processes; 0 uses all available CPUs
+    if njobs < 1:
+        njobs = os.cpu_count() or 1
+
+    # Check that either ifile, ipath or a file manifest exist
+    if not ifile and not ipath and not ipath_norec and not ifile_manifest:
         raise RuntimeError('No file and path given')
 
     check_types = ['atmodat', 'CF']
@@ -71,40 +105,110 @@ def main():
     elif whatchecks == 'AT':
         check_types.remove('CF')
 
-    # Create directory for checker output
-    opath_run = output_directory.create_directories(opath, check_types)
-
     # Single file
-    if ifile and not (ipath or ipath_norec):
+    if ifile:
         # Check for file ending and add file to list
         files_check = check_file_suffix([ifile])
+        njobs = 1
+
+    # Files listed in a manifest
+    elif ifile_manifest:
+        files_check = (file for path in shard_util.read_file_manifest(ifile_manifest)
+                       for file in check_file_suffix([path]))
 
     # Multiple files
-    elif (ipath or ipath_norec) and not ifile:
-        # Look for files in given directory
+    else:
+        # Look for netCDF files in given directory; files are checked while the directory tree is walked. The first
+        # file is looked up right away, so that a tree without netCDF files fails before the run is set up
         if ipath:
-            files_all = output_directory.return_files_in_directory_tree(ipath)
+            files_check = output_directory.iter_netcdf_files(ipath, args.max_depth, args.include, args.exclude)
         else:
-            files_all = output_directory.return_files_in_directory(ipath_norec)
-        # Check for file ending and add file to list
-        files_check = check_file_suffix(files_all)
+            files_check = output_directory.iter_netcdf_files(ipath_norec, 0, args.include, args.exclude)
+        files_check = output_directory.peek_first(files_check)
+
+    # Create directory for checker output or continue an interrupted run
+    if args.resume:
+        if args.resume == 'latest':
+            opath_run = checkpoint_util.find_resumable_run(opath)
+        else:
+            opath_run = os.path.join(os.path.abspath(args.resume), '')
+        print(f'--- Resuming run in {opath_run}---')
+    else:
+        opath_run = output_directory.create_directories(opath, check_types)
+
+    # Finished files are journaled, so that the run can be resumed if it is interrupted
+    run_settings = {'input': os.path.normpath(ifile_manifest or ipath or ipath_norec or ifile),
+                    'check_types': check_types, 'cfversion': cfversion, 'result_stream': args.result_stream,
+                    'header_only': header_only, 'shard': args.shard, 'include': args.include,
+                    'exclude': args.exclude, 'max_depth': args.max_depth}
+    checkpoint = checkpoint_util.CheckpointJournal(opath_run, run_settings)
+
+    # Only check the files of the given shard
+    if shard:
+        files_check = shard_util.select_shard(files_check, *shard)
+    if not ifile:
+        files_check = output_directory.prefetch(timings.timed_iter('discovery', files_check))
+
+    # Reuse results of unchanged files from previous runs
+    if use_cache:
+        result_cache = ResultCache(os.path.join(opath, 'cache'), cache_key_info(cfversion, atmodat_cvs),
+                                   strict=args.cache_strict, max_size_mb=args.cache_size)
+    else:
+        result_cache = None
+
+    # Results are added to the summary while the checks are running; shards keep the summary for merging
+    if parsed_summary or shard:
+        summary = summary_creation.SummaryAggregator(check_types)
+    else:
+        summary = None
+
+    # Tables of validated units and vocabulary lookups shared between runs and worker processes
+    unit_table = os.path.join(opath, unit_cache.UNIT_TABLE_FILE)
+    vocab_snapshot = os.path.join(opath, vocab_index.VOCAB_SNAPSHOT_FILE)
+
+    # Write one record per file into a single result stream instead of output files for each file
+    if args.result_stream:
+        result_stream = ResultStreamWriter(os.path.join(opath_run, 'results.' + args.result_stream))
+    else:
+        result_stream = None
 
     # Run global attribute checks
-    file_counter = len(files_check)
-    run_checks(files_check, verbose, check_types, cfversion, opath_run, idiryml)
+    if profile:
+        profile.enable()
+    file_counter = run_checks(files_check, verbose, check_types, cfversion, opath_run, idiryml, njobs, result_cache,
+                              summary, header_only, unit_table, vocab_snapshot, result_stream,
+                              os.path.join(opath_run, timing.PROFILE_FILE) if profile else None, checkpoint,
+                              args.schedule)
+    if result_stream:
+        with timings.stage('output: result stream'):
+            result_stream.close()
+    if result_cache:
+        with timings.stage('output: cache eviction'):
+            result_cache.evict()
 
     # Create summary of results if specified
     if parsed_summary:
-        summary_creation.create_output_summary(file_counter, opath_run, check_types)
+        with timings.stage('summary'):
+            summary.write(file_counter, opath_run)
+    if shard:
+        with timings.stage('output: shard result'):
+            shard_util.write_shard_result(opath_run, *shard, run_settings['input'], file_counter, summary)
+    checkpoint.finish(file_counter)
 
     # Create a symbolic link to latest checker output
-    latest_link = os.path.join(opath, 'latest')
-    if os.path.isdir(latest_link):
-        os.unlink(latest_link)
-    os.symlink(opath_run, os.path.join(opath, 'latest'))
+    with timings.stage('output: latest link'):
+        latest_link = os.path.join(opath, 'latest')
+        if os.path.isdir(latest_link):
+            os.unlink(latest_link)
+        os.symlink(opath_run, os.path.join(opath, 'latest'))
+    if profile:
+        profile.disable()
+        timing.merge_profiles(profile, os.path.join(opath_run, timing.PROFILE_FILE))
 
     # Calculate run time of this script
-    print("--- %.4f seconds for checking %s files---" % ((datetime.now() - start_time).total_seconds(), file_counter))
+    run_time = (datetime.now() - start_time).total_seconds()
+    timing.write_timing_report(opath_run, run_time)
+    print("--- %.4f seconds for checking %s files---" % (run_time, file_counter))
 
 
 def check_file_suffix(ifiles):
@@ -121,89 +225,145 @@ def check_file_suffix(ifiles):
     return files_to_check
 
 
-def utf8len(string_in):
-    return len(string_in.encode('utf-8'))
-
-
-def cmd_string_checker(io_in, idiryml_in):
-    # String of input and output files
-    ifile_in_string = " ".join(io_in[0])
-    ofiles_checker_string = " ".join(io_in[1])
-
-    # Output string creation
-    return 'compliance-checker --y ' + idiryml_in + 'atmodat_standard_checks.yml -f json_new -f text ' + \
-           ofiles_checker_string + ' --test atmodat_standard:3.0 ' + ifile_in_string
-
-
-def cmd_string_cf(ifiles_in, cf_version_in):
-    ostring = []
-    for ifile in ifiles_in:
-        ostring.append('cfchecks -v ' + cf_version_in + ' ' + ifile)
-    return '; '.join(ostring)
-
-
-def cmd_string_creation(check_in, ifiles_in, opath_file_in, filenames_base_in, idiryml_in, cf_version_in):
-    max_string_len = 131072
-    cmd_out = []
-    if check_in == 'atmodat':
-
-        # List of output files
-        ofiles_checker = ['-o ' + os.path.join(opath_file_in, check_in, filename_base + '_' + check_in + '_result.json')
-                          for filename_base in filenames_base_in]
-
-        # Output string creation
-        tmp_cmd_out = cmd_string_checker((ifiles_in, ofiles_checker), idiryml_in)
-        num_split = int(np.ceil(utf8len(tmp_cmd_out) / max_string_len))
-        if num_split > len(ifiles_in):
-            num_split = len(ifiles_in)
+def cache_key_info(cfversion_in, atmodat_cvs_in):
+    """versions which determine whether cached checker output can be reused"""
+    from compliance_checker import __version__ as compliance_checker_version
+    from cfchecker import __version__ as cfchecker_version
+    cv_revision = get_cv_revision(atmodat_cvs_in)
+    if cv_revision is None:
+        cv_revision = str(os.path.getmtime(os.path.join(atmodat_cvs_in, 'atmodat_standard_checks.yml')))
+    return {'atmodat_checker': __version__, 'compliance_checker': compliance_checker_version,
+            'cfchecker': cfchecker_version, 'cf_version': cfversion_in, 'cv_revision': cv_revision}
+
+
+def run_checks(ifile_in, verbose_in, check_types_in, cfversion_in, opath_file, idiryml_in, njobs_in=1,
+               result_cache_in=None, summary_in=None, header_only_in=False, unit_table_in=None,
+               vocab_snapshot_in=None, result_stream_in=None, profile_file_in=None, checkpoint_in=None,
+               schedule_in='walk'):
+    """
+    run all checks; `ifile_in` can be any iterable of file paths, which is consumed while the checks are running.
+    If a ResultStreamWriter `result_stream_in` is given, one record per file is written to it instead of writing
+    output files for each file. The timings of the worker processes are added to timing_util.timings; with
+    `profile_file_in`, the worker processes are profiled (see timing_util.merge_profiles).
+    Finished files are added to the CheckpointJournal `checkpoint_in`; files which it lists as finished are not
+    checked again, their results are taken from their output.
+    With `schedule_in` 'lpt' and several processes, all files are collected first and handed to the workers in
+    descending order of their estimated checking time (see schedule_util.LPTSchedule); the predicted and actual
+    makespan are written to schedule_util.SCHEDULE_REPORT_FILE.
+
+    :return: number of checked files
+    """
+    # Results of the files finished by an interrupted run
+    if checkpoint_in and checkpoint_in.entries:
+        with timings.stage('setup: resume'):
+            finished_records = checkpoint_in.finished_files(FileChecker.load_record)
+    else:
+        finished_records = {}
+        for check in check_types_in:
 
-        # Split if size of string exceeds max_string_len
-        if num_split < 2:
-            cmd_out.append(tmp_cmd_out)
-        else:
-            for io_files in zip(np.array_split(ifiles_in, num_split), np.array_split(ofiles_checker, num_split)):
-                cmd_out.append(cmd_string_checker(io_files, idiryml_in))
-
-    elif check_in == 'CF':
-        tmp_cmd_out = cmd_string_cf(ifiles_in, cf_version_in)
-        num_split = int(np.ceil(utf8len(tmp_cmd_out) / max_string_len))
-        if num_split > len(ifiles_in):
-            num_split = len(ifiles_in)
-        if num_split < 2:
-            cmd_out.append(tmp_cmd_out)
+            # Remove preexisting checker output
+            opath_checks = os.path.join(opath_file, check, '')
+            for old_file in os.listdir(opath_checks):
+                os.remove(os.path.join(opath_checks, old_file))
+
+    if 'atmodat' not in check_types_in:
+        unit_table_in = None
+        vocab_snapshot_in = None
+    if unit_table_in:
+        unit_cache.load_unit_table(unit_table_in)
+    if vocab_snapshot_in:
+        vocab_index.load_vocab_snapshot(vocab_snapshot_in)
+
+    stream = result_stream_in is not None
+    file_checker = FileChecker(check_types_in, cfversion_in, opath_file, idiryml_in, result_cache_in,
+                               header_only_in, text_output_in=verbose_in)
+
+    def add_to_summary(filename_base_in, record_in, journal_in=True):
+        if checkpoint_in and journal_in:
+            with timings.stage('output: checkpoint journal'):
+                if stream:
+                    checkpoint_in.add(record_in)
+                else:
+                    checkpoint_in.add(record_in, {check: file_checker.output_files(check, filename_base_in)[0]
+                                                  for check in check_types_in},
+                                      [check for check in check_types_in
+                                       if check not in FileChecker.RECORD_OUTPUT_CHECKS])
+        if stream:
+            with timings.stage('output: result stream'):
+                result_stream_in.write(record_in)
+            if verbose_in:
+                print(json.dumps(record_in, ensure_ascii=False))
+        if summary_in:
+            with timings.stage('summary'):
+                summary_in.add_record(record_in)
+
+    for record in finished_records.values():
+        add_to_summary(record['name'], record, journal_in=False)
+    if finished_records:
+        print(f'--- Resuming run: results of {len(finished_records)} files reused---')
+
+    # Get base filename of each file as it comes in
+    filenames_base = []
+
+    def file_infos():
+        for ifile in ifile_in:
+            if ifile in finished_records:
+                continue
+            filename_base = os.path.basename(os.path.realpath(ifile)).rstrip('.nc')
+            filenames_base.append(filename_base)
+            yield ifile, filename_base
+
+    # Distribute files across worker processes
+    if njobs_in > 1:
+        timing_file = os.path.join(opath_file, timing.TIMING_REPORT_FILE + '.json')
+        if schedule_in == 'lpt':
+            with timings.stage('setup: schedule'):
+                file_timings = schedule_util.load_file_timings(os.path.dirname(os.path.normpath(opath_file)),
+                                                               opath_file)
+                schedule = schedule_util.LPTSchedule(list(file_infos()), njobs_in, file_timings)
+            file_infos_parallel, cost_func = schedule.file_infos, schedule.cost
         else:
-            for split_ifiles in np.array_split(ifiles_in, num_split):
-                cmd_out.append(cmd_string_cf(split_ifiles, cf_version_in))
-    return cmd_out
-
-
-def run_checks(ifile_in, verbose_in, check_types_in, cfversion_in, opath_file, idiryml_in):
-    """run all checks"""
-    # Get base filename and output path
-    filenames_base = [os.path.basename(os.path.realpath(f)).rstrip('.nc') for f in ifile_in]
-    for check in check_types_in:
-
-        # Remove preexisting checker output
-        opath_checks = os.path.join(opath_file, check, '')
-        for old_file in os.listdir(opath_checks):
-            os.remove(os.path.join(opath_checks, old_file))
-
-        if check == 'atmodat':
-            cmd_checker = cmd_string_creation(check, ifile_in, opath_file, filenames_base, idiryml_in, cfversion_in)
-            for cmd in cmd_checker:
-                subprocess.run(cmd, shell=True)
-        elif check == 'CF':
-            cmd_cf = cmd_string_creation(check, ifile_in, opath_file, filenames_base, idiryml_in, cfversion_in)
-            output_string_all = []
-            for cmd in cmd_cf:
-                output_string_all.append(subprocess.run(cmd, shell=True, capture_output=True, text=True).stdout)
-            output_string = ''.join(output_string_all)
-            split_string = 'CHECKING NetCDF FILE'
-            output_string_files = output_string.split(split_string)[1::]
-            for ofile_data_cf in zip(filenames_base, output_string_files):
-                ofile_cf = os.path.join(opath_file, 'CF', '') + ofile_data_cf[0] + '_' + check + '_result.txt'
-                with open(ofile_cf, 'w', encoding='utf-8') as f_cf:
-                    f_cf.write(split_string + ofile_data_cf[1])
+            schedule = None
+            file_infos_parallel, cost_func = file_infos(), batch_util.file_cost
+        start_checks = time.perf_counter()
+        worker_stats = worker_pool.run_checks_parallel(file_infos_parallel, njobs_in, file_checker, add_to_summary,
+                                                       stream, unit_table_in, vocab_snapshot_in, timing_file,
+                                                       profile_file_in, cost_func)
+        makespan = time.perf_counter() - start_checks
+        timing.merge_worker_timings(timing_file)
+        worker_pool.print_worker_stats(worker_stats)
+        if schedule:
+            schedule_util.write_schedule_report(opath_file, schedule.report(
+                makespan, worker_stats, {ifile: wall for ifile, wall, _, _ in timings.files}))
+        cache_hits = sum(stats[2] for stats in worker_stats.values())
+    else:
+        cache_hits = 0
+        for ifile, filename_base in file_infos():
+            if stream:
+                record, file_cache_hits = file_checker.check_file_record(ifile, filename_base)
+            else:
+                record, file_cache_hits = file_checker.check_file(ifile, filename_base)
+            cache_hits += file_cache_hits
+            add_to_summary(filename_base, record)
+    if result_cache_in:
+        print(f'--- {cache_hits} of {len(filenames_base) * len(check_types_in)} checker results reused from '
+              f'cache---')
+    if unit_table_in:
+        with timings.stage('output: unit cache table'):
+            unit_cache.merge_worker_tables(unit_table_in)
+            unit_cache.save_unit_table(unit_table_in)
+        if verbose_in:
+            for name, stats in unit_cache.cache_stats().items():
+                print("--- Unit cache (%s): %s hits, %s misses (%.1f%% hit rate)---" %
+                      (name, stats['hits'], stats['misses'], 100 * stats['hit_rate']))
+    if vocab_snapshot_in:
+        with timings.stage('output: vocabulary snapshot'):
+            vocab_index.merge_worker_snapshots(vocab_snapshot_in)
+            vocab_index.save_vocab_snapshot(vocab_snapshot_in)
+
+    if stream:
+        return len(filenames_base) + len(finished_records)
+
     for filename_base in filenames_base:
         for check in check_types_in:
             file_verbose = os.path.join(opath_file, check, '') + filename_base + '_' + check + '_result.txt'
@@ -227,7 +387,7 @@ def run_checks(ifile_in, verbose_in, check_types_in, cfversion_in, opath_file, i
             if check == 'atmodat':
                 if os.path.isfile(file_verbose):
                     os.remove(file_verbose)
-    return
+    return len(filenames_base) + len(finished_records)
 
 
 def command_line_parse():
@@ -251,6 +411,53 @@ def command_line_parse():
     parser.add_argument("-s", "--summary", help="Create summary of checker output",
                         action="store_true",
                         default=False)
+    parser.add_argument("-j", "--jobs", help="Number of processes across which the files are distributed. "
+                                             "Use 0 for all available CPUs. Default is 1",
+                        type=int, default=1)
+    parser.add_argument("--cache", help="Reuse checker output of files that did not change since a previous run "
+                                        "(files are identified by path, size, modification time and inode)",
+                        action="store_true", default=False)
+    parser.add_argument("--cache_strict", help="Like --cache, but identify unchanged files by the hash of their "
+                                               "content",
+                        action="store_true", default=False)
+    parser.add_argument("--cache_size", help="Maximum size of the cache in MB. Default is %(default)s",
+                        type=int, default=CACHE_SIZE_DEFAULT)
+    parser.add_argument("--header_only", help="Run the AtMoDat checks on the global attributes read from the file "
+                                              "header instead of opening the files as netCDF4 Dataset "
+                                              "(faster for large files)",
+                        action="store_true", default=False)
+    parser.add_argument("--profile", help="Profile the run with cProfile; the statistics are written to "
+                                          "profile.pstats (and the top functions to profile.txt) in the output "
+                                          "directory", action="store_true", default=False)
+    parser.add_argument("-rs", "--result_stream", help="Write the results of all files as one JSON record per "
+                                                       "file into a single file results.<format> instead of "
+                                                       "writing output files for each file",
+                        choices=STREAM_FORMATS, default=None)
+    parser.add_argument("--include", help="Only check files whose path relative to the given directory matches "
+                                          "this glob pattern, e.g. \"*/day/*.nc\". Can be given several times",
+                        action="append", default=None)
+    parser.add_argument("--exclude", help="Skip files and directories whose path relative to the given directory "
+                                          "matches this glob pattern. Can be given several times",
+                        action="append", default=None)
+    parser.add_argument("--max_depth", help="Maximum depth of subdirectories searched with -p. Default: no limit",
+                        type=int, default=None)
+    parser.add_argument("--shard", help="Only check shard k of n shards of the files, e.g. \"--shard 3/16\" "
+                                        "(k from 0 to n-1). Files are assigned to shards by the hash of their path. "
+                                        "The results of all shards are combined with merge_shards",
+                        default=None)
+    parser.add_argument("--resume", help="Continue an interrupted run with the same options; the files finished "
+                                         "before are not checked again. Without a value, the most recent "
+                                         "unfinished run in the output path is continued, otherwise the run in the "
+                                         "given run directory", nargs='?', const='latest', default=None)
+    parser.add_argument("--schedule", help="Order in which the files are handed to the worker processes with -j: "
+                                           "'walk' checks files while the directory tree is walked, 'lpt' collects "
+                                           "all files first and checks them in descending order of their estimated "
+                                           "checking time (from file size, format and the timings of recent runs) "
+                                           "and writes a report of predicted and actual makespan. Default is "
+                                           "'walk'", choices=schedule_util.SCHEDULES, default='walk')
+    parser.add_argument("--env-info", help="Print the udunits2.xml path, the AtMoDat_CVs path and revision used by "
+                                           "the checker and whether they were read from the cache of the resolved "
+                                           "environment, then exit", action="store_true", default=False)
     parser.add_argument('-V', '--version', action='version',
                         version=f'ATMODAT Standard Compliance Checker Version: {__version__}')
     group = parser.add_mutually_exclusive_group()
@@ -258,6 +465,7 @@ def command_line_parse():
     group.add_argument("-p", "--path", help="Processes all files in a given path and subdirectories "
                                             "(recursive file search)")
     group.add_argument("-pnr", "--path_no_recursive", help="Processes all files in a given directory")
+    group.add_argument("-m", "--manifest", help="Processes all files listed in the given file (one path per line)")
 
     return parser.parse_args()
 
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import signal
+import tempfile
+
+from atmodat_checklib.utils.env_util import set_env_variables
+
+
+def main():
+
+    args = command_line_parse()
+
+    # Set environment variables
+    udunits2_xml_path, atmodat_cvs = set_env_variables()
+    os.environ['PYESSV_ARCHIVE_HOME'] = os.path.join(atmodat_cvs, 'pyessv-archive')
+    os.environ['UDUNITS2_XML_PATH'] = udunits2_xml_path
+    idiryml = os.path.join(atmodat_cvs, '')
+
+    njobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    check_types = {'AT': ['atmodat'], 'CF': ['CF']}.get(args.whatchecks, ['atmodat', 'CF'])
+
+    # Imported here as UDUNITS2_XML_PATH and PYESSV_ARCHIVE_HOME have to be set before
+    import atmodat_checklib.utils.daemon_util as daemon
+    import atmodat_checklib.utils.unit_cache_util as unit_cache
+    import atmodat_checklib.utils.vocab_index_util as vocab_index
+    from atmodat_checklib.utils.file_check_util import FileChecker
+
+    # Anyone who can connect can have files checked, so only local clients are served by default
+    if not args.socket and not args.allow_remote and not daemon.is_loopback(args.host):
+        raise RuntimeError(f'{args.host} is not a loopback address; use --allow-remote to accept requests from '
+                           f'other hosts')
+
+    # Tables of validated units and vocabulary lookups of previous runs of run_checks
+    opath = os.path.join(os.path.abspath(args.opath) if args.opath else os.getcwd(), 'atmodat_checker_output')
+    unit_table = os.path.join(opath, unit_cache.UNIT_TABLE_FILE)
+    vocab_snapshot = os.path.join(opath, vocab_index.VOCAB_SNAPSHOT_FILE)
+
+    # No output files are written; results are returned as records
+    with tempfile.TemporaryDirectory(prefix='atmodat_daemon_') as tmp_dir:
+        file_checker = FileChecker(check_types, args.cfversion, tmp_dir, idiryml, header_only_in=args.header_only,
+                                   text_output_in=False)
+        service = daemon.CheckerService(file_checker, njobs, unit_table, vocab_snapshot)
+        if args.socket:
+            server = daemon.CheckUnixHTTPServer(os.path.abspath(args.socket), service, args.verbose)
+            address = args.socket
+        else:
+            server = daemon.CheckHTTPServer((args.host, args.port), service, args.verbose)
+            address = f'http://{args.host}:{server.server_address[1]}'
+        # Stop like on Ctrl-C, so that the workers are shut down cleanly
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        print(f'--- Checker daemon with {njobs} worker processes listening on {address} ---', flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+            if args.socket and os.path.exists(args.socket):
+                os.remove(args.socket)
+
+
+def command_line_parse():
+    """parse command line input"""
+    parser = argparse.ArgumentParser(description="Run the AtMoDat checks as a daemon which checks files on request "
+                                                 "(HTTP API: POST /check with {\"file\": path}, GET /status).")
+    parser.add_argument("--host", help="Address to listen on; only loopback addresses are accepted unless "
+                                       "--allow-remote is given. Default is %(default)s", default='127.0.0.1')
+    parser.add_argument("--allow-remote", help="Allow listening on an address reachable from other hosts. The API "
+                                               "has no authentication, so only use this in a trusted network",
+                        action="store_true", default=False)
+    parser.add_argument("--port", help="Port to listen on (0: any free port). Default is %(default)s", type=int,
+                        default=8765)
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of a TCP port", default=None)
+    parser.add_argument("-j", "--jobs", help="Number of worker processes, i.e. files checked at the same time "
+                                             "(0: all CPUs). Default is 1", type=int, default=1)
+    parser.add_argument("-cfv", "--cfversion", help="CF table version against which the files are checked. "
+                                                    "Default is 'auto'", default='auto')
+    parser.add_argument("-check", "--whatchecks", help="Checks to run: AT, CF or both. Default is 'both'",
+                        choices=['AT', 'CF', 'both'], default='both')
+    parser.add_argument("--header_only", help="Run the AtMoDat checks on the global attributes read from the file "
+                                              "header", action="store_true", default=False)
+    parser.add_argument("-op", "--opath", help="Output path of previous runs of run_checks whose unit and "
+                                               "vocabulary caches are used to warm up the workers", default=False)
+    parser.add_argument("-v", "--verbose", help="Log each request", action="store_true", default=False)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
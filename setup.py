@@ -69,8 +69,11 @@ setup(
     name="atmodat_checklib",
     packages=find_packages(include=["atmodat_checklib", "atmodat_checklib.*"]),
     setup_requires=setup_requirements,
-    scripts=["run_checks.py", "atmodat_checklib/utils/fill_attributes/fill_attributes.py"],
-    entry_points={'console_scripts': ['run_checks = run_checks:main', 'fill_attributes = fill_attributes:main']},
+    scripts=["run_checks.py", "run_benchmarks.py", "merge_shards.py", "run_checks_daemon.py",
+             "atmodat_checklib/utils/fill_attributes/fill_attributes.py"],
+    entry_points={'console_scripts': ['run_checks = run_checks:main', 'run_benchmarks = run_benchmarks:main',
+                                      'merge_shards = merge_shards:main', 'fill_attributes = fill_attributes:main',
+                                      'run_checks_daemon = run_checks_daemon:main']},
     test_suite='tests',
     tests_require=test_requirements,
     url='https://github.com/AtMoDat/atmodat_data_checker',